@@ -1,6 +1,7 @@
 import os
 import logging
-from flask import Flask
+from tempfile import SpooledTemporaryFile
+from flask import Flask, Request
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import LoginManager
 from sqlalchemy.orm import DeclarativeBase
@@ -14,8 +15,22 @@ class Base(DeclarativeBase):
 
 db = SQLAlchemy(model_class=Base)
 
+class SpooledRequest(Request):
+    """Keep uploaded files in memory unless they exceed UPLOAD_SPOOL_THRESHOLD"""
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpooledTemporaryFile(max_size=app.config["UPLOAD_SPOOL_THRESHOLD"], mode="rb+")
+
+    @property
+    def max_content_length(self):
+        # Bulk uploads carry up to BULK_MAX_RESUMES files, so they get their own body limit
+        if self.endpoint == "bulk_upload":
+            return app.config["BULK_MAX_CONTENT_LENGTH"]
+        return app.config["MAX_CONTENT_LENGTH"]
+
 # Create the app
 app = Flask(__name__)
+app.request_class = SpooledRequest
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
 app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
 
@@ -25,8 +40,25 @@ app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_recycle": 300,
     "pool_pre_ping": True,
 }
-app.config["UPLOAD_FOLDER"] = "uploads"
+app.config["UPLOAD_FOLDER"] = "uploads"  # Only used when an upload stream cannot be read in place
 app.config["MAX_CONTENT_LENGTH"] = 16 * 1024 * 1024  # 16MB max file size
+app.config["UPLOAD_SPOOL_THRESHOLD"] = int(os.environ.get("UPLOAD_SPOOL_THRESHOLD", str(4 * 1024 * 1024)))
+# Queue uploads for the background analysis workers instead of scoring in the request
+app.config["ASYNC_ANALYSIS"] = os.environ.get("ASYNC_ANALYSIS", "0") == "1"
+app.config["BULK_MAX_RESUMES"] = int(os.environ.get("BULK_MAX_RESUMES", "200"))
+app.config["BULK_MAX_CONTENT_LENGTH"] = int(os.environ.get("BULK_MAX_UPLOAD_MB", "256")) * 1024 * 1024
+# Report per-stage timings of each response in a Server-Timing header
+app.config["SERVER_TIMING"] = os.environ.get("SERVER_TIMING", "0") == "1"
+# When set, /metrics requires "Authorization: Bearer <token>"
+app.config["METRICS_TOKEN"] = os.environ.get("METRICS_TOKEN", "")
+# Opt-in upload profiling: cProfile a percentage of uploads and/or keep a stack sample of
+# every upload slower than PROFILE_SLOW_MS, in a directory that keeps the newest PROFILE_MAX_FILES
+app.config["PROFILE_SAMPLE_PERCENT"] = float(os.environ.get("PROFILE_SAMPLE_PERCENT", "0"))
+app.config["PROFILE_SLOW_MS"] = float(os.environ.get("PROFILE_SLOW_MS", "0"))
+app.config["PROFILE_DIR"] = os.environ.get("PROFILE_DIR", os.path.join(app.instance_path, "profiles"))
+app.config["PROFILE_MAX_FILES"] = int(os.environ.get("PROFILE_MAX_FILES", "100"))
+# Usernames allowed on the /admin pages, comma separated
+app.config["ADMIN_USERS"] = {name.strip() for name in os.environ.get("ADMIN_USERS", "").split(",") if name.strip()}
 
 # Initialize extensions
 db.init_app(app)
@@ -43,7 +75,10 @@ with app.app_context():
     # Import models to ensure tables are created
     import models
     import routes
+    import commands
+    from migrations import upgrade_schema
     db.create_all()
+    upgrade_schema()
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -0,0 +1,7 @@
+"""Offline benchmarks of the matching pipeline
+
+Run `python -m benchmarks --output results.json` to time PDF extraction,
+keyword extraction, every calculate_* scoring function and the /upload
+request over a synthetic corpus, with Gemini replaced by a deterministic
+local fake. Pass `--baseline` with an earlier results file to compare.
+"""
@@ -0,0 +1,54 @@
+import sys
+import json
+import argparse
+from benchmarks.suite import DEFAULT_REGRESSION_THRESHOLD, compare, run_suite
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Benchmark the matching pipeline offline")
+    parser.add_argument("--iterations", type=int, default=50, help="Timed calls per case")
+    parser.add_argument("--warmup", type=int, default=5, help="Untimed calls before each case")
+    parser.add_argument("--resumes", type=int, default=50, help="Synthetic resumes in the corpus")
+    parser.add_argument("--jobs", type=int, default=10, help="Synthetic job descriptions in the corpus")
+    parser.add_argument("--seed", type=int, default=1234, help="Corpus seed; the same seed gives the same corpus")
+    parser.add_argument("--batch-size", type=int, default=20, help="Resumes per call of the batch scoring functions")
+    parser.add_argument("--gemini-latency", type=float, default=0.0, help="Milliseconds the fake Gemini client waits per call")
+    parser.add_argument("--only", nargs="+", metavar="CASE", help="Run only these cases")
+    parser.add_argument("--output", help="Write the results JSON here instead of stdout")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run to compare against")
+    parser.add_argument("--max-regression", type=float, default=DEFAULT_REGRESSION_THRESHOLD * 100,
+                        help="Exit with status 1 when a p50 or p95 latency grows by more than this percentage")
+    args = parser.parse_args(argv)
+
+    results = run_suite(
+        iterations=args.iterations,
+        warmup=args.warmup,
+        resumes=args.resumes,
+        jobs=args.jobs,
+        seed=args.seed,
+        batch_size=args.batch_size,
+        gemini_latency=args.gemini_latency / 1000,
+        only=args.only,
+    )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    rows = compare(results, baseline, args.max_regression / 100)
+    print(f"\nCompared with {args.baseline} (commit {baseline.get('meta', {}).get('git_commit')}):", file=sys.stderr)
+    for row in rows:
+        flag = "  REGRESSION" if row['regression'] else ""
+        print(f"  {row['name']:<34} {row['metric']:<7} {row['baseline']:10.2f} -> {row['current']:10.2f} ms "
+              f"({row['change']:+.1%}){flag}", file=sys.stderr)
+    return 1 if any(row['regression'] for row in rows) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+import json
+import os
+import random
+
+TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "utils", "skill_taxonomy.json")
+
+FIRST_NAMES = ["Alex", "Sam", "Jordan", "Taylor", "Morgan", "Casey", "Riley", "Jamie", "Avery", "Quinn"]
+LAST_NAMES = ["Smith", "Garcia", "Chen", "Okafor", "Novak", "Patel", "Larsen", "Moreau", "Silva", "Kim"]
+TITLES = ["Software Engineer", "Backend Developer", "Data Engineer", "Full Stack Developer",
+          "DevOps Engineer", "Machine Learning Engineer", "Frontend Developer", "Data Analyst"]
+COMPANIES = ["Acme Corp", "Globex", "Initech", "Umbrella Labs", "Stark Industries", "Wayne Systems",
+             "Hooli", "Vandelay Imports", "Soylent Analytics", "Cyberdyne"]
+VERBS = ["Built", "Designed", "Led", "Maintained", "Migrated", "Optimized", "Automated", "Delivered",
+         "Scaled", "Refactored", "Implemented", "Monitored"]
+OBJECTS = ["a billing service", "the data pipeline", "customer dashboards", "an internal API",
+           "the deployment process", "search ranking", "a reporting platform", "the mobile backend",
+           "fraud detection models", "integration tests"]
+OUTCOMES = ["reducing latency by {n}%", "serving {n} thousand users", "cutting costs by {n}%",
+            "improving reliability to {n}.9% uptime", "saving {n} hours per week", "for {n} enterprise clients"]
+DEGREES = ["B.Sc. Computer Science", "M.Sc. Software Engineering", "B.Eng. Electrical Engineering",
+           "B.A. Mathematics", "M.Sc. Data Science"]
+
+def load_skills():
+    """Canonical skills of the taxonomy by category, so generated text exercises the skills matching"""
+    with open(TAXONOMY_PATH, encoding='utf-8') as f:
+        taxonomy = json.load(f)
+    return {category: sorted(skills) for category, skills in taxonomy.items()}
+
+def make_resume_text(rng, skills, index):
+    """One synthetic resume of a few hundred words"""
+    technical = rng.sample(skills['technical'], 8)
+    soft = rng.sample(skills['soft'], 3)
+    lines = [
+        f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} - {rng.choice(TITLES)}",
+        f"Candidate {index}. Engineer with {rng.randint(1, 15)} years of experience in "
+        f"{', '.join(technical[:3])} and a focus on {soft[0]} and {soft[1]}.",
+        "",
+        "Experience",
+    ]
+    for _ in range(rng.randint(2, 4)):
+        lines.append(f"{rng.choice(TITLES)} at {rng.choice(COMPANIES)} ({rng.randint(2008, 2020)} - {rng.randint(2021, 2025)})")
+        for _ in range(rng.randint(3, 5)):
+            outcome = rng.choice(OUTCOMES).format(n=rng.randint(5, 95))
+            lines.append(f"- {rng.choice(VERBS)} {rng.choice(OBJECTS)} using {rng.choice(technical)} "
+                         f"and {rng.choice(technical)}, {outcome}.")
+    lines += [
+        "",
+        "Skills",
+        ", ".join(technical + soft),
+        "",
+        "Education",
+        f"{rng.choice(DEGREES)}, {rng.choice(COMPANIES)} University, {rng.randint(2000, 2020)}",
+    ]
+    return "\n".join(lines)
+
+def make_job_text(rng, skills, index):
+    """One synthetic job description"""
+    required = rng.sample(skills['technical'], 6)
+    soft = rng.sample(skills['soft'], 2)
+    lines = [
+        f"{rng.choice(TITLES)} (posting {index}) at {rng.choice(COMPANIES)}",
+        "We are looking for an engineer to join a growing product team.",
+        "",
+        "Responsibilities",
+    ]
+    lines += [f"- {rng.choice(VERBS)} {rng.choice(OBJECTS)} with {rng.choice(required)}." for _ in range(5)]
+    lines += [
+        "",
+        "Requirements",
+        f"- {rng.randint(2, 8)}+ years of experience with {', '.join(required[:3])}.",
+        f"- Working knowledge of {', '.join(required[3:])}.",
+        f"- Strong {soft[0]} and {soft[1]} skills.",
+    ]
+    return "\n".join(lines)
+
+def make_pdf(pages):
+    """Minimal PDF with one page per text, Helvetica 10pt, readable by PyPDF2"""
+    objects = [
+        "<< /Type /Catalog /Pages 2 0 R >>",
+        None,
+        "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for text in pages:
+        escaped = [line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') for line in text.split("\n")]
+        stream = "BT /F1 10 Tf 50 750 Td 12 TL " + " ".join(f"({line}) Tj T*" for line in escaped) + " ET"
+        kids.append(f"{len(objects) + 1} 0 R")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects) + 2} 0 R >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1')
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode('latin-1')
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1')
+    return bytes(out)
+
+def split_pages(text, lines_per_page=55):
+    lines = text.split("\n")
+    return ["\n".join(lines[start:start + lines_per_page]) for start in range(0, len(lines), lines_per_page)]
+
+class Corpus:
+    """Synthetic resumes (text and PDF) and job descriptions, identical for the same seed"""
+
+    def __init__(self, resumes=50, jobs=10, seed=1234):
+        rng = random.Random(seed)
+        skills = load_skills()
+        self.seed = seed
+        self.resume_texts = [make_resume_text(rng, skills, i) for i in range(resumes)]
+        self.job_texts = [make_job_text(rng, skills, i) for i in range(jobs)]
+        self.resume_pdfs = [make_pdf(split_pages(text)) for text in self.resume_texts]
+
+    def describe(self):
+        return {
+            'seed': self.seed,
+            'resumes': len(self.resume_texts),
+            'jobs': len(self.job_texts),
+            'resume_words': sum(len(text.split()) for text in self.resume_texts) // max(1, len(self.resume_texts)),
+            'pdf_bytes': sum(len(pdf) for pdf in self.resume_pdfs) // max(1, len(self.resume_pdfs)),
+        }
@@ -0,0 +1,60 @@
+import time
+import hashlib
+import threading
+from types import SimpleNamespace
+import numpy as np
+
+SUGGESTIONS_TEXT = (
+    "1. Highlight Core Skills: Move the skills the posting asks for into the summary.\n"
+    "2. Quantify Impact: Add numbers to the most relevant achievements.\n"
+    "3. Mirror Terminology: Use the job description's wording for the tools you know."
+)
+
+class FakeGeminiClient:
+    """Deterministic local stand-in for the Gemini client
+
+    Embeddings are unit vectors seeded from a hash of each text, so the same
+    text always gets the same vector and runs are comparable. latency adds a
+    fixed delay per call to model network time; it is 0 by default so only
+    local work is measured.
+    """
+
+    def __init__(self, dimensions=768, latency=0.0):
+        self.dimensions = dimensions
+        self.latency = latency
+        self.models = _FakeModels(self)
+        self.calls = {'embed_content': 0, 'generate_content': 0}
+        self._lock = threading.Lock()
+
+    def _call(self, operation):
+        with self._lock:
+            self.calls[operation] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def embed(self, text):
+        seed = int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'little')
+        vector = np.random.default_rng(seed).standard_normal(self.dimensions)
+        return vector / np.linalg.norm(vector)
+
+    def stats(self):
+        """Same shape as ResilientGeminiClient.stats(), for /metrics"""
+        counters = {f"gemini.{operation}.calls": calls for operation, calls in self.calls.items()}
+        counters["circuit_state"] = "closed"
+        return counters
+
+class _FakeModels:
+    def __init__(self, client):
+        self._client = client
+
+    def embed_content(self, model, contents, config=None):
+        self._client._call('embed_content')
+        if isinstance(contents, str):
+            contents = [contents]
+        return SimpleNamespace(embeddings=[
+            SimpleNamespace(values=self._client.embed(text).tolist()) for text in contents
+        ])
+
+    def generate_content(self, model, contents, config=None):
+        self._client._call('generate_content')
+        return SimpleNamespace(text=SUGGESTIONS_TEXT)
@@ -0,0 +1,207 @@
+import io
+import os
+import sys
+import time
+import logging
+import platform
+import tempfile
+import subprocess
+from datetime import datetime
+import numpy as np
+from benchmarks.corpus import Corpus, make_pdf, split_pages
+from benchmarks.fake_gemini import FakeGeminiClient
+
+# Latency percentiles reported for every case
+PERCENTILES = (50, 95, 99)
+
+# A case is slower than the baseline when one of these latencies grows by more than
+# the threshold; p99 of a few dozen calls is too noisy to gate on
+REGRESSION_METRICS = ('p50_ms', 'p95_ms')
+DEFAULT_REGRESSION_THRESHOLD = 0.10
+
+def isolate_environment(workdir):
+    """Point every database, cache and state file at workdir before the app is imported
+
+    Shared caches would otherwise carry results from one case (or one run)
+    to the next and make timings depend on history.
+    """
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(workdir, 'benchmark.db')}"
+    os.environ["EMBEDDING_BACKEND"] = "gemini"
+    os.environ["EMBEDDING_FALLBACK_BACKEND"] = ""
+    os.environ["EMBEDDING_CACHE_PATH"] = ""
+    os.environ["EMBEDDING_STORE_PATH"] = os.path.join(workdir, "embedding_store")
+    os.environ["GEMINI_STATE_PATH"] = ""
+    os.environ["METRICS_PATH"] = ""
+    os.environ["ASYNC_ANALYSIS"] = "0"
+
+def summarize(latencies, items_per_call=1):
+    """Throughput and latency percentiles (milliseconds) of one case"""
+    latencies = np.asarray(latencies)
+    summary = {
+        'calls': int(len(latencies)),
+        'items_per_call': items_per_call,
+        'throughput_per_s': float(len(latencies) * items_per_call / latencies.sum()) if latencies.sum() else None,
+        'mean_ms': float(latencies.mean() * 1000),
+        'min_ms': float(latencies.min() * 1000),
+        'max_ms': float(latencies.max() * 1000),
+    }
+    for percentile in PERCENTILES:
+        summary[f'p{percentile}_ms'] = float(np.percentile(latencies, percentile) * 1000)
+    return summary
+
+def measure(fn, iterations, warmup=0, setup=None, items_per_call=1):
+    """Time fn over warmup + iterations calls; setup(i) builds each call's arguments outside the timing"""
+    latencies = []
+    for i in range(warmup + iterations):
+        args = setup(i) if setup else ()
+        started = time.perf_counter()
+        fn(*args)
+        elapsed = time.perf_counter() - started
+        if i >= warmup:
+            latencies.append(elapsed)
+    return summarize(latencies, items_per_call)
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+def build_cases(corpus, app, batch_size):
+    """(name, fn, setup, items_per_call) of every benchmark case"""
+    from utils.file_processor import extract_text_from_pdf
+    from utils.nlp_analyzer import DocumentAnalysis, analyze_document, extract_keywords
+    from utils import match_calculator as mc
+
+    resumes = corpus.resume_texts
+    jobs = corpus.job_texts
+    resume_analyses = [analyze_document(text) for text in resumes]
+    job_analyses = [analyze_document(text) for text in jobs]
+
+    def fresh(analysis):
+        # A copy without an embedding, so the semantic cases pay for embedding it
+        return DocumentAnalysis.from_dict(analysis.text, analysis.to_dict())
+
+    def pair(i, embed=False):
+        r, j = i % len(resumes), i % len(jobs)
+        if embed:
+            mc.embedding_cache.clear()
+            return resumes[r], jobs[j], fresh(resume_analyses[r]), fresh(job_analyses[j])
+        return resumes[r], jobs[j], resume_analyses[r], job_analyses[j]
+
+    def batch(i, embed=False):
+        start = (i * batch_size) % len(resumes)
+        indexes = [(start + k) % len(resumes) for k in range(batch_size)]
+        j = i % len(jobs)
+        analyses = [resume_analyses[k] for k in indexes]
+        job_analysis = job_analyses[j]
+        if embed:
+            mc.embedding_cache.clear()
+            analyses = [fresh(analysis) for analysis in analyses]
+            job_analysis = fresh(job_analysis)
+        return [resumes[k] for k in indexes], jobs[j], analyses, job_analysis
+
+    client = app.test_client()
+    client.post('/register', data={'username': 'bench', 'email': 'bench@example.com', 'password': 'bench'})
+    client.post('/login', data={'username': 'bench', 'password': 'bench'})
+
+    def upload(pdf, job_text):
+        response = client.post('/upload', data={'resume': (io.BytesIO(pdf), 'resume.pdf'), 'job_description': job_text},
+                               content_type='multipart/form-data')
+        if response.status_code != 302 or '/results/' not in response.headers.get('Location', ''):
+            raise RuntimeError(f"/upload failed with status {response.status_code}")
+
+    def new_upload(i):
+        # Every call uploads a file the resume store has not seen, so the whole pipeline runs
+        text = f"{resumes[i % len(resumes)]}\nReference {i}"
+        return make_pdf(split_pages(text)), jobs[i % len(jobs)]
+
+    repeated = (corpus.resume_pdfs[0], jobs[0])
+
+    return [
+        ('extract_text_from_pdf', extract_text_from_pdf,
+         lambda i: (corpus.resume_pdfs[i % len(resumes)],), 1),
+        ('extract_keywords', extract_keywords, lambda i: (resumes[i % len(resumes)],), 1),
+        ('calculate_semantic_similarity', mc.calculate_semantic_similarity, lambda i: pair(i, embed=True), 1),
+        ('calculate_keyword_similarity', mc.calculate_keyword_similarity, pair, 1),
+        ('calculate_skills_match', mc.calculate_skills_match, lambda i: pair(i)[:2], 1),
+        ('calculate_match_score', mc.calculate_match_score, lambda i: pair(i, embed=True), 1),
+        ('calculate_semantic_similarities', mc.calculate_semantic_similarities,
+         lambda i: batch(i, embed=True), batch_size),
+        ('calculate_keyword_similarities', mc.calculate_keyword_similarities, lambda i: batch(i)[2:], batch_size),
+        ('calculate_skills_matches', mc.calculate_skills_matches, lambda i: batch(i)[:2], batch_size),
+        ('calculate_match_scores', mc.calculate_match_scores, lambda i: batch(i, embed=True), batch_size),
+        ('upload', upload, new_upload, 1),
+        ('upload_repeated', upload, lambda i: repeated, 1),
+    ]
+
+def run_suite(iterations=50, warmup=5, resumes=50, jobs=10, seed=1234, batch_size=20, gemini_latency=0.0,
+              only=None, workdir=None):
+    """Run every benchmark case (or those named in only) and return the results document"""
+    workdir = workdir or tempfile.mkdtemp(prefix="resume-matcher-bench-")
+    isolate_environment(workdir)
+
+    from app import app
+    from utils import match_calculator as mc
+    from utils.nlp_analyzer import SPACY_MODEL, get_nlp
+
+    # Debug logging on every call would dominate the timings
+    logging.getLogger().setLevel(logging.WARNING)
+    if not get_nlp():
+        raise RuntimeError(f"spaCy model {SPACY_MODEL} is not installed; run: python -m spacy download {SPACY_MODEL}")
+
+    fake_client = FakeGeminiClient(latency=gemini_latency)
+    mc.client = fake_client
+
+    corpus = Corpus(resumes=resumes, jobs=jobs, seed=seed)
+    results = {}
+    with app.app_context():
+        for name, fn, setup, items_per_call in build_cases(corpus, app, batch_size):
+            if only and name not in only:
+                continue
+            results[name] = measure(fn, iterations, warmup, setup, items_per_call)
+            print(f"{name}: p50 {results[name]['p50_ms']:.2f} ms, p95 {results[name]['p95_ms']:.2f} ms", file=sys.stderr)
+
+    return {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'iterations': iterations,
+            'warmup': warmup,
+            'batch_size': batch_size,
+            'gemini_latency_ms': gemini_latency * 1000,
+            'match_execution_mode': mc.MATCH_EXECUTION_MODE,
+            'corpus': corpus.describe(),
+            'gemini_calls': fake_client.calls,
+            'workdir': workdir,
+        },
+        'results': results,
+    }
+
+def compare(current, baseline, threshold=DEFAULT_REGRESSION_THRESHOLD):
+    """Per case and latency percentile, the change from baseline to current
+
+    Returns dicts with name, metric, baseline, current, change (a fraction)
+    and regression, True when a REGRESSION_METRICS latency grew by more than threshold.
+    """
+    rows = []
+    for name, result in current['results'].items():
+        before = baseline.get('results', {}).get(name)
+        if before is None:
+            continue
+        for metric in [f'p{percentile}_ms' for percentile in PERCENTILES]:
+            if not before.get(metric):
+                continue
+            change = result[metric] / before[metric] - 1
+            rows.append({
+                'name': name,
+                'metric': metric,
+                'baseline': before[metric],
+                'current': result[metric],
+                'change': change,
+                'regression': metric in REGRESSION_METRICS and change > threshold,
+            })
+    return rows
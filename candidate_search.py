@@ -0,0 +1,162 @@
+import os
+import time
+import logging
+import threading
+import numpy as np
+from sqlalchemy import func
+from app import db
+from models import MatchResult, ResumeDocument
+from resume_store import embedding_key, get_embedding_store, load_analysis, save_embedding
+from utils.nlp_analyzer import analyze_document
+from utils.match_calculator import calculate_match_scores, embed_analyses, embedding_model
+from utils.vector_index import ExactIndex, IVFIndex
+
+# "exact" scans every stored embedding; "ivf" uses the approximate k-means index
+# once the store holds at least CANDIDATE_IVF_MIN_ROWS embeddings
+CANDIDATE_INDEX = os.environ.get("CANDIDATE_INDEX", "exact")
+CANDIDATE_IVF_MIN_ROWS = int(os.environ.get("CANDIDATE_IVF_MIN_ROWS", "20000"))
+CANDIDATE_IVF_PROBES = int(os.environ.get("CANDIDATE_IVF_PROBES", "8"))
+# The index is rebuilt this often; resumes stored in between are searched exactly
+CANDIDATE_INDEX_MAX_AGE = int(os.environ.get("CANDIDATE_INDEX_MAX_AGE", "600"))
+# Nearest neighbours fetched per requested candidate before full re-ranking
+CANDIDATE_RERANK_FACTOR = 3
+# Most candidates one search may ask for, since each is fully re-scored
+CANDIDATE_MAX_TOP = 50
+
+_indexes = None
+_index_max_id = 0
+_index_built_at = 0.0
+_index_lock = threading.Lock()
+
+def load_blob_embeddings(after_id=0):
+    """Return (ids, matrix) of resume embeddings kept as database blobs, for ids > after_id"""
+    rows = db.session.query(ResumeDocument.id, ResumeDocument.embedding)\
+                     .filter(ResumeDocument.id > after_id,
+                             ResumeDocument.embedding.isnot(None),
+                             ResumeDocument.embedding_model == embedding_model())\
+                     .order_by(ResumeDocument.id).all()
+    if not rows:
+        return np.zeros(0, dtype=np.int64), np.zeros((0, 0), dtype=np.float32)
+    ids = np.array([document_id for document_id, _ in rows], dtype=np.int64)
+    matrix = np.vstack([np.frombuffer(blob, dtype=np.float32) for _, blob in rows])
+    return ids, matrix
+
+def load_store_embeddings(embedding_store, after_id=0):
+    """Return (ids, matrix) of resume embeddings in the embedding store, for ids > after_id
+
+    For a full load the matrix is the store's memory map itself and ids
+    gives the document of each row (-1 for rows no document uses), so no
+    vectors are copied. Later loads copy just the few new rows.
+    """
+    documents = db.session.query(ResumeDocument.id, ResumeDocument.content_hash)\
+                          .filter(ResumeDocument.id > after_id,
+                                  ResumeDocument.embedding.is_(None),
+                                  ResumeDocument.embedding_model == embedding_model()).all()
+    keys = {embedding_key(content_hash, embedding_model()): document_id for document_id, content_hash in documents}
+    vectors = embedding_store.vectors()
+    rows = {row: keys[key] for key, row in embedding_store.rows(keys).items() if row < len(vectors)}
+
+    if after_id:
+        ordered = sorted(rows)
+        return np.array([rows[row] for row in ordered], dtype=np.int64), vectors[ordered]
+
+    ids = np.full(len(vectors), -1, dtype=np.int64)
+    ids[list(rows)] = list(rows.values())
+    return ids, vectors
+
+def build_indexes(after_id=0, approximate=False):
+    """Indexes over every stored resume embedding with id > after_id"""
+    sources = [load_blob_embeddings(after_id)]
+    embedding_store = get_embedding_store(embedding_model())
+    if embedding_store is not None:
+        sources.append(load_store_embeddings(embedding_store, after_id))
+
+    indexes = []
+    for (ids, matrix), row_norm in zip(sources, [None, embedding_store and embedding_store.row_norm]):
+        if not (ids >= 0).any():
+            continue
+        if approximate and len(ids) >= CANDIDATE_IVF_MIN_ROWS:
+            indexes.append(IVFIndex(ids, matrix, row_norm, n_probe=CANDIDATE_IVF_PROBES))
+        else:
+            indexes.append(ExactIndex(ids, matrix, row_norm))
+    return indexes
+
+def get_candidate_indexes():
+    """Return (indexes, max indexed id), rebuilding them once older than CANDIDATE_INDEX_MAX_AGE"""
+    global _indexes, _index_max_id, _index_built_at
+    with _index_lock:
+        if _indexes is None or time.time() - _index_built_at > CANDIDATE_INDEX_MAX_AGE:
+            started = time.time()
+            _index_max_id = db.session.query(func.coalesce(func.max(ResumeDocument.id), 0)).scalar()
+            _indexes = build_indexes(approximate=CANDIDATE_INDEX == "ivf")
+            _index_built_at = time.time()
+            logging.info(f"Built {[type(index).__name__ for index in _indexes]} over "
+                         f"{sum(len(index) for index in _indexes)} rows in {_index_built_at - started:.2f}s")
+        return _indexes, _index_max_id
+
+def search_resumes(query_vector, k, allowed_ids=None):
+    """Nearest stored resumes to query_vector as [(document id, cosine similarity)]"""
+    indexes, max_id = get_candidate_indexes()
+
+    # Resumes stored since the last rebuild are few, so scan them exactly
+    best = {}
+    for index in indexes + build_indexes(after_id=max_id):
+        for document_id, similarity in index.search(query_vector, k, allowed_ids):
+            best[document_id] = max(similarity, best.get(document_id, -1.0))
+
+    return sorted(best.items(), key=lambda hit: hit[1], reverse=True)[:k]
+
+def find_candidates(user_id, job_text, k=10):
+    """Best matching resumes this user has uploaded before, for a new job description
+
+    The vector index narrows the user's stored resumes to the nearest
+    k * CANDIDATE_RERANK_FACTOR by embedding, then those are re-ranked with
+    the full match score. Returns dicts with the document, its latest
+    filename and result, the cosine similarity and the match score.
+    """
+    job_analysis = analyze_document(job_text, entities=False)
+    # Stored resumes are indexed by the primary backend only, so a fallback vector cannot be searched
+    if embed_analyses([job_analysis]) is None or job_analysis.embedding_model != embedding_model():
+        logging.error("Could not embed job description for candidate search")
+        return []
+
+    # Most recent result per resume the user uploaded
+    latest = db.session.query(MatchResult.resume_document_id, func.max(MatchResult.id))\
+                       .filter(MatchResult.user_id == user_id, MatchResult.resume_document_id.isnot(None))\
+                       .group_by(MatchResult.resume_document_id).all()
+    latest_result_ids = dict(latest)
+    if not latest_result_ids:
+        return []
+
+    hits = search_resumes(job_analysis.embedding, k * CANDIDATE_RERANK_FACTOR, latest_result_ids.keys())
+    documents = {document.id: document for document in
+                 ResumeDocument.query.filter(ResumeDocument.id.in_([document_id for document_id, _ in hits]))}
+    hits = [(document_id, similarity) for document_id, similarity in hits if document_id in documents]
+    if not hits:
+        return []
+
+    results = {result.id: result for result in
+               MatchResult.query.filter(MatchResult.id.in_([latest_result_ids[document_id] for document_id, _ in hits]))}
+    resume_analyses = [load_analysis(documents[document_id]) for document_id, _ in hits]
+    # Candidates are ordered by score rather than cut at a threshold, so cascade scoring would not help
+    scores = calculate_match_scores(
+        [documents[document_id].text for document_id, _ in hits], job_text, resume_analyses, job_analysis,
+        cascade=False
+    )
+
+    for (document_id, _), analysis in zip(hits, resume_analyses):
+        save_embedding(documents[document_id], analysis)
+    db.session.commit()
+
+    candidates = []
+    for (document_id, similarity), score in zip(hits, scores['final']):
+        result = results[latest_result_ids[document_id]]
+        candidates.append({
+            'document': documents[document_id],
+            'filename': result.resume_filename,
+            'result': result,
+            'similarity': similarity,
+            'match_score': float(score),
+        })
+    candidates.sort(key=lambda candidate: candidate['match_score'], reverse=True)
+    return candidates[:k]
@@ -0,0 +1,169 @@
+import os
+import click
+from app import app, db
+from match_memo import purge_match_memos
+from models import JobProfile, ResumeDocument, User
+from job_profiles import evict_job_documents, update_job_profile_text
+from pipeline import rank_resumes
+from rescoring import rescore_results
+from resume_store import embed_resume_documents, evict_resume_documents, get_resume_document, reanalyze_resume_documents
+from utils.embedding_backends import LsaBackend, fit_lsa_model, save_lsa_model
+from utils.embedding_cache import text_hash
+from utils.match_calculator import LSA_MODEL_PATH
+from utils.file_processor import extract_text_from_pdf, extract_text_from_txt, file_sha256
+
+def collect_pdf_paths(paths):
+    """Expand folders into the PDF files they contain, keeping the given order"""
+    pdf_paths = []
+    for path in paths:
+        if os.path.isdir(path):
+            pdf_paths.extend(
+                os.path.join(path, name) for name in sorted(os.listdir(path))
+                if name.lower().endswith('.pdf')
+            )
+        else:
+            pdf_paths.append(path)
+    return pdf_paths
+
+@app.cli.command('rank-resumes')
+@click.argument('job_file', type=click.Path(exists=True, dir_okay=False))
+@click.argument('resumes', nargs=-1, required=True, type=click.Path(exists=True))
+@click.option('--user', 'username', required=True, help='Username that will own the stored results.')
+@click.option('--top', default=0, help='Only print the N best matches.')
+def rank_resumes_command(job_file, resumes, username, top):
+    """Rank resume PDFs (files or folders) against a job description text file."""
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        raise click.ClickException(f"Unknown user: {username}")
+
+    job_text = extract_text_from_txt(job_file)
+    if not job_text:
+        raise click.ClickException(f"No text found in {job_file}")
+
+    documents = []
+    for path in collect_pdf_paths(resumes):
+        with open(path, 'rb') as file:
+            data = file.read()
+        document = get_resume_document(file_sha256(data), lambda: extract_text_from_pdf(data))
+        if document:
+            documents.append((os.path.basename(path), document))
+        else:
+            click.echo(f"Skipping {path}: no text extracted", err=True)
+
+    if not documents:
+        raise click.ClickException("No resumes could be processed")
+
+    ranked = rank_resumes(user.id, documents, job_text, job_label=os.path.basename(job_file))
+    for rank, result in enumerate(ranked[:top or None], start=1):
+        click.echo(f"{rank:>4}  {result.match_score:6.2f}%  {result.resume_filename}")
+
+@app.cli.command('analysis-worker')
+@click.option('--processes', default=2, help='Number of worker processes.')
+@click.option('--poll-interval', default=1.0, help='Seconds to wait when the queue is empty.')
+def analysis_worker_command(processes, poll_interval):
+    """Run background workers that process queued resume analyses."""
+    from tasks import start_worker_pool, stop_worker_pool
+
+    workers = start_worker_pool(processes, poll_interval)
+    click.echo(f"Started {len(workers)} analysis workers")
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        click.echo("Stopping analysis workers")
+    finally:
+        stop_worker_pool(workers)
+
+@app.cli.command('evict-resume-documents')
+def evict_resume_documents_command():
+    """Remove stored resumes that are too old or over the size budget."""
+    deleted = evict_resume_documents()
+    click.echo(f"Evicted {deleted} stored resumes")
+
+@app.cli.command('evict-job-documents')
+def evict_job_documents_command():
+    """Remove stored job descriptions no result or profile uses any more."""
+    deleted = evict_job_documents()
+    click.echo(f"Evicted {deleted} stored job descriptions")
+
+@app.cli.command('reanalyze-resume-documents')
+@click.option('--batch-size', default=None, type=int, help='Documents per spaCy batch.')
+@click.option('--processes', default=None, type=int, help='spaCy worker processes.')
+def reanalyze_resume_documents_command(batch_size, processes):
+    """Re-run keyword and entity extraction over every stored resume."""
+    updated = reanalyze_resume_documents(batch_size=batch_size, n_process=processes)
+    click.echo(f"Re-analyzed {updated} stored resumes")
+
+@app.cli.command('purge-match-memo')
+@click.option('--all', 'everything', is_flag=True, help='Clear every memoized score, not just stale ones.')
+def purge_match_memo_command(everything):
+    """Remove memoized match scores that expired or predate the current scoring config."""
+    deleted = purge_match_memos(everything)
+    click.echo(f"Purged {deleted} memoized match scores")
+
+@app.cli.command('rescore-results')
+@click.option('--job-file', type=click.Path(exists=True, dir_okay=False),
+              help='Edited job description text file to rescore against.')
+@click.option('--previous-job-file', type=click.Path(exists=True, dir_okay=False),
+              help='Job description text file the results were scored against.')
+@click.option('--job-profile', 'profile_id', type=int, help='Saved job profile whose text --job-file replaces.')
+@click.option('--all', 'everything', is_flag=True,
+              help='Re-blend every result, not just those scored under another config.')
+@click.option('--batch-size', default=None, type=int, help='Results read and committed per batch.')
+@click.option('--dry-run', is_flag=True, help='Report what would change without writing anything.')
+def rescore_results_command(job_file, previous_job_file, profile_id, everything, batch_size, dry_run):
+    """Bring stored results up to date after a scoring config or job description change.
+
+    Method scores whose inputs did not change are re-blended with the current
+    weights; only the stale ones are recomputed.
+    """
+    previous_job_hash = job_text = None
+    if job_file:
+        if bool(previous_job_file) == bool(profile_id):
+            raise click.UsageError("--job-file needs exactly one of --previous-job-file or --job-profile")
+        job_text = extract_text_from_txt(job_file)
+        if not job_text:
+            raise click.ClickException(f"No text found in {job_file}")
+    elif previous_job_file or profile_id:
+        raise click.UsageError("--previous-job-file and --job-profile need --job-file")
+
+    if previous_job_file:
+        previous_job_hash = text_hash(extract_text_from_txt(previous_job_file) or '')
+    elif profile_id:
+        profile = db.session.get(JobProfile, profile_id)
+        if profile is None:
+            raise click.ClickException(f"Unknown job profile: {profile_id}")
+        previous_job_hash = profile.content_hash
+        if not dry_run and previous_job_hash != text_hash(job_text):
+            if JobProfile.query.filter_by(user_id=profile.user_id, content_hash=text_hash(job_text)).first():
+                raise click.ClickException("The user already has a job profile with this text")
+            update_job_profile_text(profile, job_text)
+
+    def progress(stats):
+        click.echo(f"Rescored {stats['updated']} of {stats['results']} results", err=True)
+
+    stats = rescore_results(previous_job_hash, job_text, everything=everything, batch_size=batch_size,
+                            dry_run=dry_run, progress=progress)
+    recomputed = ', '.join(f"{method} {count}" for method, count in stats['recomputed'].items())
+    click.echo(f"{'Would update' if dry_run else 'Updated'} {stats['updated']} of {stats['results']} results: "
+               f"{stats['reblended']} re-blended only, recomputed {recomputed}; "
+               f"{stats['skipped']} skipped without stored inputs")
+
+@app.cli.command('fit-embedding-model')
+@click.option('--components', default=256, show_default=True, help='Dimensions of the LSA embeddings.')
+def fit_embedding_model_command(components):
+    """Fit the local TF-IDF/LSA embedding model on every stored resume and embed them with it."""
+    texts = [text for text, in ResumeDocument.query.with_entities(ResumeDocument.text)]
+    if len(texts) < 2:
+        raise click.ClickException("Need at least two stored resumes to fit an embedding model")
+    save_lsa_model(fit_lsa_model(texts, n_components=components), LSA_MODEL_PATH)
+    click.echo(f"Fitted embedding model on {len(texts)} resumes, saved to {LSA_MODEL_PATH}")
+    embedded = embed_resume_documents(LsaBackend(LSA_MODEL_PATH))
+    click.echo(f"Embedded {embedded} stored resumes")
+
+@app.cli.command('gemini-stats')
+def gemini_stats_command():
+    """Show Gemini call, error, retry and latency counters summed over every worker."""
+    from utils.match_calculator import client
+    for name, value in sorted(client.stats().items()):
+        click.echo(f"{name} {value}")
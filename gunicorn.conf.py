@@ -0,0 +1,38 @@
+# Gunicorn picks this file up automatically from the working directory.
+import gc
+import os
+
+# Import the app and load the NLP models in the master so forked workers
+# share those memory pages copy-on-write instead of loading their own copy
+preload_app = os.environ.get("PRELOAD_APP", "0") == "1"
+
+analysis_workers = []
+
+def when_ready(server):
+    """Warm shared models and start the background analysis workers, from the master process"""
+    if preload_app:
+        from utils.nlp_analyzer import get_nlp
+        from utils.skill_matcher import get_skill_matcher
+        get_nlp()
+        get_skill_matcher()
+        # Keep the collector from touching (and so copying) the preloaded objects in workers
+        gc.freeze()
+        server.log.info("Preloaded NLP models in the master process")
+
+    processes = int(os.environ.get("ANALYSIS_WORKERS", "0"))
+    if processes > 0:
+        from tasks import start_worker_pool
+        analysis_workers.extend(start_worker_pool(processes))
+        server.log.info(f"Started {processes} analysis workers")
+
+def post_fork(server, worker):
+    if preload_app:
+        # Database connections opened in the master must not be shared with workers
+        from app import db, app
+        with app.app_context():
+            db.engine.dispose(close=False)
+
+def on_exit(server):
+    if analysis_workers:
+        from tasks import stop_worker_pool
+        stop_worker_pool(analysis_workers)
@@ -0,0 +1,79 @@
+import base64
+from datetime import datetime
+from sqlalchemy import and_, exists, func, tuple_
+from sqlalchemy.orm import load_only
+from app import db
+from models import MatchResult, ResultKeyword
+
+# Results per history page and per "load more" request
+HISTORY_PAGE_SIZE = 25
+
+def results_with_keyword(user_id, keyword, side='resume'):
+    """Query of the user's results whose resume (or job) keywords include keyword"""
+    return MatchResult.query.filter(MatchResult.user_id == user_id, has_keyword(keyword, side))
+
+def results_missing_keyword(user_id, keyword, side='resume'):
+    """Query of the user's results whose resume (or job) keywords lack keyword"""
+    return MatchResult.query.filter(MatchResult.user_id == user_id, ~has_keyword(keyword, side))
+
+def has_keyword(keyword, side):
+    return exists().where(and_(
+        ResultKeyword.result_id == MatchResult.id,
+        ResultKeyword.side == side,
+        ResultKeyword.keyword == keyword.lower()
+    ))
+
+def encode_cursor(result):
+    """Opaque cursor pointing just after result in newest-first order"""
+    raw = f"{result.created_at.isoformat()}|{result.id}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor):
+    """(created_at, id) from encode_cursor(), or None if the cursor is not valid"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode('utf-8')
+        created_at, result_id = raw.split('|')
+        return datetime.fromisoformat(created_at), int(result_id)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+def history_page(user_id, cursor=None, limit=HISTORY_PAGE_SIZE, missing=None):
+    """One page of the user's results, newest first, and the cursor of the next page
+
+    Pages are found by (created_at, id) instead of an offset, so every page
+    is an index range scan however deep the user pages. Only the columns a
+    list shows are loaded; the keyword and suggestion documents stay deferred.
+    Returns (results, next_cursor), next_cursor being None on the last page.
+    """
+    query = results_missing_keyword(user_id, missing) if missing else MatchResult.query.filter_by(user_id=user_id)
+    query = query.options(load_only(
+        MatchResult.id, MatchResult.created_at, MatchResult.resume_filename,
+        MatchResult.job_description_filename, MatchResult.match_score
+    ))
+
+    position = decode_cursor(cursor) if cursor else None
+    if position is not None:
+        query = query.filter(tuple_(MatchResult.created_at, MatchResult.id) < position)
+
+    # One extra row tells whether there is a next page
+    results = query.order_by(MatchResult.created_at.desc(), MatchResult.id.desc()).limit(limit + 1).all()
+    if len(results) > limit:
+        return results[:limit], encode_cursor(results[limit - 1])
+    return results, None
+
+def history_stats(user_id):
+    """Count, best and average score over all of the user's results"""
+    count, best, average = db.session.query(
+        func.count(MatchResult.id), func.max(MatchResult.match_score), func.avg(MatchResult.match_score)
+    ).filter(MatchResult.user_id == user_id).one()
+    return {'count': count, 'best': best or 0.0, 'average': average or 0.0}
+
+def history_item(result):
+    """JSON form of a result in a history list"""
+    return {
+        'id': result.id,
+        'created_at': result.created_at.strftime('%Y-%m-%d %H:%M'),
+        'resume_filename': result.resume_filename,
+        'job_description_filename': result.job_description_filename,
+        'match_score': result.match_score,
+    }
@@ -0,0 +1,153 @@
+import os
+import json
+import logging
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import exists, or_
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models import JobDocument, JobProfile, MatchResult
+from utils.embedding_cache import text_hash
+from utils.nlp_analyzer import DocumentAnalysis, analyze_document
+from utils.match_calculator import embed_analyses
+from utils.skill_matcher import get_skill_matcher
+
+# Stored job texts no result or profile refers to are evicted after this long unused
+JOB_STORE_MAX_AGE = timedelta(days=int(os.environ.get("JOB_STORE_MAX_AGE_DAYS", "30")))
+
+def create_job_profile(user_id, title, job_text):
+    """Analyze a job description once and save it as a JobProfile
+
+    Keywords, skills and the embedding are computed up front and kept on the
+    profile's JobDocument. Saving the same text again returns the existing
+    profile.
+    """
+    content_hash = text_hash(job_text)
+    profile = JobProfile.query.filter_by(user_id=user_id, content_hash=content_hash).first()
+    if profile is not None:
+        return profile
+
+    document = get_job_document(job_text, content_hash)
+    embed_job_document(document)
+    profile = JobProfile(user_id=user_id, title=title, content_hash=content_hash, job_document_id=document.id)
+
+    db.session.add(profile)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # The same posting was saved concurrently
+        db.session.rollback()
+        return JobProfile.query.filter_by(user_id=user_id, content_hash=content_hash).first()
+
+    logging.info(f"Created job profile {profile.id} for user {user_id}")
+    return profile
+
+def update_job_profile_text(profile, job_text):
+    """Point a JobProfile at a new text, analyzing it unless it is stored already
+
+    Returns the content hash of the previous text, whose results can then
+    be moved to the new one with rescoring.rescore_results.
+    """
+    previous_hash = profile.content_hash
+    document = get_job_document(job_text)
+    embed_job_document(document)
+    profile.content_hash = document.content_hash
+    profile.job_document_id = document.id
+    db.session.commit()
+    logging.info(f"Updated the text of job profile {profile.id}")
+    return previous_hash
+
+def get_job_profile(user_id, profile_id):
+    """The user's JobProfile with this id, or None"""
+    if not profile_id:
+        return None
+    return JobProfile.query.filter_by(id=profile_id, user_id=user_id).first()
+
+def get_job_document(job_text, content_hash=None):
+    """Return the stored JobDocument of a job text, creating it on a miss
+
+    The text is only parsed on a miss, so a job description seen before
+    costs no NLP work. Stored texts are what profiles and rescoring use.
+    """
+    content_hash = content_hash or text_hash(job_text)
+    document = JobDocument.query.filter_by(content_hash=content_hash).first()
+    if document is not None:
+        return document
+
+    analysis = analyze_document(job_text, entities=False)
+    document = JobDocument(content_hash=content_hash, text=job_text, analysis=json.dumps(analysis.to_dict()))
+    save_job_skills(document, get_skill_matcher().match(job_text))
+    db.session.add(document)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Stored concurrently by another worker
+        db.session.rollback()
+        return JobDocument.query.filter_by(content_hash=content_hash).first()
+
+    evict_job_documents()
+    return document
+
+def scoring_job_document(job_text, job_profile=None):
+    """The JobDocument a new result is scored against: the profile's, or the one of job_text"""
+    if job_profile is not None:
+        job_profile.last_used_at = datetime.utcnow()
+        return job_profile.job_document
+    return get_job_document(job_text)
+
+def embed_job_document(document):
+    """Compute and keep the embedding of a stored job text if it has none yet"""
+    analysis = load_job_analysis(document)
+    if analysis.embedding is None and embed_analyses([analysis]) is not None:
+        save_job_embedding(document, analysis)
+
+def save_job_skills(document, skills):
+    document.skills = json.dumps({category: sorted(found) for category, found in skills.items()})
+    document.skills_version = get_skill_matcher().version
+
+def save_job_embedding(document, analysis):
+    """Keep a job's embedding on its JobDocument when it is new or from another model; the caller commits"""
+    if analysis.embedding is None:
+        return
+    if document.embedding is not None and document.embedding_model == analysis.embedding_model:
+        return
+    document.embedding = np.asarray(analysis.embedding, dtype=np.float32).tobytes()
+    document.embedding_model = analysis.embedding_model
+
+def load_job_analysis(document):
+    """Rebuild the DocumentAnalysis of a JobDocument, with its skills and embedding
+
+    Skills matched with an older taxonomy are matched again and saved.
+    """
+    analysis = DocumentAnalysis.from_dict(document.text, json.loads(document.analysis))
+
+    matcher = get_skill_matcher()
+    if document.skills is None or document.skills_version != matcher.version:
+        save_job_skills(document, matcher.match(document.text))
+    analysis.skills = {category: set(found) for category, found in json.loads(document.skills).items()}
+
+    if document.embedding is not None:
+        analysis.embedding = np.frombuffer(document.embedding, dtype=np.float32)
+        analysis.embedding_model = document.embedding_model
+
+    document.last_used_at = datetime.utcnow()
+    return analysis
+
+def evict_job_documents(max_age=None):
+    """Delete stored job texts unused for max_age that no result or profile refers to
+
+    Returns the number deleted.
+    """
+    max_age = JOB_STORE_MAX_AGE if max_age is None else max_age
+    referenced = or_(
+        exists().where(MatchResult.job_document_id == JobDocument.id),
+        exists().where(JobProfile.job_document_id == JobDocument.id)
+    )
+    deleted = JobDocument.query.filter(
+        JobDocument.last_used_at < datetime.utcnow() - max_age,
+        ~referenced
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    if deleted:
+        logging.info(f"Evicted {deleted} stored job descriptions")
+    return deleted
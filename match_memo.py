@@ -0,0 +1,66 @@
+import os
+import logging
+from datetime import datetime, timedelta
+from sqlalchemy import or_
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models import MatchMemo
+from utils.match_calculator import scoring_config_version
+
+# Memoized (resume, job) outcomes are recomputed after this long
+MATCH_MEMO_TTL = timedelta(hours=int(os.environ.get("MATCH_MEMO_TTL_HOURS", "168")))
+
+def get_match_memo(resume_hash, job_hash):
+    """Return the live memo for this pair under the current scoring config, or None"""
+    return MatchMemo.query.filter(
+        MatchMemo.resume_hash == resume_hash,
+        MatchMemo.job_hash == job_hash,
+        MatchMemo.config_version == scoring_config_version(),
+        MatchMemo.expires_at > datetime.utcnow()
+    ).first()
+
+def store_match_memo(resume_hash, job_hash, result):
+    """Remember the score, keywords and suggestions of a MatchResult for its pair"""
+    now = datetime.utcnow()
+    values = dict(
+        match_score=result.match_score,
+        semantic_score=result.semantic_score,
+        keyword_score=result.keyword_score,
+        skills_score=result.skills_score,
+        resume_keywords=result.resume_keywords,
+        job_keywords=result.job_keywords,
+        suggestions=result.suggestions,
+        created_at=now,
+        expires_at=now + MATCH_MEMO_TTL
+    )
+
+    version = scoring_config_version()
+    memo = MatchMemo.query.filter_by(resume_hash=resume_hash, job_hash=job_hash, config_version=version).first()
+    if memo is None:
+        db.session.add(MatchMemo(resume_hash=resume_hash, job_hash=job_hash, config_version=version, **values))
+    else:
+        # An expired memo for the same pair is refreshed in place
+        for name, value in values.items():
+            setattr(memo, name, value)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # Another worker memoized the same pair first
+        db.session.rollback()
+
+def purge_match_memos(everything=False):
+    """Delete expired memos and those scored under another config version
+
+    With everything=True the whole table is cleared. Returns the number deleted.
+    """
+    query = MatchMemo.query
+    if not everything:
+        query = query.filter(or_(
+            MatchMemo.expires_at <= datetime.utcnow(),
+            MatchMemo.config_version != scoring_config_version()
+        ))
+    deleted = query.delete(synchronize_session=False)
+    db.session.commit()
+    if deleted:
+        logging.info(f"Purged {deleted} memoized match scores")
+    return deleted
@@ -0,0 +1,123 @@
+import logging
+from sqlalchemy import exists, insert, inspect, select, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
+from app import db
+
+def upgrade_schema():
+    """Add columns and indexes introduced after a table was first created
+
+    db.create_all() only creates missing tables, so nullable columns and
+    indexes added to an existing model are created here. Foreign keys of an
+    added column are declared with it.
+    """
+    inspector = inspect(db.engine)
+    preparer = db.engine.dialect.identifier_preparer
+    for table in db.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+
+        existing = {column['name']: column['type'] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                convert_to_jsonb(table, column, existing[column.name])
+                continue
+            if not column.nullable and column.server_default is None:
+                logging.error(f"Cannot add required column {table.name}.{column.name} automatically")
+                continue
+
+            column_type = column.type.compile(dialect=db.engine.dialect)
+            references = "".join(
+                f" REFERENCES {preparer.format_table(key.column.table)} ({preparer.format_column(key.column)})"
+                for key in column.foreign_keys
+            )
+            try:
+                db.session.execute(text(
+                    f"ALTER TABLE {preparer.format_table(table)} ADD COLUMN {preparer.format_column(column)} "
+                    f"{column_type}{references}"
+                ))
+                db.session.commit()
+                logging.info(f"Added column {table.name}.{column.name}")
+            except SQLAlchemyError as e:
+                # Another worker booting at the same time may have added it first
+                db.session.rollback()
+                logging.warning(f"Could not add column {table.name}.{column.name}: {e}")
+
+        existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            # Indexes for another database, e.g. PostgreSQL GIN indexes on SQLite
+            ddl_if = getattr(index, '_ddl_if', None)
+            if ddl_if is not None and ddl_if.dialect not in (None, db.engine.dialect.name):
+                continue
+            if index.name not in existing_indexes:
+                try:
+                    index.create(db.engine, checkfirst=True)
+                    logging.info(f"Created index {index.name}")
+                except SQLAlchemyError as e:
+                    logging.warning(f"Could not create index {index.name}: {e}")
+
+    backfill_result_keywords()
+
+def convert_to_jsonb(table, column, existing_type):
+    """On PostgreSQL, turn a JSON text column into native JSONB"""
+    if db.engine.dialect.name != 'postgresql' or isinstance(existing_type, JSONB):
+        return
+    if not isinstance(column.type.dialect_impl(db.engine.dialect), JSONB):
+        return
+
+    preparer = db.engine.dialect.identifier_preparer
+    name = preparer.format_column(column)
+    try:
+        db.session.execute(text(
+            f"ALTER TABLE {preparer.format_table(table)} ALTER COLUMN {name} TYPE JSONB USING {name}::jsonb"
+        ))
+        db.session.commit()
+        logging.info(f"Converted {table.name}.{column.name} to JSONB")
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        logging.warning(f"Could not convert {table.name}.{column.name} to JSONB: {e}")
+
+def backfill_result_keywords(batch_size=1000):
+    """Copy the keywords of results stored before the ResultKeyword table existed into it
+
+    Only runs while that table is empty, so it costs one query once done.
+    """
+    from models import MatchResult, ResultKeyword
+
+    if db.session.execute(select(exists().select_from(ResultKeyword))).scalar():
+        return
+
+    converted = 0
+    last_id = 0
+    try:
+        while True:
+            rows = db.session.execute(
+                select(MatchResult.id, MatchResult.resume_keywords, MatchResult.job_keywords)
+                .where(MatchResult.id > last_id).order_by(MatchResult.id).limit(batch_size)
+            ).all()
+            if not rows:
+                break
+
+            keywords = [
+                {'result_id': result_id, 'side': side, 'keyword': keyword[:128], 'position': position}
+                for result_id, resume_keywords, job_keywords in rows
+                for side, side_keywords in (('resume', resume_keywords), ('job', job_keywords))
+                for position, keyword in enumerate(side_keywords or [])
+            ]
+            if keywords:
+                db.session.execute(insert(ResultKeyword), keywords)
+            db.session.commit()
+
+            converted += len(rows)
+            last_id = rows[-1].id
+    except IntegrityError:
+        # Another worker booting at the same time is doing the same
+        db.session.rollback()
+        return
+    except (SQLAlchemyError, ValueError) as e:
+        db.session.rollback()
+        logging.error(f"Error copying result keywords: {e}")
+        return
+
+    if converted:
+        logging.info(f"Copied keywords of {converted} results into result_keyword")
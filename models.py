@@ -1,6 +1,10 @@
 from app import db
 from flask_login import UserMixin
 from datetime import datetime
+from sqlalchemy.dialects.postgresql import JSONB
+
+# JSON documents: native JSONB on PostgreSQL, JSON text elsewhere
+JSONDocument = db.JSON().with_variant(JSONB(), 'postgresql')
 
 class User(UserMixin, db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -18,7 +22,117 @@ class MatchResult(db.Model):
     resume_filename = db.Column(db.String(255), nullable=False)
     job_description_filename = db.Column(db.String(255), nullable=False)
     match_score = db.Column(db.Float, nullable=False)
-    resume_keywords = db.Column(db.Text)  # JSON string
-    job_keywords = db.Column(db.Text)  # JSON string
-    suggestions = db.Column(db.Text)  # JSON string
+    # Loaded together on first access, so lists of results stay light
+    resume_keywords = db.deferred(db.Column(JSONDocument), group='details')  # Also in ResultKeyword
+    job_keywords = db.deferred(db.Column(JSONDocument), group='details')  # Also in ResultKeyword
+    suggestions = db.deferred(db.Column(JSONDocument), group='details')  # List of suggestion dicts
+    # Scoring methods that ran, e.g. ["keyword", "skills"] when cascade scoring skipped the
+    # semantic step, or ["memo"] for a memoized score; empty for results stored before
+    scoring_stages = db.deferred(db.Column(JSONDocument), group='details')
+    resume_document_id = db.Column(db.Integer, db.ForeignKey('resume_document.id', ondelete='SET NULL'), index=True)
+    job_document_id = db.Column(db.Integer, db.ForeignKey('job_document.id', ondelete='SET NULL'), index=True)
+    # Score of each method, so new weights are applied by re-blending instead of scoring again;
+    # NULL when the method was skipped or failed, and for results stored before
+    semantic_score = db.Column(db.Float)
+    keyword_score = db.Column(db.Float)
+    skills_score = db.Column(db.Float)
+    config_version = db.Column(db.String(16), index=True)  # scoring_config_version() of match_score
+    method_versions = db.Column(JSONDocument)  # {method: method_version()} the method scores were computed under
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    keywords = db.relationship('ResultKeyword', backref='result', lazy=True, cascade='all, delete-orphan')
+
+# Dashboard and history list a user's results newest first
+db.Index('ix_match_result_user_id_created_at', MatchResult.user_id, MatchResult.created_at.desc())
+db.Index('ix_match_result_resume_keywords', MatchResult.resume_keywords, postgresql_using='gin').ddl_if(dialect='postgresql')
+db.Index('ix_match_result_job_keywords', MatchResult.job_keywords, postgresql_using='gin').ddl_if(dialect='postgresql')
+
+class ResultKeyword(db.Model):
+    """One resume or job keyword of a MatchResult, so results can be queried by keyword"""
+    __table_args__ = (
+        db.UniqueConstraint('result_id', 'side', 'position'),
+        db.Index('ix_result_keyword_keyword_side', 'keyword', 'side'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    result_id = db.Column(db.Integer, db.ForeignKey('match_result.id', ondelete='CASCADE'), nullable=False)
+    side = db.Column(db.String(8), nullable=False)  # 'resume' or 'job'
+    keyword = db.Column(db.String(128), nullable=False)
+    position = db.Column(db.Integer, nullable=False)  # Rank in the result's keyword list
+
+class ResumeDocument(db.Model):
+    """Extracted text and analysis of an uploaded resume, keyed by file hash"""
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), unique=True, nullable=False)  # SHA-256 of the uploaded bytes
+    text = db.Column(db.Text, nullable=False)
+    analysis = db.Column(db.Text, nullable=False)  # JSON from DocumentAnalysis.to_dict()
+    embedding = db.Column(db.LargeBinary)  # float32 vector
+    embedding_model = db.Column(db.String(64))
+    size_bytes = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    match_results = db.relationship('MatchResult', backref='resume_document', lazy=True)
+
+class JobDocument(db.Model):
+    """Text and analysis of a job description, shared by the results and profiles that use it"""
+    id = db.Column(db.Integer, primary_key=True)
+    content_hash = db.Column(db.String(64), unique=True, nullable=False)  # SHA-256 of the normalized job text
+    text = db.Column(db.Text, nullable=False)
+    analysis = db.Column(db.Text, nullable=False)  # JSON from DocumentAnalysis.to_dict()
+    skills = db.Column(db.Text)  # JSON {category: [canonical skills]}
+    skills_version = db.Column(db.String(16))  # SkillMatcher.version the skills were matched with
+    embedding = db.Column(db.LargeBinary)  # float32 vector
+    embedding_model = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+    
+    match_results = db.relationship('MatchResult', backref='job_document', lazy=True)
+    job_profiles = db.relationship('JobProfile', backref='job_document', lazy=True)
+
+class AnalysisJob(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    status = db.Column(db.String(16), nullable=False, default='queued', index=True)  # queued, running, done, failed
+    resume_filename = db.Column(db.String(255), nullable=False)
+    resume_data = db.Column(db.LargeBinary)  # Uploaded PDF bytes, cleared once processed
+    job_description = db.Column(db.Text, nullable=False)
+    result_id = db.Column(db.Integer, db.ForeignKey('match_result.id', ondelete='SET NULL'))
+    job_profile_id = db.Column(db.Integer, db.ForeignKey('job_profile.id', ondelete='SET NULL'))
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    worker_id = db.Column(db.String(128))  # "host:pid" of the worker running the job
+    heartbeat_at = db.Column(db.DateTime)  # Refreshed by that worker while the job runs
+
+class JobProfile(db.Model):
+    """A saved job description, analyzed once and scored against many resumes"""
+    __table_args__ = (db.UniqueConstraint('user_id', 'content_hash'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    title = db.Column(db.String(255), nullable=False)
+    content_hash = db.Column(db.String(64), nullable=False)  # JobDocument.content_hash
+    job_document_id = db.Column(db.Integer, db.ForeignKey('job_document.id'), index=True)  # Text, analysis, embedding
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class MatchMemo(db.Model):
+    """Stored outcome of scoring one resume file against one job text"""
+    __table_args__ = (db.UniqueConstraint('resume_hash', 'job_hash', 'config_version'),)
+    
+    id = db.Column(db.Integer, primary_key=True)
+    resume_hash = db.Column(db.String(64), nullable=False)  # ResumeDocument.content_hash
+    job_hash = db.Column(db.String(64), nullable=False)  # SHA-256 of the normalized job text
+    config_version = db.Column(db.String(16), nullable=False)
+    match_score = db.Column(db.Float, nullable=False)
+    semantic_score = db.Column(db.Float)
+    keyword_score = db.Column(db.Float)
+    skills_score = db.Column(db.Float)
+    resume_keywords = db.Column(JSONDocument)
+    job_keywords = db.Column(JSONDocument)
+    suggestions = db.Column(JSONDocument)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
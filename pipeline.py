@@ -0,0 +1,170 @@
+import logging
+import numpy as np
+from app import db
+from models import JobDocument, MatchResult, ResultKeyword
+from match_memo import get_match_memo, store_match_memo
+from job_profiles import load_job_analysis, save_job_embedding, scoring_job_document
+from resume_store import load_analysis, save_embedding
+from utils.embedding_cache import text_hash
+from utils.metrics import count_cache_lookup, timed
+from utils.match_calculator import (
+    calculate_match_scores, embedding_model, generate_suggestions, method_versions, score_and_suggest,
+    scoring_config_version, SUGGESTION_THRESHOLD
+)
+
+def new_match_result(resume_keywords, job_keywords, suggestions, **columns):
+    """Build a MatchResult with its keywords also stored as ResultKeyword rows"""
+    keywords = [
+        ResultKeyword(side=side, keyword=keyword[:128], position=position)
+        for side, side_keywords in (('resume', resume_keywords), ('job', job_keywords))
+        for position, keyword in enumerate(side_keywords or [])
+    ]
+    return MatchResult(resume_keywords=resume_keywords, job_keywords=job_keywords, suggestions=suggestions,
+                       keywords=keywords, **columns)
+
+def stored_score(score):
+    """A method score as stored: None when it was skipped or failed (NaN)"""
+    return None if score is None or np.isnan(score) else float(score)
+
+def method_score_columns(semantic_score, keyword_score, skills_score):
+    """MatchResult columns recording the method scores behind its match_score"""
+    return dict(
+        semantic_score=stored_score(semantic_score),
+        keyword_score=stored_score(keyword_score),
+        skills_score=stored_score(skills_score),
+        config_version=scoring_config_version(),
+        method_versions=method_versions()
+    )
+
+def analyze_resume(user_id, resume_filename, resume_document, job_text=None, job_label="Direct Input", job_profile=None):
+    """Score one stored resume against a job description and store the MatchResult
+
+    Shared by the synchronous upload route and the background analysis
+    workers. The resume analysis comes from the ResumeDocument store and the
+    job's from the JobDocument store (a JobProfile points at one), so only a
+    job text never seen before is parsed. A pair scored before under the current scoring
+    config is answered from the match memo without any NLP or Gemini calls.
+    Returns the committed MatchResult.
+    """
+    if job_profile is not None:
+        job_label = job_profile.title
+        job_hash = job_profile.content_hash
+    else:
+        job_hash = text_hash(job_text)
+    memo = get_match_memo(resume_document.content_hash, job_hash)
+    count_cache_lookup('match_memo', hits=int(memo is not None), misses=int(memo is None))
+    if memo is not None:
+        # The job was stored when the memo was made; it is only needed to rescore the result later
+        job_document = JobDocument.query.filter_by(content_hash=job_hash).first()
+        result = new_match_result(
+            memo.resume_keywords,
+            memo.job_keywords,
+            memo.suggestions,
+            user_id=user_id,
+            resume_filename=resume_filename,
+            job_description_filename=job_label,
+            match_score=memo.match_score,
+            scoring_stages=['memo'],
+            resume_document_id=resume_document.id,
+            job_document_id=job_document and job_document.id,
+            **method_score_columns(memo.semantic_score, memo.keyword_score, memo.skills_score)
+        )
+        db.session.add(result)
+        with timed('db_commit'):
+            db.session.commit()
+        return result
+
+    # Parse each document once and reuse the analysis everywhere
+    resume_text = resume_document.text
+    resume_analysis = load_analysis(resume_document)
+    job_document = scoring_job_document(job_text, job_profile)
+    job_text = job_document.text
+    job_analysis = load_job_analysis(job_document)
+
+    # Extract keywords
+    resume_keywords = resume_analysis.keywords()
+    job_keywords = job_analysis.keywords()
+
+    # Calculate match score, with suggestions if score is low
+    match_score, suggestions, scores = score_and_suggest(resume_text, job_text, resume_analysis, job_analysis)
+    stages = scores['stages']
+    save_embedding(resume_document, resume_analysis)
+    save_job_embedding(job_document, job_analysis)
+
+    result = new_match_result(
+        resume_keywords,
+        job_keywords,
+        suggestions,
+        user_id=user_id,
+        resume_filename=resume_filename,
+        job_description_filename=job_label,
+        match_score=match_score,
+        scoring_stages=stages,
+        resume_document_id=resume_document.id,
+        job_document_id=job_document.id,
+        **method_score_columns(scores['semantic'], scores['keyword'], scores['skills'])
+    )
+
+    db.session.add(result)
+    with timed('db_commit'):
+        db.session.commit()
+
+    # Only memoize complete scores; a failed or fallback embedding or parse should be retried next time.
+    # A semantic step skipped by cascade scoring is not a failure.
+    semantic_complete = 'semantic' not in stages or job_analysis.embedding_model == embedding_model()
+    if stages and semantic_complete and resume_analysis.token_count and job_analysis.token_count:
+        store_match_memo(resume_document.content_hash, job_hash, result)
+
+    return result
+
+def rank_resumes(user_id, resumes, job_text=None, job_label="Direct Input", job_profile=None):
+    """Score many resumes against one job description and store the results
+
+    resumes is a list of (filename, ResumeDocument) pairs. The job is
+    analyzed and embedded at most once (or taken from job_profile), every resume is
+    scored in one vectorized pass and all rows are written with a single
+    bulk insert. Returns the MatchResult rows sorted best match first.
+    """
+    if job_profile is not None:
+        job_label = job_profile.title
+    job_document = scoring_job_document(job_text, job_profile)
+    job_text = job_document.text
+    job_analysis = load_job_analysis(job_document)
+    resume_analyses = [load_analysis(document) for _, document in resumes]
+    scores = calculate_match_scores(
+        [document.text for _, document in resumes], job_text, resume_analyses, job_analysis
+    )
+
+    job_keywords = job_analysis.keywords()
+    results = []
+    for i, ((filename, document), analysis) in enumerate(zip(resumes, resume_analyses)):
+        match_score = float(scores['final'][i])
+        resume_keywords = analysis.keywords()
+
+        # Rule-based suggestions only; one Gemini generation per resume would dominate bulk runs
+        suggestions = []
+        if match_score < SUGGESTION_THRESHOLD:
+            suggestions = generate_suggestions(resume_keywords, job_keywords, match_score, use_ai=False)
+
+        results.append(new_match_result(
+            resume_keywords,
+            job_keywords,
+            suggestions,
+            user_id=user_id,
+            resume_filename=filename,
+            job_description_filename=job_label,
+            match_score=match_score,
+            scoring_stages=['semantic', 'keyword', 'skills'] if scores['semantic_ran'][i] else ['keyword', 'skills'],
+            resume_document_id=document.id,
+            job_document_id=job_document.id,
+            **method_score_columns(scores['semantic'][i], scores['keyword'][i], scores['skills'][i])
+        ))
+        save_embedding(document, analysis)
+    save_job_embedding(job_document, job_analysis)
+
+    db.session.add_all(results)
+    with timed('db_commit'):
+        db.session.commit()
+    logging.info(f"Ranked {len(results)} resumes against {job_label}")
+
+    return sorted(results, key=lambda result: result.match_score, reverse=True)
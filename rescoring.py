@@ -0,0 +1,278 @@
+import os
+import json
+import logging
+import numpy as np
+from sqlalchemy import delete, insert, or_, update
+from sqlalchemy.orm import load_only
+from app import db
+from models import JobDocument, MatchResult, ResultKeyword, ResumeDocument
+from job_profiles import get_job_document, load_job_analysis, save_job_embedding
+from pipeline import stored_score
+from resume_store import load_analysis, save_embedding
+from utils.embedding_cache import text_hash
+from utils.metrics import timed
+from utils.nlp_analyzer import analyze_document
+from utils.match_calculator import (
+    blend_scores, calculate_keyword_similarities, calculate_semantic_similarities, calculate_skills_matches,
+    cascade_score, generate_suggestions, method_versions, scoring_config_version, semantic_undecided,
+    MATCH_EXECUTION_MODE, SUGGESTION_THRESHOLD
+)
+
+# Results read, rescored and committed per round trip
+RESCORE_BATCH_SIZE = int(os.environ.get("RESCORE_BATCH_SIZE", "500"))
+
+METHODS = ('semantic', 'keyword', 'skills')
+
+# Columns read from each result; the rest of the row is left alone
+RESCORE_COLUMNS = (
+    MatchResult.id, MatchResult.match_score, MatchResult.semantic_score, MatchResult.keyword_score,
+    MatchResult.skills_score, MatchResult.method_versions, MatchResult.resume_document_id,
+    MatchResult.job_document_id, MatchResult.resume_keywords, MatchResult.job_keywords, MatchResult.suggestions,
+)
+
+def stale_methods(result, versions, job_changed=False):
+    """Methods whose stored score cannot be reused for this result
+
+    A score is stale when it is missing or was computed under another
+    method version. A missing semantic score is left to the caller, since
+    cascade scoring may not need it.
+    """
+    if job_changed:
+        return set(METHODS)
+    stored = result.method_versions or {}
+    stale = {method for method in METHODS if stored.get(method) != versions[method]}
+    if result.keyword_score is None:
+        stale.add('keyword')
+    if result.skills_score is None:
+        stale.add('skills')
+    return stale
+
+def rescored_suggestions(result, match_score, job_keywords, job_changed):
+    """New suggestions for a rescored result, or None to keep the stored ones
+
+    Stored suggestions, including AI ones, stay unless the score crossed the
+    suggestion cutoff or the job changed; new ones are rule-based, as in
+    bulk ranking, so rescoring makes no Gemini calls for them.
+    """
+    crossed = (result.match_score < SUGGESTION_THRESHOLD) != (match_score < SUGGESTION_THRESHOLD)
+    if not (crossed or job_changed):
+        return None
+    if match_score >= SUGGESTION_THRESHOLD:
+        return []
+    return generate_suggestions(result.resume_keywords or [], job_keywords, match_score, use_ai=False)
+
+def stages(semantic_ran, cascade):
+    """scoring_stages of a rescored result, in the order scoring runs the methods"""
+    if not cascade:
+        return ['semantic', 'keyword', 'skills']
+    return ['keyword', 'skills', 'semantic'] if semantic_ran else ['keyword', 'skills']
+
+def rescore_job_group(results, job, job_changed, documents, job_analyses, versions, cascade, stats):
+    """Rescore results that share one job; returns their update rows
+
+    Keyword and skills scores are recomputed for the results where they are
+    stale, semantic scores where they are stale or missing (and, with
+    cascade, could change the outcome), all as array operations over the
+    group. Everything else is re-blended from the stored method scores.
+    job_analyses caches each job's DocumentAnalysis across batches.
+    """
+    stale = [stale_methods(result, versions, job_changed) for result in results]
+
+    # Stale scores need the stored inputs; without them the result keeps its current score
+    keep = [i for i, (result, methods) in enumerate(zip(results, stale))
+            if not methods or (job is not None and result.resume_document_id in documents)]
+    stats['skipped'] += len(results) - len(keep)
+    results = [results[i] for i in keep]
+    stale = [stale[i] for i in keep]
+    if not results:
+        return []
+
+    def stored(method, value, methods):
+        return np.nan if method in methods or value is None else value
+
+    semantic = np.array([stored('semantic', result.semantic_score, methods)
+                         for result, methods in zip(results, stale)], dtype=np.float64)
+    keyword = np.array([stored('keyword', result.keyword_score, methods)
+                        for result, methods in zip(results, stale)], dtype=np.float64)
+    skills = np.array([stored('skills', result.skills_score, methods)
+                       for result, methods in zip(results, stale)], dtype=np.float64)
+
+    analyses = {}
+
+    def inputs(indexes):
+        """Resume texts and analyses (from the store, no NLP) of these results"""
+        for i in indexes:
+            document_id = results[i].resume_document_id
+            if document_id not in analyses:
+                analyses[document_id] = load_analysis(documents[document_id])
+        return ([documents[results[i].resume_document_id].text for i in indexes],
+                [analyses[results[i].resume_document_id] for i in indexes])
+
+    # Rows with stale scores were only kept above when their job is stored
+    if any(stale) and job.id not in job_analyses:
+        job_analyses[job.id] = load_job_analysis(job)
+    job_analysis = job_analyses.get(job.id) if job is not None else None
+
+    recomputed = np.array([bool(methods - {'semantic'}) for methods in stale])
+    redo = [i for i, methods in enumerate(stale) if 'keyword' in methods]
+    if redo:
+        keyword[redo] = calculate_keyword_similarities(inputs(redo)[1], job_analysis)
+        stats['recomputed']['keyword'] += len(redo)
+    redo = [i for i, methods in enumerate(stale) if 'skills' in methods]
+    if redo:
+        skills[redo] = calculate_skills_matches(inputs(redo)[0], job.text, job_analysis.skills)
+        stats['recomputed']['skills'] += len(redo)
+
+    semantic_ran = semantic_undecided(keyword, skills) if cascade else np.ones(len(results), dtype=bool)
+    redo = [int(i) for i in np.flatnonzero(semantic_ran & np.isnan(semantic))
+            if job is not None and results[i].resume_document_id in documents]
+    if redo:
+        if job.id not in job_analyses:
+            job_analyses[job.id] = job_analysis = load_job_analysis(job)
+        texts, resume_analyses = inputs(redo)
+        semantic[redo] = calculate_semantic_similarities(texts, job.text, resume_analyses, job_analysis)
+        recomputed[redo] = True
+        stats['recomputed']['semantic'] += len(redo)
+        for i in redo:
+            save_embedding(documents[results[i].resume_document_id], analyses[results[i].resume_document_id])
+        save_job_embedding(job, job_analysis)
+
+    final = np.where(semantic_ran, blend_scores(semantic, keyword, skills), cascade_score(keyword, skills))
+    stats['reblended'] += int((~recomputed).sum())
+
+    rows = []
+    for i, result in enumerate(results):
+        match_score = float(final[i])
+        row = dict(
+            id=result.id,
+            match_score=match_score,
+            semantic_score=stored_score(semantic[i]),
+            keyword_score=stored_score(keyword[i]),
+            skills_score=stored_score(skills[i]),
+            scoring_stages=stages(bool(semantic_ran[i]), cascade),
+            config_version=versions['config'],
+            method_versions={method: versions[method] for method in METHODS}
+        )
+        job_keywords = result.job_keywords
+        if job_changed:
+            job_keywords = job_analysis.keywords()
+            row.update(job_document_id=job.id, job_keywords=job_keywords)
+        suggestions = rescored_suggestions(result, match_score, job_keywords, job_changed)
+        if suggestions is not None:
+            row['suggestions'] = suggestions
+        rows.append(row)
+    return rows
+
+def results_to_rescore(previous_job=None, everything=False):
+    """Query of the results a rescoring run visits
+
+    With previous_job, the results scored against that job; otherwise those
+    scored under another config (or every result, with everything).
+    """
+    query = MatchResult.query
+    if previous_job is not None:
+        return query.filter(MatchResult.job_document_id == previous_job.id)
+    if not everything:
+        query = query.filter(or_(
+            MatchResult.config_version.is_(None),
+            MatchResult.config_version != scoring_config_version()
+        ))
+    return query
+
+def rescore_results(previous_job_hash=None, job_text=None, everything=False, batch_size=None, dry_run=False,
+                    cascade=None, progress=None):
+    """Bring stored match results up to date with the current scoring config
+
+    Results are read in id order batch_size at a time, and each batch is
+    written back with bulk UPDATEs and committed before the next is read,
+    so memory stays bounded and progress survives an interruption. Method
+    scores whose inputs did not change are re-blended with the current
+    weights without any NLP or Gemini work; only stale ones are recomputed
+    from the stored ResumeDocument and JobDocument.
+
+    With previous_job_hash and job_text, the results scored against the job
+    with that hash are rescored against the edited job_text instead: it is
+    analyzed (unless it is stored already) and embedded once, and every
+    resume side comes from the store.
+    progress(stats) is called after each batch. Returns the stats dict of
+    counts; with dry_run nothing is written.
+    """
+    batch_size = batch_size or RESCORE_BATCH_SIZE
+    if cascade is None:
+        cascade = MATCH_EXECUTION_MODE == "cascade"
+    stats = {'results': 0, 'updated': 0, 'reblended': 0, 'skipped': 0,
+             'recomputed': {method: 0 for method in METHODS}}
+    versions = dict(method_versions(), config=scoring_config_version())
+
+    previous_job = new_job = None
+    if previous_job_hash is not None:
+        previous_job = JobDocument.query.filter_by(content_hash=previous_job_hash).first()
+        if previous_job is None:
+            logging.info("No stored results were scored against the previous job text")
+            return stats
+        new_hash = text_hash(job_text)
+        if new_hash == previous_job_hash:
+            return stats
+        new_job = JobDocument.query.filter_by(content_hash=new_hash).first()
+        if new_job is None and dry_run:
+            # Scored against but never stored
+            new_job = JobDocument(content_hash=new_hash, text=job_text,
+                                  analysis=json.dumps(analyze_document(job_text, entities=False).to_dict()))
+        elif new_job is None:
+            new_job = get_job_document(job_text, new_hash)
+
+    query = results_to_rescore(previous_job, everything).options(load_only(*RESCORE_COLUMNS))
+    job_analyses = {new_job.id: load_job_analysis(new_job)} if new_job is not None else {}
+    last_id = 0
+    while True:
+        results = query.filter(MatchResult.id > last_id).order_by(MatchResult.id).limit(batch_size).all()
+        if not results:
+            break
+        last_id = results[-1].id
+        stats['results'] += len(results)
+
+        document_ids = {result.resume_document_id for result in results if result.resume_document_id}
+        documents = {document.id: document for document in
+                     ResumeDocument.query.filter(ResumeDocument.id.in_(document_ids))} if document_ids else {}
+        job_ids = {result.job_document_id for result in results if result.job_document_id}
+        jobs = {job.id: job for job in JobDocument.query.filter(JobDocument.id.in_(job_ids))} if job_ids else {}
+
+        groups = {}
+        for result in results:
+            groups.setdefault(new_job.id if new_job is not None else result.job_document_id, []).append(result)
+        rows = []
+        for job_id, group in groups.items():
+            job = new_job if new_job is not None else jobs.get(job_id)
+            rows.extend(rescore_job_group(group, job, new_job is not None, documents, job_analyses, versions,
+                                          cascade, stats))
+        stats['updated'] += len(rows)
+
+        if dry_run:
+            db.session.rollback()
+        else:
+            with timed('db_commit'):
+                if rows:
+                    db.session.execute(update(MatchResult), rows)
+                if rows and new_job is not None:
+                    replace_job_keywords(rows)
+                db.session.commit()
+
+        if progress is not None:
+            progress(stats)
+        logging.info(f"Rescored {stats['updated']} of {stats['results']} results")
+
+    return stats
+
+def replace_job_keywords(rows):
+    """Swap the job-side ResultKeyword rows of results moved to another job"""
+    db.session.execute(delete(ResultKeyword).where(
+        ResultKeyword.result_id.in_([row['id'] for row in rows]),
+        ResultKeyword.side == 'job'
+    ))
+    keywords = [
+        dict(result_id=row['id'], side='job', keyword=keyword[:128], position=position)
+        for row in rows
+        for position, keyword in enumerate(row['job_keywords'] or [])
+    ]
+    if keywords:
+        db.session.execute(insert(ResultKeyword), keywords)
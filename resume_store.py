@@ -0,0 +1,230 @@
+import os
+import json
+import logging
+from datetime import datetime, timedelta
+import numpy as np
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from app import db
+from models import MatchResult, ResumeDocument
+from utils.nlp_analyzer import DocumentAnalysis, analyze_document, analyze_documents_batch
+from utils.embedding_store import EmbeddingStore
+from utils.local_db import INSTANCE_DIR
+from utils.match_calculator import get_embeddings_batch
+from utils.metrics import count_cache_lookup
+
+# Stored resumes unused for this long, or beyond this total size, are evicted
+RESUME_STORE_MAX_AGE = timedelta(days=int(os.environ.get("RESUME_STORE_MAX_AGE_DAYS", "30")))
+RESUME_STORE_MAX_BYTES = int(os.environ.get("RESUME_STORE_MAX_MB", "512")) * 1024 * 1024
+
+# Resume embeddings go to memory-mapped files shared by all workers, one per
+# embedding model; set EMBEDDING_STORE_PATH to "" to keep them as float32 blobs in the database
+EMBEDDING_STORE_PATH = os.environ.get("EMBEDDING_STORE_PATH", os.path.join(INSTANCE_DIR, "embedding_store"))
+EMBEDDING_STORE_DTYPE = os.environ.get("EMBEDDING_STORE_DTYPE", "float16")
+
+_embedding_stores = {}
+
+def get_embedding_store(embedding_model):
+    """EmbeddingStore for one embedding model's vectors, or None when the store is disabled"""
+    if not EMBEDDING_STORE_PATH:
+        return None
+    if embedding_model not in _embedding_stores:
+        directory = os.path.join(EMBEDDING_STORE_PATH, embedding_model.replace(':', '-').replace('/', '-'))
+        _embedding_stores.setdefault(embedding_model, EmbeddingStore(directory, EMBEDDING_STORE_DTYPE))
+    return _embedding_stores[embedding_model]
+
+def document_size(document):
+    """Approximate storage used by a ResumeDocument row"""
+    return len(document.text.encode('utf-8')) + len(document.analysis) + len(document.embedding or b'')
+
+def get_resume_document(content_hash, extract_text):
+    """Return the stored ResumeDocument for content_hash, creating it on a miss
+
+    extract_text is only called on a miss, so repeated uploads of the same
+    file skip PDF extraction and spaCy parsing. Returns None when no text
+    could be extracted.
+    """
+    document = ResumeDocument.query.filter_by(content_hash=content_hash).first()
+    count_cache_lookup('resume_document', hits=int(document is not None), misses=int(document is None))
+    if document is not None:
+        document.last_used_at = datetime.utcnow()
+        if not json.loads(document.analysis).get('token_count'):
+            # Stored while spaCy was unavailable or failing; parse it again now
+            analysis = analyze_document(document.text)
+            if analysis.token_count:
+                document.analysis = json.dumps(analysis.to_dict())
+                document.size_bytes = document_size(document)
+        db.session.commit()
+        return document
+
+    text = extract_text()
+    if not text:
+        return None
+
+    analysis = analyze_document(text)
+    document = ResumeDocument(content_hash=content_hash, text=text, analysis=json.dumps(analysis.to_dict()))
+    document.size_bytes = document_size(document)
+    db.session.add(document)
+    try:
+        db.session.commit()
+    except IntegrityError:
+        # A concurrent upload of the same file stored it first
+        db.session.rollback()
+        return ResumeDocument.query.filter_by(content_hash=content_hash).first()
+
+    evict_resume_documents()
+    return document
+
+def embedding_key(content_hash, embedding_model):
+    """Key of a resume's embedding in the embedding store"""
+    return f"{embedding_model}:{content_hash}"
+
+def load_analysis(document):
+    """Rebuild the DocumentAnalysis of a stored resume, including its embedding
+
+    Embeddings from the embedding store are zero-copy views in the store's
+    (possibly quantized) dtype.
+    """
+    analysis = DocumentAnalysis.from_dict(document.text, json.loads(document.analysis))
+    if document.embedding is not None:
+        analysis.embedding = np.frombuffer(document.embedding, dtype=np.float32)
+        analysis.embedding_model = document.embedding_model
+    elif EMBEDDING_STORE_PATH and document.embedding_model:
+        store = get_embedding_store(document.embedding_model)
+        analysis.embedding = store.get(embedding_key(document.content_hash, document.embedding_model))
+        if analysis.embedding is not None:
+            analysis.embedding_model = document.embedding_model
+            analysis.embedding_norm = store.row_norm
+    return analysis
+
+def save_embedding(document, analysis):
+    """Keep the embedding computed while scoring; the caller commits"""
+    if analysis.embedding is None:
+        return
+    if document.embedding is not None and document.embedding_model == analysis.embedding_model:
+        return
+
+    if document.embedding is None and document.embedding_model not in (None, analysis.embedding_model):
+        # The vector from the previous model is not read again
+        release_embeddings([(document.content_hash, document.embedding_model)])
+
+    document.embedding_model = analysis.embedding_model
+    store = get_embedding_store(analysis.embedding_model)
+    if store is not None:
+        # An embedding that is already stored keeps its existing row
+        store.append(embedding_key(document.content_hash, document.embedding_model), analysis.embedding)
+        document.embedding = None
+    else:
+        document.embedding = np.asarray(analysis.embedding, dtype=np.float32).tobytes()
+    document.size_bytes = document_size(document)
+
+def reanalyze_resume_documents(batch_size=None, n_process=None, chunk_size=500):
+    """Re-run spaCy over every stored resume, e.g. after a model upgrade
+
+    Documents are read and committed chunk_size at a time and parsed with
+    nlp.pipe, so memory stays bounded on large stores. Returns the number of
+    documents updated.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        documents = ResumeDocument.query.filter(ResumeDocument.id > last_id)\
+                                        .order_by(ResumeDocument.id).limit(chunk_size).all()
+        if not documents:
+            break
+
+        analyses = analyze_documents_batch(
+            (document.text for document in documents), batch_size=batch_size, n_process=n_process
+        )
+        for document, analysis in zip(documents, analyses):
+            document.analysis = json.dumps(analysis.to_dict())
+            document.size_bytes = document_size(document)
+        db.session.commit()
+
+        updated += len(documents)
+        last_id = documents[-1].id
+        logging.info(f"Re-analyzed {updated} stored resumes")
+    return updated
+
+def embed_resume_documents(backend, chunk_size=500):
+    """Embed every stored resume with backend, e.g. after fitting a new local model
+
+    Returns the number of documents embedded.
+    """
+    embedded = 0
+    last_id = 0
+    while True:
+        documents = ResumeDocument.query.filter(ResumeDocument.id > last_id)\
+                                        .order_by(ResumeDocument.id).limit(chunk_size).all()
+        if not documents:
+            break
+
+        embeddings = get_embeddings_batch([document.text for document in documents], backend)
+        if embeddings is None:
+            break
+        for document, embedding in zip(documents, embeddings):
+            analysis = DocumentAnalysis(document.text)
+            analysis.embedding = embedding
+            analysis.embedding_model = backend.name
+            save_embedding(document, analysis)
+        db.session.commit()
+
+        embedded += len(documents)
+        last_id = documents[-1].id
+        logging.info(f"Embedded {embedded} stored resumes with {backend.name}")
+    return embedded
+
+def evict_resume_documents(max_age=None, max_bytes=None):
+    """Delete stored resumes that are too old or over the size budget
+
+    Documents unused for max_age go first, then the least recently used
+    ones until the store is back under 90% of max_bytes. MatchResult rows
+    keep their scores and simply lose the link. Returns the number deleted.
+    """
+    max_age = RESUME_STORE_MAX_AGE if max_age is None else max_age
+    max_bytes = RESUME_STORE_MAX_BYTES if max_bytes is None else max_bytes
+
+    cutoff = datetime.utcnow() - max_age
+    stale_ids = [document_id for (document_id,) in
+                 db.session.query(ResumeDocument.id).filter(ResumeDocument.last_used_at < cutoff)]
+
+    total = db.session.query(func.coalesce(func.sum(ResumeDocument.size_bytes), 0))\
+                      .filter(ResumeDocument.last_used_at >= cutoff).scalar()
+    if total > max_bytes:
+        target = int(max_bytes * 0.9)
+        oldest_first = db.session.query(ResumeDocument.id, ResumeDocument.size_bytes)\
+                                 .filter(ResumeDocument.last_used_at >= cutoff)\
+                                 .order_by(ResumeDocument.last_used_at)
+        for document_id, size in oldest_first:
+            if total <= target:
+                break
+            stale_ids.append(document_id)
+            total -= size
+
+    if not stale_ids:
+        return 0
+
+    stored = db.session.query(ResumeDocument.content_hash, ResumeDocument.embedding_model)\
+                       .filter(ResumeDocument.id.in_(stale_ids),
+                               ResumeDocument.embedding.is_(None),
+                               ResumeDocument.embedding_model.isnot(None)).all()
+    db.session.execute(
+        update(MatchResult)
+        .where(MatchResult.resume_document_id.in_(stale_ids))
+        .values(resume_document_id=None)
+    )
+    ResumeDocument.query.filter(ResumeDocument.id.in_(stale_ids)).delete(synchronize_session=False)
+    db.session.commit()
+    release_embeddings(stored)
+    logging.info(f"Evicted {len(stale_ids)} stored resumes")
+    return len(stale_ids)
+
+def release_embeddings(documents):
+    """Free the embedding store rows of (content_hash, embedding_model) pairs for reuse"""
+    if not EMBEDDING_STORE_PATH:
+        return
+    by_model = {}
+    for content_hash, embedding_model in documents:
+        by_model.setdefault(embedding_model, []).append(embedding_key(content_hash, embedding_model))
+    for embedding_model, keys in by_model.items():
+        get_embedding_store(embedding_model).release(keys)
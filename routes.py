@@ -1,18 +1,103 @@
 import os
+import re
 import json
+import time
+import hmac
+import uuid
 import logging
-from flask import render_template, request, redirect, url_for, flash, session, jsonify
+import functools
+from datetime import datetime
+from flask import render_template, request, redirect, url_for, flash, session, jsonify, g, abort, Response, send_file
 from flask_login import login_user, logout_user, login_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
-from werkzeug.utils import secure_filename
+from sqlalchemy.orm import undefer_group
 from app import app, db
-from models import User, MatchResult
-from utils.file_processor import extract_text_from_pdf, extract_text_from_txt
-from utils.nlp_analyzer import extract_keywords
-from utils.match_calculator import calculate_match_score, generate_suggestions
+from models import User, MatchResult, AnalysisJob, JobProfile
+from utils.file_processor import extract_text_from_upload, extract_text_from_txt, file_sha256
+from resume_store import get_resume_document
+from pipeline import analyze_resume, rank_resumes
+from job_profiles import create_job_profile, get_job_profile
+from history import HISTORY_PAGE_SIZE, history_item, history_page, history_stats
+from candidate_search import CANDIDATE_MAX_TOP, find_candidates
+from utils.match_calculator import client
+from utils.metrics import gemini_metric_lines, metrics, request_timings, server_timing_header, stage_totals, start_request_timings
+from utils.profiling import ProfileStore, RequestProfiler
 
 ALLOWED_EXTENSIONS = {'pdf', 'txt'}
 
+profile_store = ProfileStore(app.config['PROFILE_DIR'], app.config['PROFILE_MAX_FILES'])
+request_profiler = RequestProfiler(
+    profile_store,
+    sample_percent=app.config['PROFILE_SAMPLE_PERCENT'],
+    slow_seconds=app.config['PROFILE_SLOW_MS'] / 1000
+)
+
+@app.before_request
+def start_request_metrics():
+    g.request_started = time.perf_counter()
+    # Keep a caller's request id (e.g. from the proxy) so its logs and our profiles line up
+    g.request_id = re.sub(r'[^A-Za-z0-9_-]', '', request.headers.get('X-Request-ID', ''))[:64] or uuid.uuid4().hex
+    start_request_timings()
+
+@app.after_request
+def record_request_metrics(response):
+    elapsed = time.perf_counter() - g.get('request_started', time.perf_counter())
+    endpoint = request.endpoint or 'unknown'
+    metrics.observe('resume_matcher_request_seconds', elapsed, endpoint=endpoint)
+    metrics.increment('resume_matcher_requests_total', endpoint=endpoint, status=response.status_code)
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    if app.config['SERVER_TIMING']:
+        stages = server_timing_header(request_timings())
+        response.headers['Server-Timing'] = f"{stages + ', ' if stages else ''}total;dur={elapsed * 1000:.1f}"
+    return response
+
+@app.teardown_request
+def flush_request_metrics(exception=None):
+    metrics.flush()
+
+def admin_required(view):
+    """Like login_required, but only for the usernames in ADMIN_USERS"""
+    @functools.wraps(view)
+    @login_required
+    def wrapper(*args, **kwargs):
+        if current_user.username not in app.config['ADMIN_USERS']:
+            abort(403)
+        return view(*args, **kwargs)
+    return wrapper
+
+def profiled(view):
+    """Run POSTs to view under the request profiler when profiling is enabled"""
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if request.method != 'POST' or not request_profiler.enabled:
+            return view(*args, **kwargs)
+        return request_profiler.run(g.request_id, lambda: view(*args, **kwargs), describe_profiled_request)
+    return wrapper
+
+def describe_profiled_request():
+    """What is saved alongside a request profile to find and reproduce the request"""
+    resume_file = request.files.get('resume')
+    resume_sha256 = None
+    if resume_file is not None:
+        try:
+            resume_sha256 = file_sha256(resume_file.stream)
+        except (OSError, ValueError):
+            pass
+    return {
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'endpoint': request.endpoint,
+        'path': request.path,
+        'user_id': current_user.get_id(),
+        'content_length': request.content_length,
+        'resume_filename': resume_file.filename if resume_file is not None else None,
+        'resume_sha256': resume_sha256,
+        'job_description_chars': len(request.form.get('job_description', '')),
+        'job_profile_id': request.form.get('job_profile_id', type=int),
+        'stages': {stage: {'ms': round(total * 1000, 1), 'calls': calls}
+                   for stage, (total, calls) in stage_totals(request_timings()).items()},
+    }
+
 def allowed_file(filename, file_type):
     if file_type == 'resume':
         return '.' in filename and filename.rsplit('.', 1)[1].lower() == 'pdf'
@@ -91,112 +176,282 @@ def logout():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    recent_results = MatchResult.query.filter_by(user_id=current_user.id)\
-                                    .order_by(MatchResult.created_at.desc())\
-                                    .limit(5).all()
-    return render_template('dashboard.html', recent_results=recent_results)
+    recent_results, _ = history_page(current_user.id, limit=5)
+    return render_template('dashboard.html', recent_results=recent_results, stats=history_stats(current_user.id))
+
+def resume_document_from_upload(resume_file):
+    """Stored analysis for an uploaded resume; new files are extracted and parsed once"""
+    content_hash = file_sha256(resume_file.stream)
+    return get_resume_document(
+        content_hash,
+        lambda: extract_text_from_upload(resume_file, app.config['UPLOAD_FOLDER'])
+    )
+
+def wants_json():
+    """True for fetch() requests from main.js that expect a JSON reply"""
+    return request.accept_mimetypes.best == 'application/json'
+
+def upload_error(message):
+    if wants_json():
+        return jsonify({'error': message}), 400
+    flash(message, 'danger')
+    return render_template('upload.html', job_profiles=user_job_profiles())
+
+def user_job_profiles():
+    return JobProfile.query.filter_by(user_id=current_user.id).order_by(JobProfile.created_at.desc()).all()
+
+def job_profile_summary(profile):
+    return {
+        'id': profile.id,
+        'title': profile.title,
+        'keywords': json.loads(profile.job_document.analysis).get('keyword_counts', [])[:10],
+        'created_at': profile.created_at.isoformat() if profile.created_at else None,
+    }
 
 @app.route('/upload', methods=['GET', 'POST'])
 @login_required
+@profiled
 def upload_files():
     if request.method == 'POST':
-        # Check if resume file and job description text are present
-        if 'resume' not in request.files or not request.form.get('job_description'):
-            flash('Both resume file and job description text are required.', 'danger')
-            return render_template('upload.html')
-        
-        resume_file = request.files['resume']
+        resume_file = request.files.get('resume')
         job_description_text = request.form.get('job_description', '').strip()
+        job_profile_id = request.form.get('job_profile_id', type=int)
+        job_profile = get_job_profile(current_user.id, job_profile_id)
         
-        # Check if resume file is selected and job description is provided
-        if resume_file.filename == '' or not job_description_text:
-            flash('Please select a resume file and provide job description text.', 'danger')
-            return render_template('upload.html')
+        if job_profile_id and job_profile is None:
+            return upload_error('Job profile not found.')
+        
+        # Check if resume file is selected and job description (or a saved profile) is provided
+        if resume_file is None or resume_file.filename == '' or not (job_description_text or job_profile):
+            return upload_error('Please select a resume file and provide job description text.')
         
         # Validate resume file type
         if not allowed_file(resume_file.filename, 'resume'):
-            flash('Resume must be in PDF format.', 'danger')
-            return render_template('upload.html')
+            return upload_error('Resume must be in PDF format.')
         
-        try:
-            # Save resume file
-            resume_filename = secure_filename(f"{current_user.id}_{resume_file.filename}")
-            resume_path = os.path.join(app.config['UPLOAD_FOLDER'], resume_filename)
-            resume_file.save(resume_path)
-            
-            # Process files
-            resume_text = extract_text_from_pdf(resume_path)
-            job_text = job_description_text
+        if app.config['ASYNC_ANALYSIS']:
+            from tasks import enqueue_analysis
             
-            if not resume_text or not job_text:
-                flash('Error extracting text from resume. Please check file format.', 'danger')
-                return render_template('upload.html')
-            
-            # Extract keywords
-            resume_keywords = extract_keywords(resume_text)
-            job_keywords = extract_keywords(job_text)
-            
-            # Calculate match score
-            match_score = calculate_match_score(resume_text, job_text)
-            
-            # Generate suggestions if score is low
-            suggestions = []
-            if match_score < 80:
-                suggestions = generate_suggestions(resume_keywords, job_keywords, match_score)
-            
-            # Save result to database
-            result = MatchResult(
-                user_id=current_user.id,
-                resume_filename=resume_file.filename,
-                job_description_filename="Direct Input",
-                match_score=match_score,
-                resume_keywords=json.dumps(resume_keywords),
-                job_keywords=json.dumps(job_keywords),
-                suggestions=json.dumps(suggestions)
-            )
+            # Hand the work to the background workers and answer right away
+            job = enqueue_analysis(current_user.id, resume_file.filename, resume_file.read(), job_description_text,
+                                   job_profile=job_profile)
+            status_url = url_for('job_status', job_id=job.id)
+            if wants_json():
+                return jsonify({'job_id': job.id, 'status': job.status, 'status_url': status_url}), 202
+            return render_template('upload.html', pending_job_url=status_url, job_profiles=user_job_profiles())
+        
+        try:
+            # Process files straight from the upload buffer, reusing earlier uploads of the same file
+            resume_document = resume_document_from_upload(resume_file)
             
-            db.session.add(result)
-            db.session.commit()
+            if not resume_document:
+                return upload_error('Error extracting text from resume. Please check file format.')
             
-            # Clean up uploaded resume file
-            os.remove(resume_path)
+            # Analyze, score and save result to database
+            result = analyze_resume(current_user.id, resume_file.filename, resume_document, job_description_text,
+                                    job_profile=job_profile)
             
             # Redirect to results
             return redirect(url_for('view_results', result_id=result.id))
             
         except Exception as e:
             logging.error(f"File processing error: {e}")
+            db.session.rollback()
+            return upload_error('Error processing files. Please try again.')
+    
+    return render_template('upload.html', job_profiles=user_job_profiles())
+
+@app.route('/api/jobs/<int:job_id>')
+@login_required
+def job_status(job_id):
+    job = AnalysisJob.query.filter_by(id=job_id, user_id=current_user.id).first()
+    
+    if not job:
+        return jsonify({'error': 'Job not found.'}), 404
+    
+    return jsonify({
+        'job_id': job.id,
+        'status': job.status,
+        'error': job.error,
+        'result_url': url_for('view_results', result_id=job.result_id) if job.result_id else None
+    })
+
+@app.route('/upload/bulk', methods=['GET', 'POST'])
+@login_required
+def bulk_upload():
+    if request.method == 'POST':
+        resume_files = [f for f in request.files.getlist('resumes') if f.filename]
+        job_description_text = request.form.get('job_description', '').strip()
+        job_profile_id = request.form.get('job_profile_id', type=int)
+        job_profile = get_job_profile(current_user.id, job_profile_id)
+        
+        if job_profile_id and job_profile is None:
+            flash('Job profile not found.', 'danger')
+            return render_template('bulk_upload.html', job_profiles=user_job_profiles())
+        
+        if not resume_files or not (job_description_text or job_profile):
+            flash('Please select at least one resume and provide job description text.', 'danger')
+            return render_template('bulk_upload.html', job_profiles=user_job_profiles())
+        
+        if len(resume_files) > app.config['BULK_MAX_RESUMES']:
+            flash(f"Please upload at most {app.config['BULK_MAX_RESUMES']} resumes at a time.", 'danger')
+            return render_template('bulk_upload.html', job_profiles=user_job_profiles())
+        
+        documents = []
+        skipped = []
+        for resume_file in resume_files:
+            if not allowed_file(resume_file.filename, 'resume'):
+                skipped.append(resume_file.filename)
+                continue
+            
+            resume_document = resume_document_from_upload(resume_file)
+            if resume_document:
+                documents.append((resume_file.filename, resume_document))
+            else:
+                skipped.append(resume_file.filename)
+        
+        if skipped:
+            flash(f"Skipped {len(skipped)} file(s) that are not readable PDFs: {', '.join(skipped)}", 'warning')
+        
+        if not documents:
+            flash('None of the uploaded resumes could be processed.', 'danger')
+            return render_template('bulk_upload.html', job_profiles=user_job_profiles())
+        
+        try:
+            ranked = rank_resumes(current_user.id, documents, job_description_text, job_profile=job_profile)
+        except Exception as e:
+            logging.error(f"Bulk processing error: {e}")
+            db.session.rollback()
             flash('Error processing files. Please try again.', 'danger')
-            return render_template('upload.html')
+            return render_template('bulk_upload.html', job_profiles=user_job_profiles())
+        
+        return render_template('bulk_upload.html', ranked=ranked, job_profiles=user_job_profiles())
+    
+    return render_template('bulk_upload.html', job_profiles=user_job_profiles())
+
+@app.route('/job-profiles', methods=['GET', 'POST'])
+@login_required
+def job_profiles():
+    if request.method == 'POST':
+        title = request.form.get('title', '').strip()
+        job_description_text = request.form.get('job_description', '').strip()
+        
+        if not title or not job_description_text:
+            flash('Please provide a title and the job description text.', 'danger')
+        else:
+            try:
+                profile = create_job_profile(current_user.id, title[:255], job_description_text)
+                flash(f'Saved job profile "{profile.title}".', 'success')
+                return redirect(url_for('job_profiles'))
+            except Exception as e:
+                logging.error(f"Error creating job profile: {e}")
+                db.session.rollback()
+                flash('Error saving job profile. Please try again.', 'danger')
+    
+    return render_template('job_profiles.html', job_profiles=user_job_profiles())
+
+@app.route('/api/job-profiles', methods=['GET', 'POST'])
+@login_required
+def job_profiles_api():
+    if request.method == 'POST':
+        data = request.get_json(silent=True) or request.form
+        title = (data.get('title') or '').strip()
+        job_description_text = (data.get('job_description') or '').strip()
+        
+        if not title or not job_description_text:
+            return jsonify({'error': 'Both title and job_description are required.'}), 400
+        
+        try:
+            profile = create_job_profile(current_user.id, title[:255], job_description_text)
+        except Exception as e:
+            logging.error(f"Error creating job profile: {e}")
+            db.session.rollback()
+            return jsonify({'error': 'Error saving job profile. Please try again.'}), 500
+        return jsonify(job_profile_summary(profile)), 201
+    
+    return jsonify({'job_profiles': [job_profile_summary(profile) for profile in user_job_profiles()]})
+
+@app.route('/job-profiles/<int:profile_id>/delete', methods=['POST'])
+@login_required
+def delete_job_profile(profile_id):
+    profile = get_job_profile(current_user.id, profile_id)
+    
+    if not profile:
+        flash('Job profile not found.', 'danger')
+        return redirect(url_for('job_profiles'))
+    
+    try:
+        db.session.delete(profile)
+        db.session.commit()
+        flash('Job profile deleted.', 'success')
+    except Exception as e:
+        logging.error(f"Error deleting job profile: {e}")
+        db.session.rollback()
+        flash('Error deleting job profile. Please try again.', 'danger')
     
-    return render_template('upload.html')
+    return redirect(url_for('job_profiles'))
+
+@app.route('/candidates', methods=['GET', 'POST'])
+@login_required
+def candidate_search():
+    if request.method == 'POST':
+        job_description_text = request.form.get('job_description', '').strip()
+        
+        if not job_description_text:
+            flash('Please provide job description text.', 'danger')
+            return render_template('candidates.html')
+        
+        try:
+            top = min(max(request.form.get('top', 10, type=int), 1), CANDIDATE_MAX_TOP)
+            candidates = find_candidates(current_user.id, job_description_text, k=top)
+        except Exception as e:
+            logging.error(f"Candidate search error: {e}")
+            db.session.rollback()
+            flash('Error searching resumes. Please try again.', 'danger')
+            return render_template('candidates.html')
+        
+        if not candidates:
+            flash('No previously uploaded resumes could be searched.', 'info')
+        
+        return render_template('candidates.html', candidates=candidates)
+    
+    return render_template('candidates.html')
 
 @app.route('/results/<int:result_id>')
 @login_required
 def view_results(result_id):
-    result = MatchResult.query.filter_by(id=result_id, user_id=current_user.id).first()
+    result = MatchResult.query.options(undefer_group('details'))\
+                              .filter_by(id=result_id, user_id=current_user.id).first()
     
     if not result:
         flash('Result not found.', 'danger')
         return redirect(url_for('dashboard'))
     
-    # Parse JSON data
-    resume_keywords = json.loads(result.resume_keywords)
-    job_keywords = json.loads(result.job_keywords)
-    suggestions = json.loads(result.suggestions)
-    
     return render_template('results.html', 
                          result=result,
-                         resume_keywords=resume_keywords,
-                         job_keywords=job_keywords,
-                         suggestions=suggestions)
+                         resume_keywords=result.resume_keywords or [],
+                         job_keywords=result.job_keywords or [],
+                         suggestions=result.suggestions or [])
 
 @app.route('/history')
 @login_required
 def view_history():
-    results = MatchResult.query.filter_by(user_id=current_user.id)\
-                              .order_by(MatchResult.created_at.desc()).all()
-    return render_template('dashboard.html', recent_results=results, show_all=True)
+    # ?missing=<keyword> lists only the results whose resume lacks that keyword
+    missing = request.args.get('missing', '').strip() or None
+    results, next_cursor = history_page(current_user.id, request.args.get('cursor'), missing=missing)
+    return render_template('dashboard.html', recent_results=results, show_all=True,
+                           stats=history_stats(current_user.id), next_cursor=next_cursor, missing=missing)
+
+@app.route('/api/history')
+@login_required
+def history_api():
+    missing = request.args.get('missing', '').strip() or None
+    limit = min(max(request.args.get('limit', HISTORY_PAGE_SIZE, type=int), 1), 100)
+    results, next_cursor = history_page(current_user.id, request.args.get('cursor'), limit, missing)
+    return jsonify({
+        'results': [dict(history_item(result), url=url_for('view_results', result_id=result.id)) for result in results],
+        'next_cursor': next_cursor,
+    })
 
 @app.route('/delete_result/<int:result_id>', methods=['POST'])
 @login_required
@@ -216,3 +471,28 @@ def delete_result(result_id):
         flash('Error deleting result. Please try again.', 'danger')
     
     return redirect(url_for('dashboard'))
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus metrics of every worker on this host"""
+    token = app.config['METRICS_TOKEN']
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f"Bearer {token}"):
+        abort(403)
+    return Response(metrics.render() + gemini_metric_lines(client.stats()),
+                    mimetype='text/plain; version=0.0.4')
+
+@app.route('/admin/profiles')
+@admin_required
+def admin_profiles():
+    profiles = profile_store.list()
+    if wants_json():
+        return jsonify({'profiles': profiles})
+    return render_template('admin_profiles.html', profiles=profiles, profiler=request_profiler)
+
+@app.route('/admin/profiles/<name>')
+@admin_required
+def download_profile(name):
+    path = profile_store.path(name)
+    if path is None:
+        abort(404)
+    return send_file(path, as_attachment=True, download_name=os.path.basename(path))
@@ -202,14 +202,16 @@ function enhanceUploadForm() {
     uploadForm.addEventListener('submit', function(e) {
         const resumeFile = document.getElementById('resume').files[0];
         const jobDescText = document.getElementById('job_description').value.trim();
+        const jobProfile = document.getElementById('job_profile_id');
+        const usesJobProfile = jobProfile && jobProfile.value;
         
-        if (!resumeFile || !jobDescText) {
+        if (!resumeFile || !(jobDescText || usesJobProfile)) {
             e.preventDefault();
             showAlert('Please select a resume file and provide job description text', 'warning');
             return false;
         }
         
-        if (jobDescText.length < 50) {
+        if (!usesJobProfile && jobDescText.length < 50) {
             e.preventDefault();
             showAlert('Job description is too short. Please provide more details for accurate analysis.', 'warning');
             return false;
@@ -217,7 +219,19 @@ function enhanceUploadForm() {
         
         // Show processing indicator
         showProcessingIndicator();
+        
+        // Queue the analysis and poll for its result instead of waiting on the request
+        if (uploadForm.dataset.async === 'true') {
+            e.preventDefault();
+            submitAnalysisJob(uploadForm);
+        }
     });
+    
+    // Plain form submissions come back with the queued job to follow
+    if (uploadForm.dataset.pendingJobUrl) {
+        showProcessingIndicator();
+        pollAnalysisJob(uploadForm.dataset.pendingJobUrl);
+    }
 }
 
 function showProcessingIndicator() {
@@ -231,21 +245,85 @@ function showProcessingIndicator() {
     
     if (progressContainer) {
         progressContainer.style.display = 'block';
-        
-        // Animate progress
-        let progress = 0;
-        const interval = setInterval(() => {
-            progress += Math.random() * 10;
-            if (progress > 90) {
-                clearInterval(interval);
-                progress = 90; // Don't complete until actual completion
+    }
+}
+
+const JOB_PROGRESS = {
+    queued: { width: 25, text: 'Waiting for an available analysis worker...' },
+    running: { width: 60, text: 'Analyzing documents with AI... This may take a few moments.' },
+    done: { width: 100, text: 'Analysis complete! Loading your results...' }
+};
+
+function submitAnalysisJob(form) {
+    fetch(form.action || window.location.href, {
+        method: 'POST',
+        body: new FormData(form),
+        headers: { 'Accept': 'application/json' }
+    })
+        .then(response => response.json().then(data => ({ ok: response.ok, data: data })))
+        .then(({ ok, data }) => {
+            if (!ok) {
+                throw new Error(data.error || 'Error processing files. Please try again.');
             }
+            updateJobProgress(data.status);
+            pollAnalysisJob(data.status_url);
+        })
+        .catch(error => {
+            // Non-JSON replies (e.g. file too large) only carry a generic message
+            const message = error instanceof SyntaxError ? 'Error processing files. Please try again.' : error.message;
+            resetUploadForm();
+            showAlert(message, 'danger');
+        });
+}
+
+function pollAnalysisJob(statusUrl) {
+    fetch(statusUrl, { headers: { 'Accept': 'application/json' } })
+        .then(response => response.json())
+        .then(job => {
+            updateJobProgress(job.status);
             
-            const progressBar = progressContainer.querySelector('.progress-bar');
-            if (progressBar) {
-                progressBar.style.width = progress + '%';
+            if (job.status === 'done') {
+                window.location.href = job.result_url;
+            } else if (job.status === 'failed') {
+                resetUploadForm();
+                showAlert(job.error || 'Error processing files. Please try again.', 'danger');
+            } else {
+                setTimeout(() => pollAnalysisJob(statusUrl), 1000);
             }
-        }, 500);
+        })
+        .catch(() => {
+            // Back off on network hiccups and keep following the job
+            setTimeout(() => pollAnalysisJob(statusUrl), 3000);
+        });
+}
+
+function updateJobProgress(status) {
+    const progress = JOB_PROGRESS[status];
+    const progressContainer = document.getElementById('progressContainer');
+    if (!progress || !progressContainer) return;
+    
+    const progressBar = progressContainer.querySelector('.progress-bar');
+    if (progressBar) {
+        progressBar.style.width = progress.width + '%';
+    }
+    
+    const progressText = document.getElementById('progressText');
+    if (progressText) {
+        progressText.textContent = progress.text;
+    }
+}
+
+function resetUploadForm() {
+    const submitBtn = document.getElementById('submitBtn');
+    const progressContainer = document.getElementById('progressContainer');
+    
+    if (submitBtn) {
+        submitBtn.disabled = false;
+        submitBtn.innerHTML = '<i class="fas fa-brain me-2"></i>Analyze Match';
+    }
+    
+    if (progressContainer) {
+        progressContainer.style.display = 'none';
     }
 }
 
@@ -0,0 +1,234 @@
+import os
+import time
+import signal
+import socket
+import logging
+import threading
+import multiprocessing
+from datetime import datetime, timedelta
+from sqlalchemy import select, update
+from app import app, db
+from models import AnalysisJob, JobProfile
+from pipeline import analyze_resume
+from resume_store import get_resume_document
+from utils.file_processor import extract_text_from_pdf, file_sha256
+from utils.metrics import metrics
+
+# Workers refresh the heartbeat of their running job this often; a job whose
+# heartbeat is older than STALE_JOB_TIMEOUT belonged to a worker that died
+JOB_HEARTBEAT_INTERVAL = 30
+STALE_JOB_TIMEOUT = timedelta(minutes=2)
+MAX_JOB_ATTEMPTS = 3
+
+def worker_id():
+    """Identity recorded on the jobs this process claims"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+def worker_gone(job_worker_id):
+    """True when job_worker_id is a process on this host that no longer exists"""
+    host, _, pid = (job_worker_id or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        pass
+    return False
+
+def enqueue_analysis(user_id, resume_filename, resume_data, job_text, job_profile=None):
+    """Queue a resume analysis and return the new AnalysisJob"""
+    job = AnalysisJob(
+        user_id=user_id,
+        resume_filename=resume_filename,
+        resume_data=resume_data,
+        job_description=job_profile.job_document.text if job_profile is not None else job_text,
+        job_profile_id=job_profile.id if job_profile is not None else None
+    )
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+def requeue_stale_jobs():
+    """Give jobs abandoned by a dead worker another attempt, or fail them
+
+    A running job is abandoned when its heartbeat expired or its worker, on
+    this host, has exited. Jobs whose worker is alive and beating are left
+    alone however long they take.
+    """
+    cutoff = datetime.utcnow() - STALE_JOB_TIMEOUT
+    running = db.session.execute(
+        select(AnalysisJob.id, AnalysisJob.worker_id, AnalysisJob.heartbeat_at, AnalysisJob.started_at,
+               AnalysisJob.attempts)
+        .where(AnalysisJob.status == 'running')
+    ).all()
+
+    recovered = 0
+    for job_id, job_worker_id, heartbeat_at, started_at, attempts in running:
+        if (heartbeat_at or started_at) >= cutoff and not worker_gone(job_worker_id):
+            continue
+        if attempts >= MAX_JOB_ATTEMPTS:
+            values = dict(status='failed', error='Analysis did not finish. Please try again.', resume_data=None,
+                          finished_at=datetime.utcnow())
+        else:
+            values = dict(status='queued')
+        # Unless the worker beat or finished in the meantime
+        recovered += db.session.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job_id, AnalysisJob.status == 'running',
+                   AnalysisJob.worker_id.is_not_distinct_from(job_worker_id),
+                   AnalysisJob.heartbeat_at.is_not_distinct_from(heartbeat_at))
+            .values(worker_id=None, **values)
+        ).rowcount
+    db.session.commit()
+    if recovered:
+        logging.warning(f"Recovered {recovered} stale analysis jobs")
+
+def claim_next_job():
+    """Atomically move the oldest queued job to 'running' and return it
+
+    The conditional UPDATE makes the claim safe between worker processes on
+    SQLite; on PostgreSQL SKIP LOCKED also keeps workers from blocking on
+    each other.
+    """
+    while True:
+        job_id = db.session.execute(
+            select(AnalysisJob.id)
+            .where(AnalysisJob.status == 'queued')
+            .order_by(AnalysisJob.id)
+            .limit(1)
+            .with_for_update(skip_locked=True)
+        ).scalar()
+        if job_id is None:
+            db.session.commit()
+            return None
+
+        claimed = db.session.execute(
+            update(AnalysisJob)
+            .where(AnalysisJob.id == job_id, AnalysisJob.status == 'queued')
+            .values(status='running', started_at=datetime.utcnow(), heartbeat_at=datetime.utcnow(),
+                    worker_id=worker_id(), attempts=AnalysisJob.attempts + 1)
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            return db.session.get(AnalysisJob, job_id)
+
+class Heartbeat:
+    """Background thread refreshing a running job's heartbeat_at until stopped
+
+    It writes through its own connection, since the job's session belongs
+    to the thread running the pipeline.
+    """
+
+    def __init__(self, job_id, interval=JOB_HEARTBEAT_INTERVAL):
+        self.job_id = job_id
+        self.interval = interval
+        self.engine = db.engine
+        self.worker_id = worker_id()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=f"heartbeat-{job_id}", daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(
+                        update(AnalysisJob)
+                        .where(AnalysisJob.id == self.job_id, AnalysisJob.status == 'running',
+                               AnalysisJob.worker_id == self.worker_id)
+                        .values(heartbeat_at=datetime.utcnow())
+                    )
+            except Exception as e:
+                logging.error(f"Could not refresh heartbeat of analysis job {self.job_id}: {e}")
+
+def run_job(job):
+    """Run the analysis pipeline for a claimed job and record the outcome
+
+    A job that is no longer running under this worker (it was recovered and
+    claimed elsewhere, or already finished) is left alone, so it is never
+    scored twice.
+    """
+    if job.status != 'running' or job.worker_id != worker_id() or job.resume_data is None:
+        logging.warning(f"Analysis job {job.id} is no longer claimed by this worker, skipping it")
+        return
+
+    outcome = {}
+    with Heartbeat(job.id):
+        try:
+            data = job.resume_data
+            resume_document = get_resume_document(file_sha256(data), lambda: extract_text_from_pdf(data))
+            if not resume_document:
+                outcome = dict(status='failed', error='Error extracting text from resume. Please check file format.')
+            else:
+                # A deleted profile leaves job_profile_id unset; its text is still on the job
+                job_profile = db.session.get(JobProfile, job.job_profile_id) if job.job_profile_id else None
+                result = analyze_resume(job.user_id, job.resume_filename, resume_document, job.job_description,
+                                        job_profile=job_profile)
+                outcome = dict(status='done', result_id=result.id)
+        except Exception as e:
+            logging.error(f"Analysis job {job.id} failed: {e}")
+            db.session.rollback()
+            outcome = dict(status='failed', error='Error processing files. Please try again.')
+
+    finished = db.session.execute(
+        update(AnalysisJob)
+        .where(AnalysisJob.id == job.id, AnalysisJob.status == 'running', AnalysisJob.worker_id == worker_id())
+        .values(resume_data=None, finished_at=datetime.utcnow(), **outcome)
+    ).rowcount
+    db.session.commit()
+    if not finished:
+        logging.warning(f"Analysis job {job.id} was recovered by another worker before it finished")
+    metrics.flush()
+
+def worker_loop(poll_interval=1.0):
+    """Process queued jobs until the process receives SIGTERM or SIGINT"""
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.append(signum))
+
+    with app.app_context():
+        logging.info(f"Analysis worker {os.getpid()} started")
+        try:
+            while not stopping:
+                requeue_stale_jobs()
+                job = claim_next_job()
+                if job is None:
+                    time.sleep(poll_interval)
+                    continue
+                run_job(job)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            db.session.remove()
+        logging.info(f"Analysis worker {os.getpid()} stopped")
+
+def start_worker_pool(processes, poll_interval=1.0):
+    """Start analysis worker processes and return them
+
+    Workers are spawned rather than forked so each one gets fresh database
+    connections and its own spaCy model. They are not daemonic so they can
+    run process pools of their own; stop them with stop_worker_pool().
+    """
+    context = multiprocessing.get_context('spawn')
+    workers = []
+    for _ in range(processes):
+        worker = context.Process(target=worker_loop, args=(poll_interval,))
+        worker.start()
+        workers.append(worker)
+    return workers
+
+def stop_worker_pool(workers, timeout=10):
+    """Ask every worker to finish its current job and wait for it to exit"""
+    for worker in workers:
+        if worker.is_alive():
+            worker.terminate()
+    for worker in workers:
+        worker.join(timeout)
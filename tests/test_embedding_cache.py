@@ -0,0 +1,35 @@
+import sqlite3
+import numpy as np
+from utils.embedding_cache import EmbeddingCache
+
+def stored_rows(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM embeddings").fetchone()
+
+def test_disk_stays_within_budget(tmp_path):
+    path = str(tmp_path / "cache.db")
+    vector = np.ones(64, dtype=np.float32)
+    cache = EmbeddingCache(path, max_memory_items=1, max_disk_bytes=100 * vector.nbytes, resync_interval=16)
+    for i in range(500):
+        cache.put(f"text {i}", "model", vector)
+    count, size = stored_rows(path)
+    assert size <= 100 * vector.nbytes
+    assert 0 < count <= 100
+
+def test_disk_hits_are_touched_in_batches(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = EmbeddingCache(path, max_memory_items=1, touch_batch=3, touch_interval=3600)
+    for i in range(3):
+        cache.put(f"text {i}", "model", np.full(4, i, dtype=np.float32))
+    with sqlite3.connect(path) as conn:
+        before = dict(conn.execute("SELECT key, last_used FROM embeddings"))
+
+    cache.get("text 0", "model")
+    cache.get("text 1", "model")
+    with sqlite3.connect(path) as conn:
+        assert dict(conn.execute("SELECT key, last_used FROM embeddings")) == before
+
+    cache.get("text 2", "model")
+    with sqlite3.connect(path) as conn:
+        after = dict(conn.execute("SELECT key, last_used FROM embeddings"))
+    assert all(after[key] > before[key] for key in before)
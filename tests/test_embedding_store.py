@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from utils.embedding_store import EmbeddingStore
+from utils.match_calculator import embedding_similarities
+from utils.nlp_analyzer import DocumentAnalysis
+
+def test_released_rows_are_reused(tmp_path):
+    store = EmbeddingStore(str(tmp_path), dtype='float16')
+    rows = [store.append(f"key {i}", np.eye(4)[i]) for i in range(3)]
+    assert store.release(["key 1", "missing"]) == 1
+    assert store.get("key 1") is None
+
+    assert store.append("key 3", np.eye(4)[3]) == rows[1]
+    assert len(store) == 3
+    assert store.get("key 3").tolist() == [0, 0, 0, 1]
+    assert store.append("key 4", np.eye(4)[0]) == 3
+
+@pytest.mark.parametrize("dtype", ['float16', 'int8'])
+def test_store_rows_score_like_float32(tmp_path, dtype):
+    rng = np.random.default_rng(3)
+    vectors = rng.standard_normal((20, 16)).astype(np.float32)
+    query = rng.standard_normal(16).astype(np.float32)
+    store = EmbeddingStore(str(tmp_path), dtype=dtype)
+
+    analyses = []
+    for i, vector in enumerate(vectors):
+        analysis = DocumentAnalysis(f"resume {i}")
+        if i % 2:
+            # Mixed with freshly embedded float32 vectors, as when some resumes are new
+            store.append(f"key {i}", vector)
+            analysis.embedding = store.get(f"key {i}")
+            analysis.embedding_norm = store.row_norm
+        else:
+            analysis.embedding = vector
+        analyses.append(analysis)
+
+    expected = vectors @ query / (np.linalg.norm(vectors, axis=1) * np.linalg.norm(query))
+    assert np.allclose(embedding_similarities(analyses, query), expected, atol=0.02)
@@ -0,0 +1,108 @@
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from google.genai import errors
+from utils.gemini_client import CircuitBreaker, GeminiUnavailable, ResilientGeminiClient
+
+class FakeGemini(BaseHTTPRequestHandler):
+    """Answers embedding calls, failing with the queued status codes first"""
+
+    protocol_version = "HTTP/1.1"
+    statuses = []
+    hits = []
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.hits.append(time.monotonic())
+        status = self.statuses.pop(0) if self.statuses else 200
+        if status == 200:
+            out = {'embeddings': [{'values': [float(len(request['content']['parts'][0]['text'])), 1.0]}
+                                  for request in body['requests']]}
+        else:
+            out = {'error': {'code': status, 'message': 'fake failure', 'status': 'UNAVAILABLE'}}
+        data = json.dumps(out).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), FakeGemini)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    FakeGemini.statuses = []
+    FakeGemini.hits = []
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+
+def embed(client, texts=("abc",)):
+    response = client.models.embed_content(model="text-embedding-004", contents=list(texts))
+    return [embedding.values for embedding in response.embeddings]
+
+def test_retries_with_exponential_backoff(server, monkeypatch):
+    # Take the top of every jitter range so the delays are predictable
+    monkeypatch.setattr("utils.gemini_client.random.uniform", lambda low, high: high)
+    client = ResilientGeminiClient("test-key", base_url=server, deadline=10, max_retries=3, backoff=0.1)
+    FakeGemini.statuses = [503, 429]
+
+    assert embed(client, ["abc", "de"]) == [[3.0, 1.0], [2.0, 1.0]]
+    gaps = [later - earlier for earlier, later in zip(FakeGemini.hits, FakeGemini.hits[1:])]
+    assert len(gaps) == 2
+    assert gaps[0] >= 0.1 and gaps[1] >= 0.2
+    assert client.stats()["gemini.embed_content.retries"] == 2
+
+def test_gives_up_after_max_retries_and_skips_client_errors(server):
+    client = ResilientGeminiClient("test-key", base_url=server, max_retries=2, backoff=0.01)
+    FakeGemini.statuses = [500, 500, 500]
+    with pytest.raises(GeminiUnavailable):
+        embed(client)
+    assert len(FakeGemini.hits) == 3
+
+    FakeGemini.statuses = [400]
+    with pytest.raises(errors.ClientError):
+        embed(client)
+    assert len(FakeGemini.hits) == 4
+
+def test_breaker_opens_and_closes(server):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.2)
+    client = ResilientGeminiClient("test-key", base_url=server, max_retries=0, breaker=breaker)
+    FakeGemini.statuses = [503, 503]
+    for _ in range(2):
+        with pytest.raises(GeminiUnavailable):
+            embed(client)
+    assert breaker.state == "open"
+
+    # An open circuit fails fast without touching the server
+    with pytest.raises(GeminiUnavailable, match="circuit is open"):
+        embed(client)
+    assert len(FakeGemini.hits) == 2
+
+    # A failed trial call opens it again, a successful one closes it
+    time.sleep(0.25)
+    FakeGemini.statuses = [503]
+    with pytest.raises(GeminiUnavailable):
+        embed(client)
+    assert breaker.state == "open"
+    time.sleep(0.25)
+    assert breaker.state == "half-open"
+    assert embed(client) == [[3.0, 1.0]]
+    assert breaker.state == "closed"
+
+def test_app_client_uses_gemini_base_url(server):
+    env = dict(os.environ, GEMINI_BASE_URL=server, GEMINI_STATE_PATH="", EMBEDDING_CACHE_PATH="",
+               METRICS_PATH="")
+    script = ("from utils.match_calculator import client; "
+              "print(client.models.embed_content(model='text-embedding-004', contents=['abcd']).embeddings[0].values)")
+    output = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, timeout=60,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert output.stdout.strip() == "[4.0, 1.0]", output.stderr
+    assert len(FakeGemini.hits) == 1
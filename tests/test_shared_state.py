@@ -0,0 +1,18 @@
+import sqlite3
+import pytest
+from utils.shared_state import SharedState
+
+def test_increments_add_up_across_workers(tmp_path):
+    path = str(tmp_path / "state.db")
+    first, second = SharedState(path), SharedState(path)
+    first.increment({"calls": 1, "latency": 0.5})
+    second.increment({"calls": 2})
+    assert first.values() == {"calls": 3, "latency": 0.5}
+
+def test_failed_increment_writes_nothing(tmp_path):
+    state = SharedState(str(tmp_path / "state.db"))
+    state.increment({"calls": 1})
+    with pytest.raises(sqlite3.Error):
+        # The unsupported value fails after the first counter was already updated
+        state.increment({"calls": 1, "broken": object()})
+    assert state.values() == {"calls": 1}
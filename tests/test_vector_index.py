@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+from utils.vector_index import ExactIndex, IVFIndex
+
+ROWS = 100_000
+DIMENSIONS = 32
+
+@pytest.fixture(scope="module")
+def store():
+    # Embeddings of real resumes are clustered by field, which is what IVF relies on
+    rng = np.random.default_rng(7)
+    centers = rng.standard_normal((300, DIMENSIONS))
+    vectors = (centers[rng.integers(0, len(centers), ROWS)] + 0.3 * rng.standard_normal((ROWS, DIMENSIONS)))
+    vectors = vectors.astype(np.float16)
+    ids = np.arange(1, ROWS + 1, dtype=np.int64)
+    return ids, vectors, IVFIndex(ids, vectors, n_probe=8)
+
+def recall(store, allowed_count, k, queries=10):
+    ids, vectors, ivf = store
+    exact = ExactIndex(ids, vectors)
+    rng = np.random.default_rng(allowed_count)
+    hits = expected = 0
+    for _ in range(queries):
+        allowed = set(rng.choice(ids, allowed_count, replace=False).tolist())
+        query = vectors[rng.integers(0, ROWS)].astype(np.float32) + 0.3 * rng.standard_normal(DIMENSIONS)
+        truth = {document_id for document_id, _ in exact.search(query, k, allowed)}
+        found = ivf.search(query, k, allowed)
+        assert {document_id for document_id, _ in found} <= allowed
+        hits += len(truth & {document_id for document_id, _ in found})
+        expected += len(truth)
+    return hits / expected
+
+def test_ivf_finds_every_allowed_hit_of_a_small_set(store):
+    # The user's own resumes are a tiny slice of the shared index
+    assert recall(store, allowed_count=50, k=30) == 1.0
+
+def test_ivf_probes_until_enough_allowed_rows(store):
+    assert recall(store, allowed_count=5000, k=30) >= 0.9
+
+def test_exact_search_skips_unused_rows():
+    vectors = np.eye(3, dtype=np.float32)
+    index = ExactIndex([5, -1, 7], vectors)
+    assert sorted(document_id for document_id, _ in index.search([0, 1, 0], k=3)) == [5, 7]
+    assert index.search([1, 0, 0], k=1, allowed_ids={7}) == [(7, 0.0)]
@@ -0,0 +1,133 @@
+import os
+import hashlib
+import logging
+import threading
+import numpy as np
+
+class EmbeddingBackend:
+    """Turns texts into fixed-size vectors.
+
+    name identifies the vector space. It is part of every cache and store
+    key, so vectors from different backends (or differently fitted models)
+    are never compared with each other.
+    """
+
+    name = None
+    batch_limit = 100  # Maximum texts per embed() call
+
+    def embed(self, texts):
+        """Return an (n, d) float32 matrix for texts; raise on failure"""
+        raise NotImplementedError
+
+class GeminiBackend(EmbeddingBackend):
+    """Remote embeddings from the Gemini API"""
+
+    def __init__(self, get_client, model="text-embedding-004", batch_limit=100):
+        # The client is looked up on every call so it can be replaced at runtime
+        self.get_client = get_client
+        self.name = model
+        self.batch_limit = batch_limit
+
+    def embed(self, texts):
+        response = self.get_client().models.embed_content(model=self.name, contents=list(texts))
+        embeddings = getattr(response, 'embeddings', None) or []
+        if len(embeddings) != len(texts):
+            raise ValueError(f"Gemini API returned {len(embeddings)} embeddings for {len(texts)} texts")
+        return np.array([embedding.values for embedding in embeddings], dtype=np.float32)
+
+class SpacyVectorBackend(EmbeddingBackend):
+    """Local embeddings: the average of spaCy static word vectors
+
+    Needs a pipeline that ships vectors, such as en_core_web_md. Only the
+    tokenizer runs, so this is cheap on CPU.
+    """
+
+    def __init__(self, model="en_core_web_md", batch_limit=256):
+        self.model = model
+        self.name = f"spacy:{model}"
+        self.batch_limit = batch_limit
+        self._nlp = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._nlp is None:
+            with self._lock:
+                if self._nlp is None:
+                    import spacy
+                    nlp = spacy.load(self.model)
+                    if not nlp.vocab.vectors_length:
+                        raise ValueError(f"spaCy model {self.model} has no word vectors")
+                    self._nlp = nlp
+        return self._nlp
+
+    def embed(self, texts):
+        nlp = self._load()
+        return np.vstack([doc.vector for doc in nlp.tokenizer.pipe(texts)]).astype(np.float32)
+
+class LsaBackend(EmbeddingBackend):
+    """Local embeddings from a TF-IDF + truncated SVD (LSA) model fitted on our own corpus
+
+    Fit and save a model with fit_lsa_model() and save_lsa_model() (or
+    `flask fit-embedding-model`). The name includes a digest of the model
+    file, so refitting never mixes old and new vectors.
+    """
+
+    def __init__(self, path, batch_limit=1000):
+        self.path = path
+        self.batch_limit = batch_limit
+        self._model = None
+        self._name = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._model is None:
+            with self._lock:
+                if self._model is None:
+                    import joblib
+                    with open(self.path, 'rb') as file:
+                        digest = hashlib.sha256(file.read()).hexdigest()[:12]
+                    self._model = joblib.load(self.path)
+                    self._name = f"lsa:{digest}"
+        return self._model
+
+    @property
+    def name(self):
+        if self._name is None:
+            try:
+                self._load()
+            except OSError:
+                return "lsa:unfitted"
+        return self._name
+
+    def embed(self, texts):
+        return self._load().transform(list(texts)).astype(np.float32)
+
+def fit_lsa_model(texts, n_components=256):
+    """Fit a TF-IDF + LSA pipeline that maps texts to unit-length vectors"""
+    from sklearn.decomposition import TruncatedSVD
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import Normalizer
+
+    texts = list(texts)
+    vectorizer = TfidfVectorizer(sublinear_tf=True, stop_words='english', ngram_range=(1, 2),
+                                 max_features=50000, min_df=2 if len(texts) >= 100 else 1)
+    tfidf = vectorizer.fit_transform(texts)
+
+    # SVD needs fewer components than both documents and terms
+    n_components = max(1, min(n_components, tfidf.shape[0] - 1, tfidf.shape[1] - 1))
+    svd = TruncatedSVD(n_components=n_components, random_state=0)
+    svd.fit(tfidf)
+
+    logging.info(f"Fitted LSA embedding model with {n_components} components on {len(texts)} texts")
+    return make_pipeline(vectorizer, svd, Normalizer(copy=False))
+
+def save_lsa_model(model, path):
+    """Write a fitted LSA model atomically so running workers never load a partial file"""
+    import joblib
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    joblib.dump(model, temp_path)
+    os.replace(temp_path, path)
@@ -0,0 +1,194 @@
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+import numpy as np
+from utils.local_db import ProcessConnection
+
+def normalize_text(text):
+    """Collapse whitespace so trivially different copies share a cache entry"""
+    return " ".join(text.split())
+
+def text_hash(text):
+    """SHA-256 of the normalized text, used to recognize repeated documents"""
+    return hashlib.sha256(normalize_text(text).encode('utf-8')).hexdigest()
+
+def cache_key(text, model):
+    """Content address for an embedding: SHA-256 of model name and normalized text"""
+    digest = hashlib.sha256()
+    digest.update(model.encode('utf-8'))
+    digest.update(b"\0")
+    digest.update(normalize_text(text).encode('utf-8'))
+    return digest.hexdigest()
+
+class EmbeddingCache:
+    """Two-level embedding cache: a bounded in-process LRU in front of SQLite.
+
+    The SQLite file is shared by every worker process on the host. Vectors are
+    stored as float32 blobs and the least recently used rows are evicted once
+    the stored vectors exceed max_disk_bytes.
+
+    Each process keeps a running estimate of the stored bytes, so the table
+    is only summed when the estimate crosses the budget or every
+    resync_interval writes (to pick up other workers' inserts). Disk hits
+    update last_used in batches, at most every touch_interval seconds or
+    touch_batch hits, rather than committing on every read.
+    """
+
+    def __init__(self, path=None, max_memory_items=1024, max_disk_bytes=256 * 1024 * 1024,
+                 resync_interval=256, touch_batch=64, touch_interval=30.0):
+        self.path = path
+        self.max_memory_items = max_memory_items
+        self.max_disk_bytes = max_disk_bytes
+        self.resync_interval = resync_interval
+        self.touch_batch = touch_batch
+        self.touch_interval = touch_interval
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = ProcessConnection(path, (
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "key TEXT PRIMARY KEY, model TEXT NOT NULL, vector BLOB NOT NULL, "
+            "size INTEGER NOT NULL, last_used REAL NOT NULL)",
+            "CREATE INDEX IF NOT EXISTS ix_embeddings_last_used ON embeddings (last_used)",
+        ), on_open=self._forget_disk_state)
+        self._disk_bytes = None
+        self._writes = 0
+        self._touched = {}
+        self._touched_at = time.monotonic()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _connection(self):
+        return self._db.get()
+
+    def _forget_disk_state(self):
+        # Totals and pending touches of the parent process do not carry over a fork
+        self._disk_bytes = None
+        self._touched = {}
+
+    def _remember(self, key, vector):
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+
+    def get(self, text, model):
+        """Return the cached embedding for text, or None on a miss"""
+        key = cache_key(text, model)
+        with self._lock:
+            vector = self._memory.get(key)
+            if vector is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return vector
+
+            if self.path:
+                try:
+                    conn = self._connection()
+                    row = conn.execute("SELECT vector FROM embeddings WHERE key = ?", (key,)).fetchone()
+                    if row is not None:
+                        self._touch(conn, key)
+                        vector = np.frombuffer(row[0], dtype=np.float32)
+                        self._remember(key, vector)
+                        self.disk_hits += 1
+                        return vector
+                except sqlite3.Error as e:
+                    logging.error(f"Error reading embedding cache: {e}")
+
+            self.misses += 1
+            return None
+
+    def put(self, text, model, vector):
+        """Store an embedding in both cache levels"""
+        key = cache_key(text, model)
+        vector = np.asarray(vector, dtype=np.float32)
+        with self._lock:
+            self._remember(key, vector)
+
+            if self.path:
+                try:
+                    conn = self._connection()
+                    blob = vector.tobytes()
+                    conn.execute(
+                        "INSERT OR REPLACE INTO embeddings (key, model, vector, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                        (key, model, blob, len(blob), time.time())
+                    )
+                    self._flush_touches(conn)
+                    conn.commit()
+
+                    self._writes += 1
+                    if self._disk_bytes is not None and self._writes % self.resync_interval:
+                        self._disk_bytes += len(blob)
+                    else:
+                        self._disk_bytes = self._stored_bytes(conn)
+                    if self._disk_bytes > self.max_disk_bytes:
+                        self._evict(conn)
+                except sqlite3.Error as e:
+                    logging.error(f"Error writing embedding cache: {e}")
+
+    def _touch(self, conn, key):
+        """Record a disk hit; last_used is written with the next batch of touches"""
+        self._touched[key] = time.time()
+        if (len(self._touched) >= self.touch_batch or
+                time.monotonic() - self._touched_at >= self.touch_interval):
+            self._flush_touches(conn)
+            conn.commit()
+
+    def _flush_touches(self, conn):
+        """Write pending last_used updates; the caller commits"""
+        if self._touched:
+            conn.executemany("UPDATE embeddings SET last_used = ? WHERE key = ?",
+                             [(used, key) for key, used in self._touched.items()])
+            self._touched = {}
+        self._touched_at = time.monotonic()
+
+    @staticmethod
+    def _stored_bytes(conn):
+        return conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def _evict(self, conn):
+        # The running total may be stale or count replaced rows twice, so check the table
+        total = self._stored_bytes(conn)
+        self._disk_bytes = total
+        if total <= self.max_disk_bytes:
+            return
+
+        # Trim to 90% of the budget so eviction does not run on every insert
+        target = int(self.max_disk_bytes * 0.9)
+        freed = 0
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM embeddings ORDER BY last_used"):
+            if total - freed <= target:
+                break
+            stale.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM embeddings WHERE key = ?", stale)
+        conn.commit()
+        self._disk_bytes = total - freed
+        logging.info(f"Evicted {len(stale)} embeddings ({freed} bytes) from cache")
+
+    def clear(self):
+        """Drop every cached embedding"""
+        with self._lock:
+            self._memory.clear()
+            if self.path:
+                conn = self._connection()
+                conn.execute("DELETE FROM embeddings")
+                conn.commit()
+                self._touched = {}
+                self._disk_bytes = 0
+
+    def stats(self):
+        """Return hit/miss counters for this process"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                'memory_items': len(self._memory),
+            }
@@ -0,0 +1,168 @@
+import os
+import fcntl
+import sqlite3
+import logging
+import threading
+import numpy as np
+from utils.local_db import ProcessConnection
+
+STORE_DTYPES = {'float32': np.float32, 'float16': np.float16, 'int8': np.int8}
+
+# int8 rows hold unit vectors scaled to this range
+INT8_SCALE = 127.0
+
+class EmbeddingStore:
+    """Append-only, memory-mapped embedding matrix shared by every worker on the host.
+
+    Vectors are normalized to unit length, optionally quantized to float16 or
+    int8, and appended as fixed-size rows to one file that readers map with
+    np.memmap. Workers therefore share the OS page cache instead of each
+    holding a copy, and reads return views without copying. A SQLite side
+    table maps keys (content hashes) to row numbers. Rows given up with
+    release() are overwritten by later appends instead of growing the file.
+    """
+
+    def __init__(self, path, dtype='float16'):
+        if dtype not in STORE_DTYPES:
+            raise ValueError(f"Unsupported embedding store dtype: {dtype}")
+        self.path = path
+        self.dtype = np.dtype(STORE_DTYPES[dtype])
+        self.vectors_path = os.path.join(path, f"vectors.{dtype}.bin")
+        self._lock = threading.Lock()
+        self._db = ProcessConnection(os.path.join(path, "index.db"), (
+            "CREATE TABLE IF NOT EXISTS rows (key TEXT PRIMARY KEY, row INTEGER NOT NULL)",
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)",
+            "CREATE TABLE IF NOT EXISTS free (row INTEGER PRIMARY KEY)",
+        ))
+        self._dim = None
+        self._map = None
+
+    def _connection(self):
+        return self._db.get()
+
+    @property
+    def dim(self):
+        if self._dim is None:
+            row = self._connection().execute("SELECT value FROM meta WHERE name = 'dim'").fetchone()
+            if row is not None:
+                self._dim = int(row[0])
+        return self._dim
+
+    @property
+    def row_norm(self):
+        """Length of every stored row, for scoring without recomputing norms"""
+        return INT8_SCALE if self.dtype == np.int8 else 1.0
+
+    def quantize(self, vector):
+        """Unit-normalize a vector and convert it to the store's dtype"""
+        vector = np.asarray(vector, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        if norm:
+            vector = vector / norm
+        if self.dtype == np.int8:
+            return np.clip(np.round(vector * INT8_SCALE), -INT8_SCALE, INT8_SCALE).astype(np.int8)
+        return vector.astype(self.dtype)
+
+    def append(self, key, vector):
+        """Store vector under key and return its row; an existing key keeps its row"""
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT row FROM rows WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                return row[0]
+
+            data = self.quantize(vector)
+            with open(self.vectors_path + ".lock", "w") as lock_file:
+                # Serialize appends from every process on the host
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                row = conn.execute("SELECT row FROM rows WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    return row[0]
+
+                if self.dim is None:
+                    conn.execute("INSERT OR IGNORE INTO meta (name, value) VALUES ('dim', ?)", (str(len(data)),))
+                    conn.commit()
+                    self._dim = None
+                if len(data) != self.dim:
+                    raise ValueError(f"Embedding has {len(data)} dimensions, store holds {self.dim}")
+
+                row_bytes = self.dim * self.dtype.itemsize
+                free = conn.execute("SELECT row FROM free ORDER BY row LIMIT 1").fetchone()
+                if free is not None:
+                    row = free[0]
+                    with open(self.vectors_path, "r+b") as file:
+                        file.seek(row * row_bytes)
+                        file.write(data.tobytes())
+                    conn.execute("DELETE FROM free WHERE row = ?", (row,))
+                else:
+                    with open(self.vectors_path, "ab") as file:
+                        # Drop a partial row left by a writer that crashed mid-append
+                        size = file.seek(0, os.SEEK_END)
+                        if size % row_bytes:
+                            file.truncate(size - size % row_bytes)
+                        row = size // row_bytes
+                        file.write(data.tobytes())
+
+                conn.execute("INSERT INTO rows (key, row) VALUES (?, ?)", (key, row))
+                conn.commit()
+                return row
+
+    def release(self, keys):
+        """Forget the rows of keys so appends can reuse them; returns the number released
+
+        A released row may be overwritten as soon as this returns, so only
+        release keys whose documents are gone.
+        """
+        keys = list(keys)
+        released = 0
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = conn.execute(f"SELECT row FROM rows WHERE key IN ({placeholders})", chunk).fetchall()
+                conn.execute(f"DELETE FROM rows WHERE key IN ({placeholders})", chunk)
+                conn.executemany("INSERT OR IGNORE INTO free (row) VALUES (?)", rows)
+                released += len(rows)
+            conn.commit()
+        return released
+
+    def vectors(self):
+        """Read-only (rows, dim) memmap of the whole store, remapped after other processes append"""
+        dim = self.dim
+        if not dim or not os.path.exists(self.vectors_path):
+            return np.zeros((0, dim or 0), dtype=self.dtype)
+
+        rows = os.path.getsize(self.vectors_path) // (dim * self.dtype.itemsize)
+        if not rows:
+            return np.zeros((0, dim), dtype=self.dtype)
+        if self._map is None or len(self._map) != rows:
+            self._map = np.memmap(self.vectors_path, dtype=self.dtype, mode='r', shape=(rows, dim))
+        return self._map
+
+    def __len__(self):
+        return len(self.vectors())
+
+    def rows(self, keys):
+        """Map each stored key in keys to its row"""
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            conn = self._connection()
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                found.update(conn.execute(f"SELECT key, row FROM rows WHERE key IN ({placeholders})", chunk))
+        return found
+
+    def get(self, key):
+        """Return the stored (quantized) vector for key as a memmap view, or None"""
+        try:
+            row = self.rows([key]).get(key)
+        except sqlite3.Error as e:
+            logging.error(f"Error reading embedding store: {e}")
+            return None
+        if row is None:
+            return None
+        vectors = self.vectors()
+        return vectors[row] if row < len(vectors) else None
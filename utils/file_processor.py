@@ -1,27 +1,152 @@
 import PyPDF2
+import hashlib
+import io
 import logging
+import multiprocessing
 import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from utils.metrics import timed
 
-def extract_text_from_pdf(file_path):
-    """Extract text from PDF file using PyPDF2"""
+# Extraction budgets; 0 disables a limit
+PDF_MAX_PAGES = int(os.environ.get("PDF_MAX_PAGES", "50"))
+PDF_MAX_CHARS = int(os.environ.get("PDF_MAX_CHARS", "200000"))
+
+# Worker processes for page-parallel extraction of long PDFs; 0 keeps it serial
+PDF_EXTRACT_PROCESSES = int(os.environ.get("PDF_EXTRACT_PROCESSES", "0"))
+PDF_PARALLEL_MIN_PAGES = int(os.environ.get("PDF_PARALLEL_MIN_PAGES", "20"))
+PDF_PAGES_PER_TASK = 5
+
+_page_pool = None
+_page_pool_pid = None
+
+def iter_pdf_pages(source, max_pages=None):
+    """Yield the text of each page of a PDF, one page at a time
+
+    source may be a path, a binary file object or a PdfReader.
+    """
+    pdf_reader = source if isinstance(source, PyPDF2.PdfReader) else PyPDF2.PdfReader(source)
+    for number, page in enumerate(pdf_reader.pages):
+        if max_pages and number >= max_pages:
+            break
+        yield page.extract_text() or ""
+
+def _extract_page_range(data, start, stop):
+    """Extract pages [start, stop) of a PDF given as bytes (runs in a worker process)"""
+    pdf_reader = PyPDF2.PdfReader(io.BytesIO(data))
+    return [pdf_reader.pages[number].extract_text() or "" for number in range(start, stop)]
+
+def _get_page_pool():
+    global _page_pool, _page_pool_pid
+    if _page_pool is None or _page_pool_pid != os.getpid():
+        # forkserver children start from a clean interpreter that only imports this module,
+        # so they never inherit the web app's threads, locks or database connections
+        context = multiprocessing.get_context('forkserver')
+        context.set_forkserver_preload(['utils.file_processor'])
+        _page_pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_PROCESSES, mp_context=context)
+        _page_pool_pid = os.getpid()
+    return _page_pool
+
+def iter_pdf_pages_parallel(data, page_count):
+    """Yield page texts in order while page ranges are extracted across processes"""
+    ranges = [(start, min(start + PDF_PAGES_PER_TASK, page_count))
+              for start in range(0, page_count, PDF_PAGES_PER_TASK)]
+    futures = [_get_page_pool().submit(_extract_page_range, data, start, stop) for start, stop in ranges]
     try:
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            text = ""
-            
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            
-            if not text.strip():
-                logging.warning("No text extracted from PDF")
-                return None
-                
-            return text.strip()
-            
+        for future in futures:
+            yield from future.result()
+    finally:
+        # Stop pending ranges once the caller has read enough
+        for future in futures:
+            future.cancel()
+
+@timed('pdf_extract')
+def extract_text_from_pdf(file_path, max_pages=None, max_chars=None):
+    """Extract text from PDF file using PyPDF2
+
+    file_path may also be the PDF bytes or a binary file object such as an
+    upload stream.
+    Extraction stops after max_pages pages or max_chars characters
+    (PDF_MAX_PAGES and PDF_MAX_CHARS by default). Long documents are split
+    across PDF_EXTRACT_PROCESSES worker processes when that is enabled.
+    """
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    max_chars = PDF_MAX_CHARS if max_chars is None else max_chars
+
+    try:
+        if isinstance(file_path, (bytes, bytearray, memoryview)):
+            file_path = io.BytesIO(file_path)
+
+        pdf_reader = PyPDF2.PdfReader(file_path)
+        page_count = len(pdf_reader.pages)
+        if max_pages:
+            page_count = min(page_count, max_pages)
+
+        if PDF_EXTRACT_PROCESSES > 1 and page_count >= PDF_PARALLEL_MIN_PAGES:
+            pdf_reader.stream.seek(0)
+            pages = iter_pdf_pages_parallel(pdf_reader.stream.read(), page_count)
+        else:
+            pages = iter_pdf_pages(pdf_reader, page_count)
+
+        # Collect pages and join once instead of growing a string per page
+        texts = []
+        length = 0
+        for page_text in pages:
+            texts.append(page_text)
+            length += len(page_text) + 1
+            if max_chars and length >= max_chars:
+                logging.info(f"PDF text truncated at {max_chars} characters")
+                break
+        pages.close()
+
+        text = "\n".join(texts)
+        if max_chars:
+            text = text[:max_chars]
+
+        if not text.strip():
+            logging.warning("No text extracted from PDF")
+            return None
+
+        return text.strip()
+
     except Exception as e:
         logging.error(f"Error extracting text from PDF: {e}")
         return None
 
+def file_sha256(source):
+    """SHA-256 hex digest of PDF bytes or a binary stream (rewound afterwards)"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(source).hexdigest()
+
+    digest = hashlib.sha256()
+    source.seek(0)
+    for chunk in iter(lambda: source.read(1024 * 1024), b''):
+        digest.update(chunk)
+    source.seek(0)
+    return digest.hexdigest()
+
+def extract_text_from_upload(file_storage, fallback_dir):
+    """Extract text from an uploaded PDF without writing it to disk
+
+    The upload is parsed straight from its request buffer. Only a stream that
+    cannot seek is saved under fallback_dir, and that copy is always removed.
+    """
+    stream = file_storage.stream
+    try:
+        stream.seek(0)
+    except (AttributeError, OSError, io.UnsupportedOperation):
+        pass
+    else:
+        return extract_text_from_pdf(stream)
+
+    fd, path = tempfile.mkstemp(suffix='.pdf', dir=fallback_dir)
+    os.close(fd)
+    try:
+        file_storage.save(path)
+        return extract_text_from_pdf(path)
+    finally:
+        os.remove(path)
+
 def extract_text_from_txt(file_path):
     """Extract text from TXT file"""
     try:
@@ -0,0 +1,218 @@
+import os
+import time
+import random
+import sqlite3
+import logging
+import threading
+import httpx
+from google import genai
+from google.genai import errors, types
+from utils.shared_state import SharedState
+
+# HTTP status codes worth retrying: request timeout, rate limiting and server errors
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+
+# Upper bounds (seconds) of the latency histogram kept per operation
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class GeminiUnavailable(Exception):
+    """Raised without calling the API when the circuit is open, the rate limit
+    cannot be met before the deadline, or every retry failed."""
+
+class TokenBucket:
+    """Rate limit of `rate` calls per second with bursts of up to `burst`, shared through SharedState"""
+
+    def __init__(self, state, rate, burst, name="bucket"):
+        self.state = state
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.names = [f"{name}.tokens", f"{name}.updated"]
+
+    def _take(self, values):
+        now = time.time()
+        tokens, updated = values[self.names[0]], values[self.names[1]]
+        if tokens is None:
+            tokens, updated = self.burst, now
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        if tokens >= 1:
+            return {self.names[0]: tokens - 1, self.names[1]: now}, 0.0
+        return {self.names[0]: tokens, self.names[1]: now}, (1 - tokens) / self.rate
+
+    def acquire(self, deadline):
+        """Wait for a token until the deadline (a time.monotonic() value); False if none came in time"""
+        if self.rate <= 0:
+            return True
+        while True:
+            wait = self.state.update(self._take, self.names)
+            if not wait:
+                return True
+            if time.monotonic() + wait > deadline:
+                return False
+            time.sleep(wait)
+
+class CircuitBreaker:
+    """Stops calling a failing service for a while.
+
+    After failure_threshold consecutive failures the circuit opens and calls
+    fail immediately. Once reset_timeout has passed one trial call is let
+    through: success closes the circuit, failure opens it again.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.opened_at is not None:
+                logging.info("Gemini circuit closed")
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self._trial:
+                    logging.warning(f"Gemini circuit opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+                self._trial = False
+
+class ResilientGeminiClient:
+    """genai.Client wrapper with deadlines, a shared rate limit, retries and a circuit breaker
+
+    Exposes the same `client.models.embed_content(...)` and
+    `client.models.generate_content(...)` calls as genai.Client. Each call
+    gets at most `deadline` seconds in total, each HTTP attempt at most
+    `timeout`. Rate limiting (429), server errors and network errors are
+    retried with jittered exponential backoff; other errors are raised at
+    once. While the circuit is open calls raise GeminiUnavailable without
+    touching the network, so callers can fall back to a degraded score.
+    Calls, errors, retries and latencies are counted in the shared state.
+    """
+
+    def __init__(self, api_key, base_url=None, timeout=20.0, deadline=45.0, max_retries=3, backoff=0.5,
+                 max_backoff=8.0, pool_size=10, rate=0.0, burst=10, breaker=None, state=None):
+        self.api_key = api_key
+        self.base_url = base_url or None
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.pool_size = pool_size
+        self.breaker = breaker or CircuitBreaker()
+        self.state = state or SharedState("")
+        self.rate_limiter = TokenBucket(self.state, rate, burst, name="rate_limit.gemini")
+        self.models = _Models(self)
+        self._client = None
+        self._client_pid = None
+        self._lock = threading.Lock()
+
+    def _genai_client(self):
+        # The pooled HTTP connections must not be shared with forked workers
+        if self._client is None or self._client_pid != os.getpid():
+            with self._lock:
+                if self._client is None or self._client_pid != os.getpid():
+                    limits = httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size)
+                    self._client = genai.Client(api_key=self.api_key, http_options=types.HttpOptions(
+                        base_url=self.base_url, timeout=int(self.timeout * 1000), client_args={'limits': limits}
+                    ))
+                    self._client_pid = os.getpid()
+        return self._client
+
+    def _count(self, operation, **deltas):
+        try:
+            self.state.increment({f"gemini.{operation}.{name}": delta for name, delta in deltas.items()})
+        except sqlite3.Error as e:
+            logging.error(f"Error updating Gemini counters: {e}")
+
+    def _observe(self, operation, seconds):
+        bucket = next((f"le_{bound}" for bound in LATENCY_BUCKETS if seconds <= bound), "le_inf")
+        self._count(operation, calls=1, latency_seconds=seconds, **{f"latency.{bucket}": 1})
+
+    def stats(self):
+        """Counters of every worker sharing the state, plus this process's circuit state"""
+        counters = self.state.values("gemini.")
+        counters["circuit_state"] = self.breaker.state
+        return counters
+
+    @staticmethod
+    def retryable(error):
+        if isinstance(error, errors.APIError):
+            return error.code in RETRYABLE_STATUS
+        return isinstance(error, (httpx.TimeoutException, httpx.TransportError))
+
+    def call(self, operation, **kwargs):
+        """Run client.models.<operation>(**kwargs) under the deadline, rate limit, retries and breaker"""
+        deadline = time.monotonic() + self.deadline
+        config = kwargs.pop('config', None) or {}
+        config = config.model_dump(exclude_none=True) if hasattr(config, 'model_dump') else dict(config)
+
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                self._count(operation, errors=1, **{"errors.circuit_open": 1})
+                raise GeminiUnavailable("Gemini circuit is open")
+            if not self.rate_limiter.acquire(deadline):
+                self._count(operation, errors=1, **{"errors.rate_limited": 1})
+                raise GeminiUnavailable("Gemini rate limit not available before the deadline")
+
+            remaining = deadline - time.monotonic()
+            config['http_options'] = types.HttpOptions(timeout=max(1, int(min(self.timeout, remaining) * 1000)))
+            started = time.perf_counter()
+            try:
+                response = getattr(self._genai_client().models, operation)(config=config, **kwargs)
+            except Exception as e:
+                self._observe(operation, time.perf_counter() - started)
+                kind = f"http_{e.code}" if isinstance(e, errors.APIError) else type(e).__name__
+                self._count(operation, errors=1, **{f"errors.{kind}": 1})
+                if not self.retryable(e):
+                    # The service answered, it just rejected this request
+                    self.breaker.record_success()
+                    raise
+                self.breaker.record_failure()
+
+                delay = random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+                if attempt == self.max_retries or time.monotonic() + delay >= deadline:
+                    raise GeminiUnavailable(f"Gemini {operation} failed after {attempt + 1} attempts: {e}") from e
+                self._count(operation, retries=1)
+                logging.warning(f"Gemini {operation} attempt {attempt + 1} failed ({e}), retrying in {delay:.2f}s")
+                time.sleep(delay)
+                continue
+
+            self._observe(operation, time.perf_counter() - started)
+            self.breaker.record_success()
+            return response
+
+class _Models:
+    """The client.models namespace of ResilientGeminiClient"""
+
+    def __init__(self, client):
+        self._client = client
+
+    def embed_content(self, **kwargs):
+        return self._client.call('embed_content', **kwargs)
+
+    def generate_content(self, **kwargs):
+        return self._client.call('generate_content', **kwargs)
@@ -0,0 +1,38 @@
+import os
+import sqlite3
+
+# Flask's instance folder, home of the files shared by the workers on a host
+INSTANCE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "instance")
+
+class ProcessConnection:
+    """SQLite connection to a file shared by every worker process on the host.
+
+    Connections must not cross a fork, so get() reopens the file in each
+    worker process: in WAL mode, with schema run on every open and on_open
+    called afterwards so the owner can reset per-process state.
+    """
+
+    def __init__(self, path, schema=(), isolation_level="", on_open=None):
+        self.path = path
+        self.schema = schema
+        self.isolation_level = isolation_level
+        self.on_open = on_open
+        self._conn = None
+        self._pid = None
+
+    def get(self):
+        if self._conn is None or self._pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=10, check_same_thread=False,
+                                   isolation_level=self.isolation_level)
+            conn.execute("PRAGMA journal_mode=WAL")
+            for statement in self.schema:
+                conn.execute(statement)
+            conn.commit()
+            self._conn = conn
+            self._pid = os.getpid()
+            if self.on_open is not None:
+                self.on_open()
+        return self._conn
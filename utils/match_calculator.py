@@ -1,94 +1,550 @@
 import os
+import hashlib
 import logging
+import contextvars
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
-from google import genai
+from concurrent.futures import ThreadPoolExecutor
+from sklearn.feature_extraction.text import CountVectorizer
 from google.genai import types
+from utils.embedding_backends import GeminiBackend, LsaBackend, SpacyVectorBackend
+from utils.embedding_cache import EmbeddingCache, cache_key
+from utils.gemini_client import CircuitBreaker, ResilientGeminiClient
+from utils.local_db import INSTANCE_DIR
+from utils.metrics import count_cache_lookup, count_degraded, count_semantic_skipped, timed
+from utils.shared_state import SharedState
+from utils.skill_matcher import get_skill_matcher
+from utils.vector_index import cosine_scores
 
-# Initialize Gemini client
-client = genai.Client(api_key=os.environ.get("GEMINI_API_KEY", "default_key"))
+
+GEMINI_EMBEDDING_MODEL = "text-embedding-004"
+EMBEDDING_BATCH_LIMIT = 100  # Maximum contents per embed_content request
+
+# Embedding backend: "gemini", or "lsa" / "spacy" to embed locally without network access.
+# EMBEDDING_FALLBACK_BACKEND (e.g. "lsa") is used whenever the primary backend fails.
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "gemini")
+EMBEDDING_FALLBACK_BACKEND = os.environ.get("EMBEDDING_FALLBACK_BACKEND", "")
+SPACY_VECTORS_MODEL = os.environ.get("SPACY_VECTORS_MODEL", "en_core_web_md")
+# Weights of the three scoring methods in calculate_match_score
+SEMANTIC_WEIGHT = 0.4   # 40% semantic similarity
+KEYWORD_WEIGHT = 0.35   # 35% keyword overlap
+SKILLS_WEIGHT = 0.25    # 25% skills matching
+SCORE_SCALE = 1.2
+
+# Bump when the scoring algorithm changes in ways the constants below do not capture
+SCORING_VERSION = 1
+
+# Results scoring below this get improvement suggestions
+SUGGESTION_THRESHOLD = 80
+
+# "serial" runs the scoring methods one after another; "concurrent" overlaps
+# the Gemini calls with the local NLP work on a thread pool; "cascade" runs the
+# cheap keyword and skills matching first and embeds only when it matters
+MATCH_EXECUTION_MODE = os.environ.get("MATCH_EXECUTION_MODE", "serial")
+
+# In cascade mode the semantic step is skipped when no semantic score could move the
+# final score across one of these thresholds (by default the suggestion cutoff)
+CASCADE_THRESHOLDS = tuple(
+    float(threshold) for threshold in os.environ.get("CASCADE_THRESHOLDS", str(SUGGESTION_THRESHOLD)).split(",")
+    if threshold.strip()
+)
+MATCH_THREAD_POOL_SIZE = int(os.environ.get("MATCH_THREAD_POOL_SIZE", "8"))
+
+# Semantic score assumed when deciding to start AI suggestions speculatively
+SPECULATIVE_SEMANTIC_ESTIMATE = float(os.environ.get("SPECULATIVE_SEMANTIC_ESTIMATE", "70"))
+
+# Weight of each skill taxonomy category in the skills matching
+SKILL_CATEGORY_WEIGHTS = {'technical': 0.5, 'soft': 0.3, 'experience': 0.2}
+
+LSA_MODEL_PATH = os.environ.get("LSA_MODEL_PATH", os.path.join(INSTANCE_DIR, "lsa_embedding.joblib"))
+
+# Gemini calls: GEMINI_TIMEOUT bounds each HTTP attempt and GEMINI_DEADLINE the whole call
+# including retries. GEMINI_RATE_LIMIT (calls per second, 0 for none) is shared by every
+# worker through GEMINI_STATE_PATH, which also holds the call counters.
+GEMINI_BASE_URL = os.environ.get("GEMINI_BASE_URL", "")
+GEMINI_TIMEOUT = float(os.environ.get("GEMINI_TIMEOUT", "20"))
+GEMINI_DEADLINE = float(os.environ.get("GEMINI_DEADLINE", "45"))
+GEMINI_MAX_RETRIES = int(os.environ.get("GEMINI_MAX_RETRIES", "3"))
+GEMINI_RATE_LIMIT = float(os.environ.get("GEMINI_RATE_LIMIT", "0"))
+GEMINI_RATE_BURST = int(os.environ.get("GEMINI_RATE_BURST", "10"))
+GEMINI_POOL_SIZE = int(os.environ.get("GEMINI_POOL_SIZE", "10"))
+GEMINI_BREAKER_FAILURES = int(os.environ.get("GEMINI_BREAKER_FAILURES", "5"))
+GEMINI_BREAKER_RESET = float(os.environ.get("GEMINI_BREAKER_RESET", "30"))
+
+client = ResilientGeminiClient(
+    api_key=os.environ.get("GEMINI_API_KEY", "default_key"),
+    base_url=GEMINI_BASE_URL,
+    timeout=GEMINI_TIMEOUT,
+    deadline=GEMINI_DEADLINE,
+    max_retries=GEMINI_MAX_RETRIES,
+    pool_size=GEMINI_POOL_SIZE,
+    rate=GEMINI_RATE_LIMIT,
+    burst=GEMINI_RATE_BURST,
+    breaker=CircuitBreaker(GEMINI_BREAKER_FAILURES, GEMINI_BREAKER_RESET),
+    state=SharedState(os.environ.get("GEMINI_STATE_PATH", os.path.join(INSTANCE_DIR, "gemini_state.db")))
+)
+
+# Identical texts are embedded once; set EMBEDDING_CACHE_PATH to "" to keep the cache in memory only
+embedding_cache = EmbeddingCache(
+    path=os.environ.get("EMBEDDING_CACHE_PATH", os.path.join(INSTANCE_DIR, "embedding_cache.db")),
+    max_memory_items=int(os.environ.get("EMBEDDING_CACHE_MEMORY_ITEMS", "1024")),
+    max_disk_bytes=int(os.environ.get("EMBEDDING_CACHE_MAX_MB", "256")) * 1024 * 1024
+)
+
+def make_embedding_backend(kind):
+    """Build the embedding backend selected by a config value"""
+    if kind == "gemini":
+        return GeminiBackend(lambda: client, GEMINI_EMBEDDING_MODEL, EMBEDDING_BATCH_LIMIT)
+    if kind == "lsa":
+        return LsaBackend(LSA_MODEL_PATH)
+    if kind == "spacy":
+        return SpacyVectorBackend(SPACY_VECTORS_MODEL)
+    raise ValueError(f"Unknown embedding backend: {kind}")
+
+# Tried in order; vectors are only ever compared within one backend
+embedding_backends = [make_embedding_backend(kind) for kind in (EMBEDDING_BACKEND, EMBEDDING_FALLBACK_BACKEND) if kind]
+
+def embedding_model():
+    """Name of the primary embedding backend's vector space"""
+    return embedding_backends[0].name
 
 def get_embeddings(text):
-    """Get embeddings from Gemini API"""
+    """Get an embedding from the primary backend, served from the embedding cache when possible"""
+    embeddings = get_embeddings_batch([text])
+    if embeddings is None:
+        return None
+    return embeddings[0]
+
+def get_embeddings_batch(texts, backend=None):
+    """Embed many texts with as few backend calls as possible
+
+    Cached texts are skipped, duplicates are sent once and the rest go out in
+    chunks of the backend's batch limit. Uses the primary backend unless one
+    is given. Returns an (n, d) float32 matrix in input order, or None if any
+    text could not be embedded.
+    """
+    if not texts:
+        return None
+    backend = backend or embedding_backends[0]
+    
+    vectors = [embedding_cache.get(text, backend.name) for text in texts]
+    
+    # Group uncached positions by content so repeated texts cost one embedding
+    pending = {}
+    for i, vector in enumerate(vectors):
+        if vector is None:
+            pending.setdefault(cache_key(texts[i], backend.name), []).append(i)
+    positions = list(pending.values())
+    count_cache_lookup('embedding', hits=len(texts) - sum(len(group) for group in positions), misses=len(positions))
+    
     try:
-        # Use Gemini's embedding model
-        response = client.models.embed_content(
-            model="text-embedding-004",
-            contents=text
-        )
-        
-        if hasattr(response, 'embeddings') and response.embeddings:
-            # Handle batch response
-            return np.array(response.embeddings[0].values)
-        elif hasattr(response, 'embedding') and response.embedding:
-            # Handle single response
-            return np.array(response.embedding.values)
-        else:
-            logging.error("No embeddings returned from Gemini API")
-            return None
+        for start in range(0, len(positions), backend.batch_limit):
+            chunk = positions[start:start + backend.batch_limit]
+            with timed('embedding'):
+                embeddings = backend.embed([texts[group[0]] for group in chunk])
             
+            for group, vector in zip(chunk, embeddings):
+                embedding_cache.put(texts[group[0]], backend.name, vector)
+                for i in group:
+                    vectors[i] = vector
+        
+        return np.vstack(vectors).astype(np.float32, copy=False)
+    
     except Exception as e:
-        logging.error(f"Error getting embeddings: {e}")
+        logging.error(f"Error getting embeddings from {backend.name}: {e}")
         return None
 
-def calculate_match_score(resume_text, job_text):
-    """Calculate enhanced match score using multiple methods"""
+_executor = None
+_executor_pid = None
+
+def scoring_config_version():
+    """Short fingerprint of everything that decides scores and suggestions
+
+    Stored scores tagged with another version are stale, so changing a
+    weight or the skill taxonomy invalidates them automatically.
+    """
+    config = (
+        SCORING_VERSION, embedding_model(),
+        SEMANTIC_WEIGHT, KEYWORD_WEIGHT, SKILLS_WEIGHT, SCORE_SCALE, SUGGESTION_THRESHOLD,
+        sorted(SKILL_CATEGORY_WEIGHTS.items()), get_skill_matcher().version,
+    )
+    if MATCH_EXECUTION_MODE == "cascade":
+        # Skipped semantic steps change scores, so cascade scores are memoized separately
+        config += (CASCADE_THRESHOLDS,)
+    return hashlib.sha256(repr(config).encode('utf-8')).hexdigest()[:16]
+
+def method_versions():
+    """Per scoring method, a fingerprint of the config its score depends on
+
+    The weights, scale and thresholds only enter the blend, so changing them
+    leaves stored method scores valid; see rescoring.py.
+    """
+    category_weights = hashlib.sha256(repr(sorted(SKILL_CATEGORY_WEIGHTS.items())).encode('utf-8')).hexdigest()[:8]
+    return {
+        'semantic': f"{SCORING_VERSION}:{embedding_model()}",
+        'keyword': str(SCORING_VERSION),
+        'skills': f"{SCORING_VERSION}:{get_skill_matcher().version}:{category_weights}",
+    }
+
+def get_executor():
+    """Thread pool used to overlap Gemini calls with local NLP work
+
+    Created lazily so every forked worker process gets its own threads.
+    """
+    global _executor, _executor_pid
+    if _executor is None or _executor_pid != os.getpid():
+        _executor = ThreadPoolExecutor(max_workers=MATCH_THREAD_POOL_SIZE, thread_name_prefix="match")
+        _executor_pid = os.getpid()
+    return _executor
+
+def submit(fn, *args):
+    """Run fn on the thread pool in the caller's context, so its stage timings reach the request"""
+    return get_executor().submit(contextvars.copy_context().run, fn, *args)
+
+def calculate_match_score(resume_text, job_text, resume_analysis=None, job_analysis=None, concurrent=None):
+    """Calculate enhanced match score using multiple methods
+
+    Pass the DocumentAnalysis objects the caller already built to avoid
+    parsing either text with spaCy again. In concurrent mode (the default
+    when MATCH_EXECUTION_MODE=concurrent) the embedding request runs on the
+    thread pool while keyword and skills matching run locally. With
+    MATCH_EXECUTION_MODE=cascade the score comes from cascade_match_score.
+    """
+    return match_score_components(resume_text, job_text, resume_analysis, job_analysis, concurrent)[0]
+
+def method_scores(semantic_score, keyword_score, skills_score, stages):
+    """The per-method scores of one match; stages names the methods that ran"""
+    return {
+        'semantic': float(semantic_score),
+        'keyword': float(keyword_score),
+        'skills': float(skills_score),
+        'stages': stages,
+    }
+
+def match_score_components(resume_text, job_text, resume_analysis=None, job_analysis=None, concurrent=None):
+    """calculate_match_score, also returning the score of each method
+
+    Returns (match_score, scores) with scores from method_scores(); a
+    skipped or unavailable semantic score is NaN. On error every method
+    score is NaN and no stages ran.
+    """
+    if concurrent is None:
+        if MATCH_EXECUTION_MODE == "cascade":
+            return cascade_match_score(resume_text, job_text, resume_analysis, job_analysis)
+        concurrent = MATCH_EXECUTION_MODE == "concurrent"
+    
     try:
         # Method 1: Semantic similarity using embeddings
-        semantic_score = calculate_semantic_similarity(resume_text, job_text)
+        if concurrent:
+            semantic_future = submit(
+                calculate_semantic_similarity, resume_text, job_text, resume_analysis, job_analysis
+            )
+        else:
+            semantic_score = calculate_semantic_similarity(resume_text, job_text, resume_analysis, job_analysis)
         
         # Method 2: Keyword overlap analysis
-        keyword_score = calculate_keyword_similarity(resume_text, job_text)
+        keyword_score = calculate_keyword_similarity(resume_text, job_text, resume_analysis, job_analysis)
         
         # Method 3: Skills and requirements matching
-        skills_score = calculate_skills_match(resume_text, job_text)
+        skills_score = calculate_skills_match(resume_text, job_text, job_analysis and job_analysis.skills)
         
-        # Weighted combination for more accurate results
-        final_score = (
-            semantic_score * 0.4 +  # 40% semantic similarity
-            keyword_score * 0.35 +  # 35% keyword overlap
-            skills_score * 0.25     # 25% skills matching
-        )
+        if concurrent:
+            semantic_score = semantic_future.result()
         
-        # Apply scaling for better distribution (common resumes typically score 30-90%)
-        scaled_score = min(100, max(0, final_score * 1.2))
+        return (float(blend_scores(semantic_score, keyword_score, skills_score)),
+                method_scores(semantic_score, keyword_score, skills_score, ['semantic', 'keyword', 'skills']))
         
-        return round(scaled_score, 2)
+    except Exception as e:
+        logging.error(f"Error calculating match score: {e}")
+        count_degraded('match')
+        return 0.0, method_scores(np.nan, np.nan, np.nan, [])
+
+def cascade_match_score(resume_text, job_text, resume_analysis=None, job_analysis=None):
+    """Calculate the match score cheapest method first, embedding only when it matters
+
+    Keyword and skills matching run first. If no semantic score could move
+    the final score across one of CASCADE_THRESHOLDS the embedding step is
+    skipped and the score is the keyword and skills blend, kept within the
+    bounds that decided it. Returns (match_score, scores) as
+    match_score_components does.
+    """
+    try:
+        keyword_score = calculate_keyword_similarity(resume_text, job_text, resume_analysis, job_analysis)
+        skills_score = calculate_skills_match(resume_text, job_text, job_analysis and job_analysis.skills)
+        
+        if not semantic_undecided(keyword_score, skills_score):
+            count_semantic_skipped()
+            return (float(cascade_score(keyword_score, skills_score)),
+                    method_scores(np.nan, keyword_score, skills_score, ['keyword', 'skills']))
+        
+        semantic_score = calculate_semantic_similarity(resume_text, job_text, resume_analysis, job_analysis)
+        return (float(blend_scores(semantic_score, keyword_score, skills_score)),
+                method_scores(semantic_score, keyword_score, skills_score, ['keyword', 'skills', 'semantic']))
         
     except Exception as e:
         logging.error(f"Error calculating match score: {e}")
-        return 0.0
+        count_degraded('match')
+        return 0.0, method_scores(np.nan, np.nan, np.nan, [])
+
+def score_bounds(keyword_score, skills_score):
+    """Lowest and highest final score any semantic score (0 to 100) could give"""
+    return blend_scores(0.0, keyword_score, skills_score), blend_scores(100.0, keyword_score, skills_score)
+
+def semantic_undecided(keyword_score, skills_score, thresholds=None):
+    """Whether the semantic score could still move the final score across a threshold
 
-def calculate_semantic_similarity(resume_text, job_text):
-    """Calculate semantic similarity using embeddings"""
+    Works on plain floats as well as NumPy arrays of scores.
+    """
+    thresholds = CASCADE_THRESHOLDS if thresholds is None else thresholds
+    low, high = score_bounds(keyword_score, skills_score)
+    undecided = np.zeros(np.shape(low), dtype=bool)
+    for threshold in thresholds:
+        undecided |= (low < threshold) & (high >= threshold)
+    return undecided
+
+def cascade_score(keyword_score, skills_score):
+    """Final score of a match decided without the semantic step"""
+    low, high = score_bounds(keyword_score, skills_score)
+    return np.clip(blend_scores(np.nan, keyword_score, skills_score), low, high)
+
+def score_and_suggest(resume_text, job_text, resume_analysis, job_analysis, concurrent=None):
+    """Calculate the match score and, below the 80 point cutoff, suggestions
+
+    In concurrent mode the embedding request runs alongside keyword and
+    skills matching. Once those are known the score is estimated with
+    SPECULATIVE_SEMANTIC_ESTIMATE in place of the semantic score; if that
+    estimate needs AI suggestions, the Gemini generation starts before the
+    semantic score arrives. The speculative result is discarded if the final
+    score ends up at or above the cutoff. In cascade mode the score comes
+    from cascade_match_score. Returns (match_score, suggestions, scores)
+    with scores as match_score_components returns them.
+    """
+    if concurrent is None:
+        concurrent = MATCH_EXECUTION_MODE == "concurrent"
+    
+    resume_keywords = resume_analysis.keywords()
+    job_keywords = job_analysis.keywords()
+    
+    if not concurrent:
+        if MATCH_EXECUTION_MODE == "cascade":
+            match_score, scores = cascade_match_score(resume_text, job_text, resume_analysis, job_analysis)
+        else:
+            match_score, scores = match_score_components(resume_text, job_text, resume_analysis, job_analysis,
+                                                         concurrent=False)
+        suggestions = []
+        if match_score < SUGGESTION_THRESHOLD:
+            suggestions = generate_suggestions(resume_keywords, job_keywords, match_score)
+        return match_score, suggestions, scores
+    
+    semantic_future = submit(
+        calculate_semantic_similarity, resume_text, job_text, resume_analysis, job_analysis
+    )
+    keyword_score = calculate_keyword_similarity(resume_text, job_text, resume_analysis, job_analysis)
+    skills_score = calculate_skills_match(resume_text, job_text, job_analysis and job_analysis.skills)
+    
+    # Start the AI suggestions early when the likely score already calls for them
+    ai_future = None
+    estimated_score = float(blend_scores(SPECULATIVE_SEMANTIC_ESTIMATE, keyword_score, skills_score))
+    if estimated_score < SUGGESTION_THRESHOLD and needs_ai_suggestions(resume_keywords, job_keywords, estimated_score):
+        ai_future = submit(generate_ai_suggestions, resume_keywords, job_keywords, estimated_score)
+    
+    semantic_score = semantic_future.result()
+    match_score = float(blend_scores(semantic_score, keyword_score, skills_score))
+    
+    suggestions = []
+    if match_score < SUGGESTION_THRESHOLD:
+        ai_suggestions = ai_future.result() if ai_future is not None else None
+        suggestions = generate_suggestions(resume_keywords, job_keywords, match_score, ai_suggestions=ai_suggestions)
+    elif ai_future is not None:
+        ai_future.cancel()
+    
+    return match_score, suggestions, method_scores(semantic_score, keyword_score, skills_score,
+                                                   ['semantic', 'keyword', 'skills'])
+
+def blend_scores(semantic_score, keyword_score, skills_score):
+    """Combine the three method scores into the final match score
+
+    Works on plain floats as well as NumPy arrays of scores. A NaN semantic
+    score means embeddings were unavailable; keyword and skills matching
+    then carry its weight, so an API outage degrades scores instead of
+    zeroing 40% of them.
+    """
+    semantic_score = np.asarray(semantic_score, dtype=np.float64)
+    keyword_score = np.asarray(keyword_score)
+    skills_score = np.asarray(skills_score)
+    
+    # Weighted combination for more accurate results
+    final_score = np.where(
+        np.isnan(semantic_score),
+        (keyword_score * KEYWORD_WEIGHT + skills_score * SKILLS_WEIGHT) / (KEYWORD_WEIGHT + SKILLS_WEIGHT),
+        semantic_score * SEMANTIC_WEIGHT + keyword_score * KEYWORD_WEIGHT + skills_score * SKILLS_WEIGHT
+    )
+    
+    # Apply scaling for better distribution (common resumes typically score 30-90%)
+    scaled_score = np.clip(final_score * SCORE_SCALE, 0, 100)
+    
+    return np.round(scaled_score, 2)
+
+def calculate_match_scores(resume_texts, job_text, resume_analyses=None, job_analysis=None, cascade=None):
+    """Score many resumes against one job description in a single pass
+
+    The job and all resumes are embedded in one batch and every method is
+    computed as array operations across the set. With cascade (the default
+    when MATCH_EXECUTION_MODE=cascade) only the resumes whose outcome the
+    semantic score could still change are embedded, as in
+    cascade_match_score. Returns a dict of NumPy arrays ('semantic',
+    'keyword', 'skills', 'final' and the booleans 'semantic_ran'), one
+    entry per resume, in input order; skipped semantic scores are NaN.
+    """
+    from utils.nlp_analyzer import analyze_document, analyze_documents_batch
+    
+    if cascade is None:
+        cascade = MATCH_EXECUTION_MODE == "cascade"
+    if resume_analyses is None:
+        resume_analyses = list(analyze_documents_batch(resume_texts, entities=False))
+    if job_analysis is None:
+        job_analysis = analyze_document(job_text, entities=False)
+    
+    keyword_scores = calculate_keyword_similarities(resume_analyses, job_analysis)
+    skills_scores = calculate_skills_matches(resume_texts, job_text, job_analysis.skills)
+    
+    if not cascade:
+        semantic_scores = calculate_semantic_similarities(resume_texts, job_text, resume_analyses, job_analysis)
+        return {
+            'semantic': semantic_scores,
+            'keyword': keyword_scores,
+            'skills': skills_scores,
+            'final': blend_scores(semantic_scores, keyword_scores, skills_scores),
+            'semantic_ran': np.ones(len(resume_texts), dtype=bool),
+        }
+    
+    semantic_ran = semantic_undecided(keyword_scores, skills_scores)
+    semantic_scores = np.full(len(resume_texts), np.nan)
+    undecided = np.flatnonzero(semantic_ran)
+    if len(undecided):
+        semantic_scores[undecided] = calculate_semantic_similarities(
+            [resume_texts[i] for i in undecided], job_text, [resume_analyses[i] for i in undecided], job_analysis
+        )
+    count_semantic_skipped(len(resume_texts) - len(undecided))
+    
+    return {
+        'semantic': semantic_scores,
+        'keyword': keyword_scores,
+        'skills': skills_scores,
+        'final': np.where(semantic_ran, blend_scores(semantic_scores, keyword_scores, skills_scores),
+                          cascade_score(keyword_scores, skills_scores)),
+        'semantic_ran': semantic_ran,
+    }
+
+def embed_analyses(analyses):
+    """Return an (n, d) embedding matrix for DocumentAnalysis objects
+
+    Backends are tried in order and all analyses are embedded by the same
+    one, so their vectors are comparable. Analyses that already carry an
+    embedding from that backend (for example one restored from the resume
+    store) are not sent again. The rest go out in one get_embeddings_batch
+    call and keep their vector on the analysis so callers can persist it.
+    Returns the embeddings, each in the dtype it is stored in, or None if
+    every backend fails.
+    """
+    for backend in embedding_backends:
+        missing = [analysis for analysis in analyses
+                   if analysis.embedding is None or analysis.embedding_model != backend.name]
+        if missing:
+            embeddings = get_embeddings_batch([analysis.text for analysis in missing], backend)
+            if embeddings is None:
+                continue
+            for analysis, embedding in zip(missing, embeddings):
+                analysis.embedding = embedding
+                analysis.embedding_model = backend.name
+                analysis.embedding_norm = None
+        
+        return [analysis.embedding for analysis in analyses]
+    
+    return None
+
+def embedding_similarities(analyses, query):
+    """Cosine similarity of query with the embedding of each analysis
+
+    Embeddings are stacked per dtype without upcasting, so float16 or int8
+    rows from the embedding store stay quantized until cosine_scores reads
+    them a chunk at a time, and their known row norm is used instead of
+    recomputing it.
+    """
+    scores = np.empty(len(analyses), dtype=np.float32)
+    groups = {}
+    for i, analysis in enumerate(analyses):
+        groups.setdefault((np.asarray(analysis.embedding).dtype, analysis.embedding_norm), []).append(i)
+    for (_, row_norm), indexes in groups.items():
+        matrix = np.vstack([np.ravel(analyses[i].embedding) for i in indexes])
+        scores[indexes] = cosine_scores(matrix, query, row_norm)
+    return scores
+
+@timed('semantic_score')
+def calculate_semantic_similarity(resume_text, job_text, resume_analysis=None, job_analysis=None):
+    """Calculate semantic similarity using embeddings; NaN when no embedding backend is available"""
     try:
-        resume_embedding = get_embeddings(resume_text)
-        job_embedding = get_embeddings(job_text)
+        from utils.nlp_analyzer import DocumentAnalysis
         
-        if resume_embedding is None or job_embedding is None:
-            return 0.0
+        resume_analysis = resume_analysis or DocumentAnalysis(resume_text)
+        job_analysis = job_analysis or DocumentAnalysis(job_text)
         
-        # Reshape for sklearn
-        resume_embedding = resume_embedding.reshape(1, -1)
-        job_embedding = job_embedding.reshape(1, -1)
+        # Missing embeddings for both texts go out in a single request
+        if embed_analyses([resume_analysis, job_analysis]) is None:
+            count_degraded('semantic')
+            return np.nan
         
-        # Calculate cosine similarity
-        similarity = cosine_similarity(resume_embedding, job_embedding)[0][0]
+        # Calculate cosine similarity; works on quantized vectors from the embedding store too
+        similarity = embedding_similarities([resume_analysis], job_analysis.embedding)[0]
         
         # Convert to percentage
         return max(0, min(100, similarity * 100))
         
     except Exception as e:
         logging.error(f"Error calculating semantic similarity: {e}")
-        return 0.0
+        count_degraded('semantic')
+        return np.nan
+
+@timed('semantic_score')
+def calculate_semantic_similarities(resume_texts, job_text, resume_analyses=None, job_analysis=None):
+    """Semantic similarity of every resume to one job, as a single matrix product
+
+    All NaN when no embedding backend is available.
+    """
+    try:
+        from utils.nlp_analyzer import DocumentAnalysis
+        
+        if resume_analyses is None:
+            resume_analyses = [DocumentAnalysis(text) for text in resume_texts]
+        
+        job_analysis = job_analysis or DocumentAnalysis(job_text)
+        resume_analyses = list(resume_analyses)
+        
+        # Every embedding not stored yet goes out in one batch
+        if embed_analyses([job_analysis] + resume_analyses) is None:
+            count_degraded('semantic', len(resume_texts))
+            return np.full(len(resume_texts), np.nan)
+        
+        similarities = embedding_similarities(resume_analyses, job_analysis.embedding)
+        return np.clip(similarities * 100, 0, 100).astype(np.float64)
+        
+    except Exception as e:
+        logging.error(f"Error calculating semantic similarities: {e}")
+        count_degraded('semantic', len(resume_texts))
+        return np.full(len(resume_texts), np.nan)
 
-def calculate_keyword_similarity(resume_text, job_text):
+@timed('keyword_score')
+def calculate_keyword_similarity(resume_text, job_text, resume_analysis=None, job_analysis=None):
     """Calculate keyword overlap similarity"""
     try:
-        from utils.nlp_analyzer import extract_keywords
+        from utils.nlp_analyzer import analyze_document
         
-        resume_keywords = set(extract_keywords(resume_text, max_keywords=30))
-        job_keywords = set(extract_keywords(job_text, max_keywords=30))
+        if resume_analysis is None:
+            resume_analysis = analyze_document(resume_text, entities=False)
+        if job_analysis is None:
+            job_analysis = analyze_document(job_text, entities=False)
+        
+        resume_keywords = set(resume_analysis.keywords(max_keywords=30))
+        job_keywords = set(job_analysis.keywords(max_keywords=30))
         
         if not resume_keywords or not job_keywords:
             return 0.0
@@ -113,82 +569,108 @@ def calculate_keyword_similarity(resume_text, job_text):
         
     except Exception as e:
         logging.error(f"Error calculating keyword similarity: {e}")
+        count_degraded('keyword')
         return 0.0
 
-def calculate_skills_match(resume_text, job_text):
-    """Calculate skills and requirements matching"""
+@timed('keyword_score')
+def calculate_keyword_similarities(resume_analyses, job_analysis):
+    """Keyword overlap of every resume with one job, computed as array operations"""
     try:
-        # Define important skill categories and keywords
-        technical_skills = ['python', 'java', 'javascript', 'react', 'node', 'sql', 'aws', 'docker', 'kubernetes']
-        soft_skills = ['leadership', 'communication', 'teamwork', 'problem', 'management', 'collaboration']
-        experience_terms = ['years', 'experience', 'senior', 'junior', 'lead', 'manager']
+        job_keywords = list(dict.fromkeys(job_analysis.keywords(max_keywords=30)))
+        resume_keywords = [set(analysis.keywords(max_keywords=30)) for analysis in resume_analyses]
         
-        resume_lower = resume_text.lower()
-        job_lower = job_text.lower()
+        scores = np.zeros(len(resume_keywords))
+        if not job_keywords or not resume_keywords:
+            return scores
         
-        # Count skill matches in different categories
-        tech_matches = sum(1 for skill in technical_skills if skill in resume_lower and skill in job_lower)
-        soft_matches = sum(1 for skill in soft_skills if skill in resume_lower and skill in job_lower)
-        exp_matches = sum(1 for term in experience_terms if term in resume_lower and term in job_lower)
+        # Binary resume x job-keyword matrix; row sums are the intersection sizes
+        vectorizer = CountVectorizer(vocabulary=job_keywords, analyzer=lambda keywords: keywords, binary=True)
+        presence = vectorizer.transform(resume_keywords)
         
-        # Calculate scores for each category
-        tech_score = (tech_matches / len(technical_skills)) * 100 if technical_skills else 0
-        soft_score = (soft_matches / len(soft_skills)) * 100 if soft_skills else 0
-        exp_score = (exp_matches / len(experience_terms)) * 100 if experience_terms else 0
+        intersection = np.asarray(presence.sum(axis=1)).ravel()
+        resume_sizes = np.array([len(keywords) for keywords in resume_keywords])
+        union = resume_sizes + len(job_keywords) - intersection
         
-        # Weight technical skills more heavily
-        weighted_score = (tech_score * 0.5) + (soft_score * 0.3) + (exp_score * 0.2)
+        jaccard_scores = intersection / union * 100
+        coverage_scores = intersection / len(job_keywords) * 100
         
-        return min(100, weighted_score)
+        # Combine both metrics, matching calculate_keyword_similarity
+        scores = np.minimum(100, jaccard_scores * 0.4 + coverage_scores * 0.6)
+        scores[resume_sizes == 0] = 0.0
+        return scores
+        
+    except Exception as e:
+        logging.error(f"Error calculating keyword similarities: {e}")
+        count_degraded('keyword', len(resume_analyses))
+        return np.zeros(len(resume_analyses))
+
+@timed('skills_score')
+def calculate_skills_match(resume_text, job_text, job_skills=None):
+    """Calculate skills and requirements matching
+
+    Pass job_skills when the job's skills are already known to skip scanning job_text.
+    """
+    try:
+        matcher = get_skill_matcher()
+        if job_skills is None:
+            job_skills = matcher.match(job_text)
+        return skills_coverage_score(matcher.match(resume_text), job_skills)
         
     except Exception as e:
         logging.error(f"Error calculating skills match: {e}")
+        count_degraded('skills')
         return 0.0
 
-def generate_suggestions(resume_keywords, job_keywords, match_score):
-    """Generate improvement suggestions based on keyword analysis"""
-    suggestions = []
+@timed('skills_score')
+def calculate_skills_matches(resume_texts, job_text, job_skills=None):
+    """Skills matching of every resume against one job, scanning each text once"""
+    try:
+        matcher = get_skill_matcher()
+        if job_skills is None:
+            job_skills = matcher.match(job_text)
+        return np.array([
+            skills_coverage_score(resume_skills, job_skills)
+            for resume_skills in matcher.match_many(resume_texts)
+        ])
+        
+    except Exception as e:
+        logging.error(f"Error calculating skills matches: {e}")
+        count_degraded('skills', len(resume_texts))
+        return np.zeros(len(resume_texts))
+
+def skills_coverage_score(resume_skills, job_skills):
+    """Weighted share of the job's skills, per category, that the resume also has
+
+    Categories the job does not mention are left out, so a score does not
+    depend on how many skills the taxonomy holds.
+    """
+    score = 0.0
+    total_weight = 0.0
+    for category, weight in SKILL_CATEGORY_WEIGHTS.items():
+        required = job_skills.get(category)
+        if not required:
+            continue
+        matched = required & resume_skills.get(category, set())
+        score += len(matched) / len(required) * 100 * weight
+        total_weight += weight
     
+    return min(100, score / total_weight) if total_weight else 0.0
+
+def generate_suggestions(resume_keywords, job_keywords, match_score, use_ai=True, ai_suggestions=None):
+    """Generate improvement suggestions based on keyword analysis
+
+    With use_ai=False only the rule-based suggestions are returned, which
+    keeps bulk scoring free of per-resume Gemini generations. Pass the result
+    of a speculative generate_ai_suggestions call as ai_suggestions to use it
+    instead of calling Gemini again.
+    """
     try:
-        resume_set = set(resume_keywords)
-        job_set = set(job_keywords)
-        
-        # Find missing keywords
-        missing_keywords = job_set - resume_set
-        common_keywords = resume_set & job_set
-        
-        # Generate specific suggestions
-        if missing_keywords:
-            missing_list = list(missing_keywords)[:10]  # Limit to top 10
-            suggestions.append({
-                'type': 'missing_keywords',
-                'title': 'Add Missing Keywords',
-                'description': f"Consider adding these keywords from the job description: {', '.join(missing_list)}"
-            })
-        
-        if len(common_keywords) < 5:
-            suggestions.append({
-                'type': 'keyword_density',
-                'title': 'Increase Keyword Relevance',
-                'description': 'Your resume has limited overlap with job requirements. Focus on highlighting relevant skills and experience.'
-            })
-        
-        if match_score < 50:
-            suggestions.append({
-                'type': 'major_revision',
-                'title': 'Major Resume Revision Needed',
-                'description': 'Consider significantly restructuring your resume to better align with the job requirements.'
-            })
-        elif match_score < 70:
-            suggestions.append({
-                'type': 'moderate_revision',
-                'title': 'Moderate Improvements Needed',
-                'description': 'Add more relevant experience and skills that match the job description.'
-            })
+        suggestions = rule_based_suggestions(resume_keywords, job_keywords, match_score)
         
         # Use Gemini for additional suggestions
-        if len(suggestions) < 3:
-            ai_suggestions = generate_ai_suggestions(resume_keywords, job_keywords, match_score)
+        if use_ai and len(suggestions) < 3:
+            if ai_suggestions is None:
+                ai_suggestions = generate_ai_suggestions(resume_keywords, job_keywords, match_score)
             suggestions.extend(ai_suggestions)
         
         return suggestions[:5]  # Limit to 5 suggestions
@@ -197,6 +679,53 @@ def generate_suggestions(resume_keywords, job_keywords, match_score):
         logging.error(f"Error generating suggestions: {e}")
         return [{'type': 'error', 'title': 'Analysis Error', 'description': 'Unable to generate suggestions at this time.'}]
 
+def needs_ai_suggestions(resume_keywords, job_keywords, match_score):
+    """Whether generate_suggestions would ask Gemini for more suggestions"""
+    return len(rule_based_suggestions(resume_keywords, job_keywords, match_score)) < 3
+
+def rule_based_suggestions(resume_keywords, job_keywords, match_score):
+    """Suggestions derived from keyword overlap and the score alone"""
+    suggestions = []
+    
+    resume_set = set(resume_keywords)
+    job_set = set(job_keywords)
+    
+    # Find missing keywords
+    missing_keywords = job_set - resume_set
+    common_keywords = resume_set & job_set
+    
+    # Generate specific suggestions
+    if missing_keywords:
+        missing_list = list(missing_keywords)[:10]  # Limit to top 10
+        suggestions.append({
+            'type': 'missing_keywords',
+            'title': 'Add Missing Keywords',
+            'description': f"Consider adding these keywords from the job description: {', '.join(missing_list)}"
+        })
+    
+    if len(common_keywords) < 5:
+        suggestions.append({
+            'type': 'keyword_density',
+            'title': 'Increase Keyword Relevance',
+            'description': 'Your resume has limited overlap with job requirements. Focus on highlighting relevant skills and experience.'
+        })
+    
+    if match_score < 50:
+        suggestions.append({
+            'type': 'major_revision',
+            'title': 'Major Resume Revision Needed',
+            'description': 'Consider significantly restructuring your resume to better align with the job requirements.'
+        })
+    elif match_score < 70:
+        suggestions.append({
+            'type': 'moderate_revision',
+            'title': 'Moderate Improvements Needed',
+            'description': 'Add more relevant experience and skills that match the job description.'
+        })
+    
+    return suggestions
+
+@timed('ai_suggestions')
 def generate_ai_suggestions(resume_keywords, job_keywords, match_score):
     """Generate AI-powered suggestions using Gemini"""
     try:
@@ -0,0 +1,218 @@
+import os
+import time
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from contextvars import ContextVar
+from utils.gemini_client import LATENCY_BUCKETS
+from utils.local_db import INSTANCE_DIR
+from utils.shared_state import SharedState
+
+# SQLite file every worker on the host adds its counters to; empty keeps them per process
+METRICS_PATH = os.environ.get("METRICS_PATH", os.path.join(INSTANCE_DIR, "metrics.db"))
+# Buffered updates are written at least this often outside of requests
+METRICS_FLUSH_INTERVAL = float(os.environ.get("METRICS_FLUSH_INTERVAL", "1.0"))
+
+# Upper bounds (seconds) of the stage and request latency histograms
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Metric name -> (type, help) of everything exported on /metrics
+METRIC_TYPES = {
+    'resume_matcher_stage_seconds': ('histogram', 'Time spent in each stage of the matching pipeline'),
+    'resume_matcher_request_seconds': ('histogram', 'Time spent handling requests, by endpoint'),
+    'resume_matcher_requests_total': ('counter', 'Requests handled, by endpoint and status'),
+    'resume_matcher_cache_lookups_total': ('counter', 'Cache lookups, by cache and outcome'),
+    'resume_matcher_degraded_scores_total': ('counter', 'Scores computed without a failed method, by method'),
+    'resume_matcher_semantic_skipped_total': ('counter', 'Semantic steps skipped by cascade scoring'),
+}
+
+# Stage timings of the request being handled, for the Server-Timing header
+_request_timings = ContextVar('request_timings', default=None)
+
+def sample_name(name, labels):
+    """Prometheus sample name with its labels, e.g. stage_seconds_count{stage="pdf_extract"}"""
+    if not labels:
+        return name
+    pairs = ",".join(f'{key}="{escape_label(value)}"' for key, value in labels.items())
+    return f"{name}{{{pairs}}}"
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+class Metrics:
+    """Counters and histograms aggregated across every worker on the host
+
+    Updates are buffered in the process and added to the SharedState in one
+    transaction by flush(), which runs after each request and otherwise at
+    most flush_interval seconds after an update. Counters live as long as
+    the state file, so they survive worker restarts.
+    """
+
+    def __init__(self, state, flush_interval=1.0):
+        self.state = state
+        self.flush_interval = flush_interval
+        self._pending = {}
+        self._flushed_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _add(self, deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._pending[name] = self._pending.get(name, 0) + delta
+            due = time.monotonic() - self._flushed_at >= self.flush_interval
+        if due:
+            self.flush()
+
+    def increment(self, name, value=1, **labels):
+        self._add({sample_name(name, labels): value})
+
+    def observe(self, name, seconds, **labels):
+        """Add one observation to a histogram; buckets are cumulative as Prometheus expects"""
+        deltas = {sample_name(f"{name}_count", labels): 1, sample_name(f"{name}_sum", labels): seconds}
+        for bound in STAGE_BUCKETS:
+            if seconds <= bound:
+                deltas[sample_name(f"{name}_bucket", dict(labels, le=repr(bound)))] = 1
+        deltas[sample_name(f"{name}_bucket", dict(labels, le="+Inf"))] = 1
+        self._add(deltas)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._flushed_at = time.monotonic()
+        if not pending:
+            return
+        try:
+            self.state.increment(pending)
+        except sqlite3.Error as e:
+            logging.error(f"Error writing metrics: {e}")
+
+    def render(self):
+        """Every metric in the Prometheus text exposition format"""
+        self.flush()
+        samples = self.state.values("")
+        lines = []
+        for name, (kind, description) in METRIC_TYPES.items():
+            lines += [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+            if kind != 'histogram':
+                lines += [f"{key} {format_value(samples[key])}"
+                          for key in sorted(samples) if key.partition('{')[0] == name]
+                continue
+
+            # Buckets nothing fell into were never written, so fill them in as zeros
+            for key in sorted(key for key in samples if key.partition('{')[0] == f"{name}_count"):
+                labels = key.partition('{')[2].rstrip('}')
+                for bound in [repr(bound) for bound in STAGE_BUCKETS] + ["+Inf"]:
+                    bucket = f'{name}_bucket{{{labels + "," if labels else ""}le="{bound}"}}'
+                    lines.append(f"{bucket} {format_value(samples.get(bucket, 0))}")
+                suffix = f"{{{labels}}}" if labels else ""
+                lines.append(f"{name}_sum{suffix} {format_value(samples.get(f'{name}_sum{suffix}', 0))}")
+                lines.append(f"{name}_count{suffix} {format_value(samples[key])}")
+        return "\n".join(lines) + "\n"
+
+metrics = Metrics(SharedState(METRICS_PATH), flush_interval=METRICS_FLUSH_INTERVAL)
+
+def record_stage(stage, seconds):
+    metrics.observe('resume_matcher_stage_seconds', seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+@contextmanager
+def timed(stage):
+    """Time a block (or, as a decorator, every call of a function) as one pipeline stage"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - started)
+
+def count_cache_lookup(cache, hits, misses=0):
+    if hits:
+        metrics.increment('resume_matcher_cache_lookups_total', hits, cache=cache, outcome='hit')
+    if misses:
+        metrics.increment('resume_matcher_cache_lookups_total', misses, cache=cache, outcome='miss')
+
+def count_degraded(method, scores=1):
+    """Count scores that fell back because one scoring method failed"""
+    metrics.increment('resume_matcher_degraded_scores_total', scores, method=method)
+
+def count_semantic_skipped(scores=1):
+    if scores:
+        metrics.increment('resume_matcher_semantic_skipped_total', scores)
+
+def start_request_timings():
+    """Collect the stage timings of the current request (and threads it hands work to)"""
+    return _request_timings.set([])
+
+def request_timings():
+    return _request_timings.get() or []
+
+def stage_totals(timings):
+    """{stage: (total seconds, calls)} of a request's stage timings, in first-seen order"""
+    totals = {}
+    for stage, seconds in timings:
+        total, calls = totals.get(stage, (0.0, 0))
+        totals[stage] = (total + seconds, calls + 1)
+    return totals
+
+def server_timing_header(timings):
+    """Server-Timing value with the total milliseconds and call count of each stage"""
+    return ", ".join(
+        f'{stage};dur={total * 1000:.1f};desc="{calls} call{"s" if calls != 1 else ""}"'
+        for stage, (total, calls) in stage_totals(timings).items()
+    )
+
+def gemini_metric_lines(stats):
+    """Prometheus lines for the ResilientGeminiClient counters from client.stats()"""
+    operations = sorted({key.split('.')[1] for key in stats if key.startswith('gemini.')})
+    lines = [
+        "# HELP resume_matcher_gemini_calls_total Gemini HTTP attempts, by operation",
+        "# TYPE resume_matcher_gemini_calls_total counter",
+    ]
+    lines += [f'resume_matcher_gemini_calls_total{{operation="{op}"}} {format_value(stats.get(f"gemini.{op}.calls", 0))}'
+              for op in operations]
+    lines += [
+        "# HELP resume_matcher_gemini_retries_total Gemini attempts retried, by operation",
+        "# TYPE resume_matcher_gemini_retries_total counter",
+    ]
+    lines += [f'resume_matcher_gemini_retries_total{{operation="{op}"}} {format_value(stats.get(f"gemini.{op}.retries", 0))}'
+              for op in operations]
+    lines += [
+        "# HELP resume_matcher_gemini_errors_total Gemini failures, by operation and kind",
+        "# TYPE resume_matcher_gemini_errors_total counter",
+    ]
+    for key in sorted(stats):
+        parts = key.split('.', 3)
+        if len(parts) == 4 and parts[2] == 'errors':
+            lines.append(f'resume_matcher_gemini_errors_total{{operation="{parts[1]}",kind="{parts[3]}"}} '
+                         f'{format_value(stats[key])}')
+
+    lines += [
+        "# HELP resume_matcher_gemini_latency_seconds Gemini HTTP attempt latency, by operation",
+        "# TYPE resume_matcher_gemini_latency_seconds histogram",
+    ]
+    for op in operations:
+        # The client counts each latency bucket on its own; Prometheus buckets are cumulative
+        cumulative = 0
+        for bound in LATENCY_BUCKETS:
+            cumulative += stats.get(f"gemini.{op}.latency.le_{bound}", 0)
+            lines.append(f'resume_matcher_gemini_latency_seconds_bucket{{operation="{op}",le="{bound!r}"}} '
+                         f'{format_value(cumulative)}')
+        lines.append(f'resume_matcher_gemini_latency_seconds_bucket{{operation="{op}",le="+Inf"}} '
+                     f'{format_value(stats.get(f"gemini.{op}.calls", 0))}')
+        lines.append(f'resume_matcher_gemini_latency_seconds_sum{{operation="{op}"}} '
+                     f'{format_value(stats.get(f"gemini.{op}.latency_seconds", 0))}')
+        lines.append(f'resume_matcher_gemini_latency_seconds_count{{operation="{op}"}} '
+                     f'{format_value(stats.get(f"gemini.{op}.calls", 0))}')
+
+    state = stats.get('circuit_state', 'closed')
+    lines += [
+        "# HELP resume_matcher_gemini_circuit_open Whether this worker's Gemini circuit breaker is open",
+        "# TYPE resume_matcher_gemini_circuit_open gauge",
+        f"resume_matcher_gemini_circuit_open {0 if state == 'closed' else 1}",
+    ]
+    return "\n".join(lines) + "\n"
@@ -1,65 +1,182 @@
+import os
 import spacy
 import logging
+import threading
 from collections import Counter
+from utils.metrics import timed
 
-# Load spaCy model
-try:
-    nlp = spacy.load("en_core_web_sm")
-except OSError:
-    logging.error("spaCy English model not found. Please install it with: python -m spacy download en_core_web_sm")
-    nlp = None
+SPACY_MODEL = "en_core_web_sm"
 
-def extract_keywords(text, max_keywords=20):
-    """Extract keywords from text using spaCy NLP"""
+# Components each kind of analysis needs; the dependency parser is never used
+KEYWORD_PIPES = ['tok2vec', 'tagger', 'attribute_ruler', 'lemmatizer']
+ENTITY_PIPES = ['ner']
+
+# Defaults for the batch APIs
+NLP_BATCH_SIZE = int(os.environ.get("NLP_BATCH_SIZE", "32"))
+NLP_PROCESSES = int(os.environ.get("NLP_PROCESSES", "1"))
+
+KEYWORD_POS_TAGS = ['NOUN', 'PROPN', 'VERB', 'ADJ']
+ENTITY_LABELS = ['PERSON', 'ORG', 'GPE', 'PRODUCT', 'SKILL']
+
+_nlp = None
+_nlp_loaded = False
+_nlp_lock = threading.Lock()
+
+def get_nlp():
+    """Return the spaCy pipeline, loading it on first use (None if unavailable)
+
+    Loading is deferred so importing the app stays cheap; set PRELOAD_APP=1
+    for gunicorn to load it once in the master and share it with the workers.
+    """
+    global _nlp, _nlp_loaded
+    if not _nlp_loaded:
+        with _nlp_lock:
+            if not _nlp_loaded:
+                try:
+                    _nlp = spacy.load(SPACY_MODEL, exclude=['parser'])
+                except OSError:
+                    logging.error("spaCy English model not found. Please install it with: python -m spacy download en_core_web_sm")
+                _nlp_loaded = True
+    return _nlp
+
+def disabled_pipes(nlp, keywords=True, entities=True):
+    """Names of the pipeline components an analysis can skip"""
+    needed = (KEYWORD_PIPES if keywords else []) + (ENTITY_PIPES if entities else [])
+    return [name for name in nlp.pipe_names if name not in needed]
+
+class DocumentAnalysis:
+    """Result of parsing a text once with spaCy.
+
+    Keywords at any top-N, entities, lemmas and token counts are all derived
+    from the same parse, so callers should build one analysis per document
+    and pass it around instead of calling the extract_* helpers repeatedly.
+    """
+
+    def __init__(self, text, lemmas=None, entities=None, token_count=0, keyword_counts=None):
+        self.text = text
+        self.lemmas = lemmas or []
+        self.entities = entities or []
+        self.token_count = token_count
+        self.keyword_counts = Counter(keyword_counts) if keyword_counts is not None else Counter(self.lemmas)
+        if keyword_counts is not None and lemmas is None:
+            self.lemmas = list(self.keyword_counts.elements())
+
+        # Filled in by match_calculator once the text has been embedded
+        self.embedding = None
+        self.embedding_model = None
+        # Length of the embedding when known without computing it, e.g. for a normalized store row
+        self.embedding_norm = None
+
+        # {category: set of canonical skills}, when precomputed (e.g. for a saved job profile)
+        self.skills = None
+
+    def keywords(self, max_keywords=20):
+        """Return the most frequent keyword lemmas, most common first"""
+        return [keyword for keyword, freq in self.keyword_counts.most_common(max_keywords)]
+
+    def to_dict(self):
+        """Serializable form; keyword counts keep their most-common order"""
+        return {
+            'keyword_counts': self.keyword_counts.most_common(),
+            'entities': self.entities,
+            'token_count': self.token_count,
+        }
+
+    @classmethod
+    def from_dict(cls, text, data):
+        """Rebuild an analysis stored with to_dict() without parsing the text again"""
+        return cls(
+            text,
+            entities=data.get('entities', []),
+            token_count=data.get('token_count', 0),
+            keyword_counts=dict(data.get('keyword_counts', []))
+        )
+
+def _build_analysis(text, doc, keywords=True, entities=True):
+    # Extract meaningful tokens (nouns, proper nouns, verbs, adjectives)
+    lemmas = []
+    for token in (doc if keywords else []):
+        # Filter out stop words, punctuation, spaces, and short tokens
+        if (token.pos_ in KEYWORD_POS_TAGS and
+            not token.is_stop and
+            not token.is_punct and
+            not token.is_space and
+            len(token.text) > 2 and
+            token.text.isalpha()):
+
+            # Use lemmatized form for consistency
+            lemmas.append(token.lemma_.lower())
+
+    found_entities = [
+        {'text': ent.text, 'label': ent.label_}
+        for ent in (doc.ents if entities else [])
+        if ent.label_ in ENTITY_LABELS
+    ]
+
+    return DocumentAnalysis(text, lemmas=lemmas, entities=found_entities, token_count=len(doc))
+
+def analyze_document(text, keywords=True, entities=True):
+    """Parse text once and collect keyword lemmas, entities and token count
+
+    Only the components needed for the requested parts are run.
+    """
+    nlp = get_nlp()
     if not nlp:
         logging.error("spaCy model not loaded")
-        return []
-    
+        return DocumentAnalysis(text)
+
     try:
-        doc = nlp(text)
-        
-        # Extract meaningful tokens (nouns, proper nouns, verbs, adjectives)
-        keywords = []
-        for token in doc:
-            # Filter out stop words, punctuation, spaces, and short tokens
-            if (token.pos_ in ['NOUN', 'PROPN', 'VERB', 'ADJ'] and 
-                not token.is_stop and 
-                not token.is_punct and 
-                not token.is_space and 
-                len(token.text) > 2 and
-                token.text.isalpha()):
-                
-                # Use lemmatized form for consistency
-                keywords.append(token.lemma_.lower())
-        
-        # Count frequency and return most common keywords
-        keyword_freq = Counter(keywords)
-        most_common = keyword_freq.most_common(max_keywords)
-        
-        return [keyword for keyword, freq in most_common]
-        
+        with timed('spacy_parse'):
+            doc = nlp(text, disable=disabled_pipes(nlp, keywords, entities))
+            return _build_analysis(text, doc, keywords, entities)
+
     except Exception as e:
-        logging.error(f"Error extracting keywords: {e}")
-        return []
+        logging.error(f"Error analyzing document: {e}")
+        return DocumentAnalysis(text)
+
+def analyze_documents_batch(texts, keywords=True, entities=True, batch_size=None, n_process=None):
+    """Yield a DocumentAnalysis for each text, in order, parsed in batches with nlp.pipe
+
+    texts may be any iterable, including a generator; documents are parsed
+    batch_size at a time (across n_process processes) so memory stays
+    bounded however many texts are streamed through.
+    """
+    nlp = get_nlp()
+    if not nlp:
+        logging.error("spaCy model not loaded")
+        for text in texts:
+            yield DocumentAnalysis(text)
+        return
+
+    docs = nlp.pipe(
+        texts,
+        batch_size=batch_size or NLP_BATCH_SIZE,
+        n_process=n_process or NLP_PROCESSES,
+        disable=disabled_pipes(nlp, keywords, entities)
+    )
+    # Time each document as it comes out of the pipe, never the caller's work between yields
+    while True:
+        with timed('spacy_parse'):
+            doc = next(docs, None)
+            analysis = _build_analysis(doc.text, doc, keywords, entities) if doc is not None else None
+        if doc is None:
+            return
+        yield analysis
+
+def extract_keywords(text, max_keywords=20):
+    """Extract keywords from text using spaCy NLP"""
+    return analyze_document(text, entities=False).keywords(max_keywords)
 
 def extract_entities(text):
     """Extract named entities from text"""
-    if not nlp:
-        return []
-    
-    try:
-        doc = nlp(text)
-        entities = []
-        
-        for ent in doc.ents:
-            if ent.label_ in ['PERSON', 'ORG', 'GPE', 'PRODUCT', 'SKILL']:
-                entities.append({
-                    'text': ent.text,
-                    'label': ent.label_
-                })
-        
-        return entities
-        
-    except Exception as e:
-        logging.error(f"Error extracting entities: {e}")
-        return []
+    return analyze_document(text, keywords=False).entities
+
+def extract_keywords_batch(texts, max_keywords=20, batch_size=None, n_process=None):
+    """Yield the keywords of each text, in order, using batched spaCy processing"""
+    for analysis in analyze_documents_batch(texts, entities=False, batch_size=batch_size, n_process=n_process):
+        yield analysis.keywords(max_keywords)
+
+def extract_entities_batch(texts, batch_size=None, n_process=None):
+    """Yield the named entities of each text, in order, using batched spaCy processing"""
+    for analysis in analyze_documents_batch(texts, keywords=False, batch_size=batch_size, n_process=n_process):
+        yield analysis.entities
@@ -0,0 +1,180 @@
+import os
+import re
+import sys
+import json
+import time
+import random
+import cProfile
+import logging
+import threading
+from collections import Counter
+from datetime import datetime
+
+# Profile names are "<UTC timestamp>-<request id>"; anything else is refused on download
+PROFILE_NAME = re.compile(r"^[0-9]{8}T[0-9]{6}-[A-Za-z0-9_-]{1,64}$")
+
+class StackSampler:
+    """Records one thread's call stack every interval seconds from a background thread
+
+    Much cheaper than cProfile, so it can run on every request. The result
+    is in the collapsed-stack format read by flamegraph.pl and speedscope.
+    """
+
+    def __init__(self, thread_id, interval=0.01):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.counts[self._stack(frame)] += 1
+
+    @staticmethod
+    def _stack(frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        return ";".join(reversed(names))
+
+    def write(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+class ProfileStore:
+    """Directory of saved profiles, each with a JSON file describing its request
+
+    Only the newest max_profiles are kept.
+    """
+
+    def __init__(self, directory, max_profiles=100):
+        self.directory = directory
+        self.max_profiles = max_profiles
+        self._lock = threading.Lock()
+
+    def save(self, request_id, extension, write, meta):
+        """Write one profile with write(path) and its metadata; returns the profile name"""
+        os.makedirs(self.directory, exist_ok=True)
+        name = f"{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}-{request_id}"
+        data_file = f"{name}.{extension}"
+        write(os.path.join(self.directory, data_file))
+        meta = dict(meta, name=name, file=data_file)
+        with open(os.path.join(self.directory, f"{name}.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        self.rotate()
+        return name
+
+    def list(self):
+        """Metadata of every saved profile, newest first"""
+        if not os.path.isdir(self.directory):
+            return []
+        profiles = []
+        for entry in sorted(os.listdir(self.directory), reverse=True):
+            if not entry.endswith(".json") or not PROFILE_NAME.match(entry[:-5]):
+                continue
+            try:
+                with open(os.path.join(self.directory, entry), encoding="utf-8") as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError) as e:
+                logging.error(f"Error reading profile metadata {entry}: {e}")
+        return profiles
+
+    def path(self, name):
+        """Path of a saved profile's data file, or None if there is no such profile"""
+        if not PROFILE_NAME.match(name):
+            return None
+        for entry in os.listdir(self.directory) if os.path.isdir(self.directory) else []:
+            if entry.startswith(f"{name}.") and not entry.endswith(".json"):
+                return os.path.join(self.directory, entry)
+        return None
+
+    def rotate(self):
+        with self._lock:
+            names = sorted({entry.split(".", 1)[0] for entry in os.listdir(self.directory)
+                            if PROFILE_NAME.match(entry.split(".", 1)[0])})
+            for name in names[:max(0, len(names) - self.max_profiles)]:
+                for entry in os.listdir(self.directory):
+                    if entry.split(".", 1)[0] == name:
+                        try:
+                            os.remove(os.path.join(self.directory, entry))
+                        except OSError:
+                            pass
+
+class RequestProfiler:
+    """Profiles a sample of requests and keeps those worth looking at
+
+    sample_percent of calls run under cProfile and are always saved. When
+    slow_seconds is set, every other call runs under the StackSampler and
+    is saved only if it took at least that long, so rare slow requests are
+    caught without paying for cProfile on all of them.
+    """
+
+    def __init__(self, store, sample_percent=0.0, slow_seconds=0.0, sample_interval=0.01):
+        self.store = store
+        self.sample_percent = sample_percent
+        self.slow_seconds = slow_seconds
+        self.sample_interval = sample_interval
+
+    @property
+    def enabled(self):
+        return self.sample_percent > 0 or self.slow_seconds > 0
+
+    def run(self, request_id, fn, describe):
+        """Call fn(), profiling it if selected; describe() gives the metadata saved with a profile"""
+        profiler = sampler = None
+        if self.sample_percent > 0 and random.random() * 100 < self.sample_percent:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is active in this process (only one is allowed on Python 3.12+)
+                profiler = None
+        if profiler is None and self.slow_seconds > 0:
+            sampler = StackSampler(threading.get_ident(), self.sample_interval)
+            sampler.start()
+        if profiler is None and sampler is None:
+            return fn()
+
+        started = time.perf_counter()
+        error = None
+        try:
+            return fn()
+        except Exception as e:
+            error = repr(e)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            if profiler is not None:
+                profiler.disable()
+            else:
+                sampler.stop()
+            if profiler is not None or elapsed >= self.slow_seconds:
+                self._save(request_id, profiler, sampler, elapsed, error, describe)
+
+    def _save(self, request_id, profiler, sampler, elapsed, error, describe):
+        try:
+            meta = dict(describe(), request_id=request_id, duration_ms=round(elapsed * 1000, 1),
+                        profiler="cprofile" if profiler is not None else "stack-sampler",
+                        reason="sampled" if profiler is not None else "slow", error=error)
+            if profiler is not None:
+                name = self.store.save(request_id, "prof", profiler.dump_stats, meta)
+            else:
+                name = self.store.save(request_id, "folded", sampler.write, meta)
+            logging.info(f"Saved {meta['profiler']} profile {name} of a {meta['duration_ms']} ms request")
+        except Exception as e:
+            logging.error(f"Error saving request profile: {e}")
@@ -0,0 +1,70 @@
+import threading
+from utils.local_db import ProcessConnection
+
+class SharedState:
+    """Small SQLite file that lets every worker on the host share a rate limit and counters.
+
+    With an empty path the state is kept in this process only.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = ProcessConnection(path, (
+            "CREATE TABLE IF NOT EXISTS state (name TEXT PRIMARY KEY, value REAL NOT NULL)",
+        ), isolation_level=None)
+        self._memory = {}
+
+    def _connection(self):
+        return self._db.get()
+
+    def update(self, fn, names):
+        """Atomically read the named values, pass them to fn and write back the dict it returns
+
+        Missing values read as None. fn's second return value is handed back
+        to the caller.
+        """
+        with self._lock:
+            if not self.path:
+                values, result = fn({name: self._memory.get(name) for name in names})
+                self._memory.update(values)
+                return result
+
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                placeholders = ",".join("?" * len(names))
+                current = dict(conn.execute(f"SELECT name, value FROM state WHERE name IN ({placeholders})", names))
+                values, result = fn({name: current.get(name) for name in names})
+                conn.executemany("INSERT INTO state (name, value) VALUES (?, ?) "
+                                 "ON CONFLICT(name) DO UPDATE SET value = excluded.value", values.items())
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return result
+
+    def increment(self, deltas):
+        """Add each delta to its counter, all in one transaction"""
+        with self._lock:
+            if not self.path:
+                for name, delta in deltas.items():
+                    self._memory[name] = self._memory.get(name, 0) + delta
+                return
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany("INSERT INTO state (name, value) VALUES (?, ?) "
+                                 "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", deltas.items())
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def values(self, prefix=""):
+        """All values whose name starts with prefix"""
+        with self._lock:
+            if not self.path:
+                return {name: value for name, value in self._memory.items() if name.startswith(prefix)}
+            rows = self._connection().execute("SELECT name, value FROM state WHERE name LIKE ?", (prefix + "%",))
+            return dict(rows)
@@ -0,0 +1,73 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+import spacy
+from spacy.matcher import PhraseMatcher
+
+# JSON object of category -> {canonical skill: [synonyms]}
+SKILL_TAXONOMY_PATH = os.environ.get(
+    "SKILL_TAXONOMY_PATH", os.path.join(os.path.dirname(__file__), "skill_taxonomy.json")
+)
+
+# Categories scored by calculate_skills_match, in order
+SKILL_CATEGORIES = ['technical', 'soft', 'experience']
+
+_matcher = None
+_matcher_lock = threading.Lock()
+
+class SkillMatcher:
+    """Skill taxonomy compiled into one spaCy PhraseMatcher.
+
+    Every canonical skill and synonym becomes a lowercase token pattern, so a
+    document is scanned once regardless of taxonomy size and matches respect
+    token boundaries ("java" does not match inside "javascript").
+    """
+
+    def __init__(self, taxonomy):
+        # Only the tokenizer is needed, which keeps building and matching cheap
+        self.nlp = spacy.blank("en")
+        self.matcher = PhraseMatcher(self.nlp.vocab, attr="LOWER")
+        self.skills = {}
+
+        for category, skills in taxonomy.items():
+            for canonical, synonyms in skills.items():
+                key = f"{category}:{canonical}"
+                phrases = [canonical] + list(synonyms)
+                self.matcher.add(key, list(self.nlp.tokenizer.pipe(phrases)))
+                self.skills[self.nlp.vocab.strings[key]] = (category, canonical)
+
+        self.version = hashlib.sha256(json.dumps(taxonomy, sort_keys=True).encode('utf-8')).hexdigest()[:16]
+
+    def _categorize(self, doc):
+        found = {category: set() for category in SKILL_CATEGORIES}
+        for match_id, start, end in self.matcher(doc):
+            category, canonical = self.skills[match_id]
+            found.setdefault(category, set()).add(canonical)
+        return found
+
+    def match(self, text):
+        """Return {category: set of canonical skills} found in text"""
+        return self._categorize(self.nlp.make_doc(text))
+
+    def match_many(self, texts, batch_size=64):
+        """Yield match() results for each text, tokenizing in batches"""
+        for doc in self.nlp.tokenizer.pipe(texts, batch_size=batch_size):
+            yield self._categorize(doc)
+
+def load_taxonomy(path=None):
+    """Read the skill taxonomy JSON file"""
+    with open(path or SKILL_TAXONOMY_PATH, 'r', encoding='utf-8') as file:
+        return json.load(file)
+
+def get_skill_matcher():
+    """Return the process-wide SkillMatcher, compiling the taxonomy on first use"""
+    global _matcher
+    if _matcher is None:
+        with _matcher_lock:
+            if _matcher is None:
+                taxonomy = load_taxonomy()
+                _matcher = SkillMatcher(taxonomy)
+                logging.info(f"Compiled skill taxonomy with {len(_matcher.skills)} skills")
+    return _matcher
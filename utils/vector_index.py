@@ -0,0 +1,138 @@
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+
+def normalize_rows(matrix):
+    """Scale each row to unit length so dot products are cosine similarities"""
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+def cosine_scores(matrix, query, row_norm=None, chunk_rows=2048):
+    """Cosine similarity of query with every row of a float32, float16 or int8 matrix
+
+    Rows are upcast a chunk at a time into one reused buffer, so quantized or
+    memory-mapped matrices are scored in place without a float32 copy. Pass
+    row_norm when every row is known to have that length (e.g. a normalized
+    store) to skip computing the norms.
+    """
+    query = np.asarray(query, dtype=np.float32).ravel()
+    query = query / (np.linalg.norm(query) or 1.0)
+    scores = np.empty(len(matrix), dtype=np.float32)
+    buffer = np.empty((min(chunk_rows, len(matrix)), query.shape[0]), dtype=np.float32)
+    for start in range(0, len(matrix), chunk_rows):
+        rows = matrix[start:start + chunk_rows]
+        block = buffer[:len(rows)]
+        np.copyto(block, rows, casting='unsafe')
+        if row_norm is None:
+            norms = np.sqrt(np.einsum('ij,ij->i', block, block))
+            norms[norms == 0] = 1.0
+        else:
+            norms = row_norm
+        np.divide(block @ query, norms, out=scores[start:start + len(rows)])
+    return scores
+
+def top_k(ids, scores, k):
+    """Return [(id, score)] for the k highest finite scores, best first"""
+    k = min(k, len(scores))
+    if k <= 0:
+        return []
+    best = np.argpartition(-scores, k - 1)[:k]
+    best = best[np.argsort(-scores[best])]
+    return [(int(ids[i]), float(scores[i])) for i in best if np.isfinite(scores[i])]
+
+class ExactIndex:
+    """Brute-force cosine search over every row.
+
+    vectors may be a float32, float16 or int8 array, including a read-only
+    memmap, and is scored in place. Rows whose id is negative are skipped.
+    """
+
+    def __init__(self, ids, vectors, row_norm=None):
+        self.ids = np.asarray(ids, dtype=np.int64)
+        self.vectors = vectors
+        self.row_norm = row_norm
+
+    def __len__(self):
+        return len(self.ids)
+
+    def allowed_rows(self, allowed_ids):
+        """Boolean mask of the rows a search may return"""
+        keep = self.ids >= 0
+        if allowed_ids is not None:
+            keep &= np.isin(self.ids, np.fromiter(allowed_ids, dtype=np.int64))
+        return keep
+
+    def _search_rows(self, query, k, rows):
+        """Top k of the given row numbers only; quantized rows are copied in their own dtype"""
+        if not len(rows):
+            return []
+        scores = cosine_scores(self.vectors[rows], query, self.row_norm)
+        return top_k(self.ids[rows], scores, k)
+
+    def search(self, query, k=10, allowed_ids=None):
+        """Return [(id, cosine similarity)] of the k nearest rows, best first
+
+        allowed_ids restricts the search to those ids.
+        """
+        if not len(self.ids):
+            return []
+        keep = self.allowed_rows(allowed_ids)
+        if allowed_ids is not None:
+            return self._search_rows(query, k, np.flatnonzero(keep))
+        scores = cosine_scores(self.vectors, query, self.row_norm)
+        scores[~keep] = -np.inf
+        return top_k(self.ids, scores, k)
+
+class IVFIndex(ExactIndex):
+    """Approximate inverted-file index.
+
+    A k-means model trained on a sample assigns every row to a cell; a query
+    only scores the rows of the n_probe cells whose centroids are closest to
+    it. Only the centroids and a row permutation are held in memory, the
+    vectors themselves stay wherever they live (e.g. a memmap).
+    """
+
+    def __init__(self, ids, vectors, row_norm=None, n_lists=None, n_probe=8, train_size=20000, chunk_rows=8192):
+        super().__init__(ids, vectors, row_norm)
+        self.n_lists = n_lists or max(1, int(np.sqrt(len(self.ids))))
+        self.n_probe = n_probe
+
+        sample = np.sort(np.random.default_rng(0).permutation(len(self.ids))[:train_size])
+        kmeans = MiniBatchKMeans(n_clusters=self.n_lists, n_init=3, random_state=0)
+        kmeans.fit(normalize_rows(np.asarray(vectors[sample], dtype=np.float32)))
+        self.centroids = normalize_rows(kmeans.cluster_centers_.astype(np.float32))
+
+        # Assign rows by cosine to the normalized centroids, the same rule search() probes with
+        labels = np.concatenate([
+            np.argmax(np.asarray(vectors[start:start + chunk_rows], dtype=np.float32) @ self.centroids.T, axis=1)
+            for start in range(0, len(self.ids), chunk_rows)
+        ])
+        self.order = np.argsort(labels, kind='stable')
+        self.offsets = np.searchsorted(labels[self.order], np.arange(self.n_lists + 1))
+
+    def search(self, query, k=10, allowed_ids=None):
+        """Return [(id, cosine similarity)] of about the k nearest rows, best first
+
+        With allowed_ids only those rows are candidates. When they are no
+        more than n_probe cells hold on average they are all scored exactly;
+        otherwise cells are probed nearest first, at least n_probe of them
+        and then on until k allowed rows have been seen.
+        """
+        if not len(self.ids):
+            return []
+        keep = self.allowed_rows(allowed_ids)
+        if allowed_ids is not None and keep.sum() <= self.n_probe * len(self.ids) / self.n_lists:
+            return self._search_rows(query, k, np.flatnonzero(keep))
+
+        query = np.asarray(query, dtype=np.float32)
+        cells = np.argsort(-(self.centroids @ (query / (np.linalg.norm(query) or 1.0))))
+        probed = []
+        found = 0
+        for probes, cell in enumerate(cells, start=1):
+            rows = self.order[self.offsets[cell]:self.offsets[cell + 1]]
+            rows = rows[keep[rows]]
+            probed.append(rows)
+            found += len(rows)
+            if probes >= self.n_probe and found >= k:
+                break
+        return self._search_rows(query, k, np.sort(np.concatenate(probed)))